@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from django.conf import settings
+
+        if settings.READ_MODEL_ENABLED:
+            # Espelha as escritas do Firestore no modelo de leitura relacional
+            from viccoin.firebase import firestore_client
+            from viccoin.read_model import modelo_leitura
+            firestore_client.adicionar_observador(modelo_leitura)
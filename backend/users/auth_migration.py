@@ -57,9 +57,9 @@ def migrate_password_if_needed(user_id, password, current_hash):
         user_ref = db.collection('users').document(user_id)
         user_ref.update({'password_hash': new_hash})
         
-        logger.info(f"Senha migrada com sucesso para o usuário {user_id}")
+        logger.info("Senha migrada com sucesso para o usuário %s", user_id)
         return True
     except Exception as e:
-        logger.error(f"Erro ao migrar senha para o usuário {user_id}: {str(e)}")
+        logger.error("Erro ao migrar senha para o usuário %s: %s", user_id, e)
         # Não propagar o erro, pois a autenticação já foi bem-sucedida
         return False 
\ No newline at end of file
@@ -41,7 +41,7 @@ def check_password(password, hashed_password):
     try:
         return bcrypt.checkpw(password.encode(), hashed_password.encode())
     except Exception as e:
-        logger.error(f"Erro ao verificar senha: {str(e)}")
+        logger.error("Erro ao verificar senha: %s", e)
         return False
 
 def generate_token(user_id, email):
@@ -66,7 +66,7 @@ def generate_token(user_id, email):
         token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
         return token
     except Exception as e:
-        logger.error(f"Erro ao gerar token: {str(e)}")
+        logger.error("Erro ao gerar token: %s", e)
         return None
 
 def validate_token(token):
@@ -86,10 +86,10 @@ def validate_token(token):
         logger.warning("Token expirado")
         return None
     except jwt.InvalidTokenError as e:
-        logger.warning(f"Token inválido: {str(e)}")
+        logger.warning("Token inválido: %s", e)
         return None
     except Exception as e:
-        logger.error(f"Erro ao validar token: {str(e)}")
+        logger.error("Erro ao validar token: %s", e)
         return None
 
 def token_required(view_func):
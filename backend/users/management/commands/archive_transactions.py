@@ -0,0 +1,76 @@
+"""
+Arquiva as transações antigas em pacotes mensais comprimidos.
+
+Uso:
+    python manage.py archive_transactions
+    python manage.py archive_transactions --simular
+    python manage.py archive_transactions --usuario <id>
+
+Move para users/{id}/arquivo/{AAAA-MM} as transações com data anterior a
+ARQUIVO_MESES meses (veja viccoin/arquivo.py). Deve ser executado
+periodicamente, por exemplo uma vez por mês; executar de novo só arquiva o
+que ainda estiver nas subcoleções. A idade vem sempre de ARQUIVO_MESES, a
+mesma usada pelas consultas para decidir quando ler o arquivo; ao aumentá-la,
+os pacotes já gravados de meses que deixaram de ser antigos só voltam a ser
+lidos por intervalos que alcancem o novo limite.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from viccoin.arquivo import mes_limite
+from viccoin.firebase import firestore_client
+
+
+class Command(BaseCommand):
+    help = 'Compacta as transações antigas de cada usuário em pacotes mensais'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Usuários processados em paralelo (padrão: 8)')
+        parser.add_argument('--usuario', action='append', dest='usuarios',
+                            help='Processa apenas este usuário (pode ser repetido)')
+        parser.add_argument('--simular', action='store_true', help='Apenas conta as transações que seriam arquivadas')
+
+    def handle(self, *args, **options):
+        if firestore_client.db is None:
+            raise CommandError('Cliente Firestore não inicializado')
+
+        limite = mes_limite()
+        if limite is None:
+            raise CommandError('Arquivo desativado (ARQUIVO_MESES=0)')
+
+        if options['usuarios']:
+            user_ids = options['usuarios']
+        else:
+            user_ids = [referencia.id for referencia in firestore_client.collection('users').list_documents()]
+
+        self.stdout.write(
+            f'{len(user_ids)} usuários, arquivando meses anteriores a {limite} (ARQUIVO_MESES={settings.ARQUIVO_MESES})'
+        )
+
+        arquivadas = 0
+        meses = 0
+        erros = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futuros = {
+                executor.submit(firestore_client.arquivar_transacoes, user_id, limite, options['simular']): user_id
+                for user_id in user_ids
+            }
+            for futuro in as_completed(futuros):
+                user_id = futuros[futuro]
+                try:
+                    resultado = futuro.result()
+                except Exception as e:
+                    erros += 1
+                    self.stderr.write(f'  {user_id}: {e}')
+                    continue
+                arquivadas += resultado['arquivadas']
+                meses += resultado['meses']
+                if resultado['ignorados']:
+                    self.stderr.write(f"  {user_id}: meses grandes demais, mantidos: {', '.join(resultado['ignorados'])}")
+
+        verbo = 'a arquivar' if options['simular'] else 'arquivadas'
+        self.stdout.write(self.style.SUCCESS(
+            f'{arquivadas} transações {verbo} em {meses} pacotes mensais ({erros} erros)'
+        ))
@@ -0,0 +1,58 @@
+"""
+Copia usuários e transações do Firestore para o modelo de leitura relacional.
+
+Uso:
+    python manage.py migrate
+    python manage.py backfill_read_model
+    python manage.py backfill_read_model --usuario <id>
+
+Exige READ_MODEL_ENABLED. Para cada usuário, a cópia no banco relacional é
+substituída pelo estado atual do Firestore; as escritas seguintes chegam pelo
+observador registrado no FirestoreClient. Também serve para corrigir a cópia
+depois de uma falha do banco relacional.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from viccoin.firebase import firestore_client
+
+
+class Command(BaseCommand):
+    help = 'Copia usuários e transações do Firestore para o modelo de leitura relacional'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', action='append', dest='usuarios',
+                            help='Copia apenas este usuário (pode ser repetido)')
+        parser.add_argument('--pagina', type=int, default=500,
+                            help='Documentos lidos por consulta e gravados por INSERT (padrão: 500)')
+
+    def handle(self, *args, **options):
+        from viccoin.read_model import modelo_leitura
+
+        if not settings.READ_MODEL_ENABLED:
+            raise CommandError('Modelo de leitura desativado (defina READ_MODEL_ENABLED=True)')
+        if firestore_client.db is None:
+            raise CommandError('Cliente Firestore não inicializado')
+
+        if options['usuarios']:
+            user_ids = options['usuarios']
+        else:
+            user_ids = [referencia.id for referencia in firestore_client.collection('users').list_documents()]
+
+        inicio = time.monotonic()
+        transacoes = 0
+        erros = 0
+        for indice, user_id in enumerate(user_ids, 1):
+            try:
+                transacoes += modelo_leitura.copiar_usuario(firestore_client, user_id, options['pagina'])
+            except Exception as e:
+                erros += 1
+                self.stderr.write(f'  {user_id}: {e}')
+            if indice % 100 == 0:
+                self.stdout.write(f'  {indice}/{len(user_ids)} usuários ({time.monotonic() - inicio:.1f}s)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(user_ids)} usuários e {transacoes} transações copiados ({erros} erros)'
+        ))
@@ -0,0 +1,54 @@
+"""
+Grava `updated_at` nas transações criadas antes da sincronização incremental.
+
+Uso:
+    python manage.py backfill_updated_at
+    python manage.py backfill_updated_at --dry-run
+
+Documentos sem `updated_at` não são retornados por /api/transacoes/sync/. O
+comando percorre as transações de todos os usuários e grava o campo apenas
+onde ele falta, em batches.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from firebase_admin import firestore
+
+from viccoin.firebase import firestore_client, COLECOES_TRANSACAO
+
+# Limite de escritas por batch do Firestore
+MAX_BATCH = 500
+
+
+class Command(BaseCommand):
+    help = 'Grava updated_at nas transações que ainda não têm o campo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Apenas conta os documentos sem gravar')
+
+    def handle(self, *args, **options):
+        if firestore_client.db is None:
+            raise CommandError('Cliente Firestore não inicializado')
+
+        atualizados = 0
+        batch = firestore_client.batch()
+        pendentes = 0
+
+        for usuario in firestore_client.collection('users').list_documents():
+            for colecao, _ in COLECOES_TRANSACAO.values():
+                for documento in usuario.collection(colecao).stream():
+                    if 'updated_at' in documento.to_dict():
+                        continue
+                    atualizados += 1
+                    if options['dry_run']:
+                        continue
+                    batch.update(documento.reference, {'updated_at': firestore.SERVER_TIMESTAMP})
+                    pendentes += 1
+                    if pendentes >= MAX_BATCH:
+                        batch.commit()
+                        batch = firestore_client.batch()
+                        pendentes = 0
+
+        if pendentes:
+            batch.commit()
+
+        verbo = 'sem updated_at' if options['dry_run'] else 'atualizadas'
+        self.stdout.write(self.style.SUCCESS(f'{atualizados} transações {verbo}'))
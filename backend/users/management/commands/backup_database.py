@@ -0,0 +1,95 @@
+"""
+Exporta a árvore `users` do Firestore para shards NDJSON comprimidos.
+
+Uso:
+    python manage.py backup_database <diretorio>
+    python manage.py backup_database <diretorio> --shards 32 --workers 16
+
+Os usuários são distribuídos em shards pelo ID e cada worker grava um shard
+por vez (veja viccoin/backup.py). Se o backup for interrompido, executar o
+mesmo comando no mesmo diretório grava apenas os shards que faltam; shards
+concluídos não recebem usuários criados depois. Para restaurar, use
+`restore_database`.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+
+from viccoin.backup import Manifesto, exportar_shard, particao
+from viccoin.firebase import firestore_client
+
+
+class Command(BaseCommand):
+    help = 'Exporta usuários e subcoleções do Firestore para shards NDJSON comprimidos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('diretorio', help='Diretório do backup (criado se não existir)')
+        parser.add_argument('--shards', type=int, default=16,
+                            help='Número de shards; deve ser o mesmo ao retomar um backup (padrão: 16)')
+        parser.add_argument('--workers', type=int, default=8, help='Shards gravados em paralelo (padrão: 8)')
+        parser.add_argument('--pagina', type=int, default=500,
+                            help='Documentos lidos por consulta (padrão: 500)')
+
+    def handle(self, *args, **options):
+        if firestore_client.db is None:
+            raise CommandError('Cliente Firestore não inicializado')
+        if options['shards'] < 1:
+            raise CommandError('--shards deve ser positivo')
+
+        os.makedirs(options['diretorio'], exist_ok=True)
+        try:
+            manifesto = Manifesto.abrir(options['diretorio'], options['shards'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        inicio = time.monotonic()
+        pendentes = [indice for indice in range(options['shards']) if not manifesto.concluido(indice)]
+        if not pendentes:
+            manifesto.finalizar()
+            self.stdout.write(self.style.SUCCESS('Backup já concluído; nenhum shard pendente'))
+            return
+
+        usuarios = {indice: [] for indice in pendentes}
+        for referencia in firestore_client.collection('users').list_documents():
+            indice = particao(referencia.id, options['shards'])
+            if indice in usuarios:
+                usuarios[indice].append(referencia.id)
+
+        self.stdout.write(
+            f"{len(pendentes)} de {options['shards']} shards pendentes, "
+            f"{sum(len(ids) for ids in usuarios.values())} usuários"
+        )
+
+        documentos = 0
+        erros = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futuros = {
+                executor.submit(
+                    exportar_shard, firestore_client.db, manifesto, indice, usuarios[indice], options['pagina']
+                ): indice
+                for indice in pendentes
+            }
+            for futuro in as_completed(futuros):
+                indice = futuros[futuro]
+                try:
+                    entrada = futuro.result()
+                except Exception as e:
+                    erros += 1
+                    self.stderr.write(f'  shard {indice}: {e}')
+                    continue
+                documentos += entrada['documentos']
+                self.stdout.write(
+                    f"  {entrada['arquivo']}: {entrada['usuarios']} usuários, {entrada['documentos']} documentos, "
+                    f"{entrada['bytes'] / 1024:.0f} KB ({time.monotonic() - inicio:.1f}s)"
+                )
+
+        if erros:
+            raise CommandError(
+                f'{erros} shards falharam; execute o mesmo comando de novo para concluir o backup'
+            )
+        manifesto.finalizar()
+        self.stdout.write(self.style.SUCCESS(
+            f'{documentos} documentos exportados em {len(pendentes)} shards ({time.monotonic() - inicio:.1f}s)'
+        ))
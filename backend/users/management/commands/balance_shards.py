@@ -0,0 +1,62 @@
+"""
+Troca o modo do saldo de usuários entre o normal e o distribuído em shards.
+
+Uso:
+    python manage.py balance_shards --usuario <id> --shards 16
+    python manage.py balance_shards --usuario <id> --desativar
+
+Com --shards, as escritas de saldo do usuário passam a ser distribuídas
+entre N documentos (veja viccoin/saldo.py), para contas que lançam muitas
+transações por segundo; o comando também muda o número de shards de um
+usuário já distribuído. Com --desativar, as escritas voltam ao documento do
+usuário e, depois de --espera segundos (o tempo que os servidores levam para
+ver o novo modo), o valor dos shards é somado ao documento. A troca é feita
+sem parar as escritas.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from viccoin.firebase import firestore_client
+from viccoin.saldo import MAX_SHARDS, TTL_MODO
+
+
+class Command(BaseCommand):
+    help = 'Ativa, altera ou desativa o saldo distribuído em shards de usuários'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', action='append', dest='usuarios', required=True,
+                            help='Usuário a alterar (pode ser repetido)')
+        modo = parser.add_mutually_exclusive_group(required=True)
+        modo.add_argument('--shards', type=int, help=f'Número de shards do saldo (1 a {MAX_SHARDS})')
+        modo.add_argument('--desativar', action='store_true', help='Volta ao saldo no documento do usuário')
+        parser.add_argument('--espera', type=int, default=TTL_MODO,
+                            help=f'Segundos entre a troca de modo e a consolidação dos shards (padrão: {TTL_MODO})')
+
+    def handle(self, *args, **options):
+        if firestore_client.db is None:
+            raise CommandError('Cliente Firestore não inicializado')
+
+        for user_id in options['usuarios']:
+            if not firestore_client.document(f'users/{user_id}').get().exists:
+                raise CommandError(f'Usuário não encontrado: {user_id}')
+
+        if options['desativar']:
+            usuarios = [user_id for user_id in options['usuarios'] if firestore_client.desativar_shards_saldo(user_id)]
+            if usuarios and options['espera']:
+                self.stdout.write(f"Aguardando {options['espera']}s para consolidar os shards...")
+                time.sleep(options['espera'])
+            for user_id in usuarios:
+                movido = firestore_client.consolidar_shards_saldo(user_id)
+                self.stdout.write(f'  {user_id}: {movido:+.2f} movido dos shards para o documento do usuário')
+            self.stdout.write(self.style.SUCCESS(f'Saldo consolidado para {len(usuarios)} usuários'))
+            return
+
+        try:
+            for user_id in options['usuarios']:
+                firestore_client.distribuir_saldo(user_id, options['shards'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Saldo distribuído em {options['shards']} shards para {len(options['usuarios'])} usuários"
+        ))
@@ -0,0 +1,272 @@
+"""
+Benchmark dos endpoints da API contra o Firestore em memória.
+
+Uso:
+    FIRESTORE_BACKEND=memory python manage.py benchmark_endpoints
+    FIRESTORE_BACKEND=memory python manage.py benchmark_endpoints --atualizar-baseline
+
+Para cada endpoint mede vazão, percentis de latência, chamadas ao Firestore
+por requisição e memória alocada por requisição, e compara com o baseline
+salvo em benchmarks/baseline.json. O comando falha (código de saída != 0)
+quando algum endpoint regride além da tolerância.
+"""
+import itertools
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from viccoin.firebase import firestore_client, get_memory_client
+
+BASELINE_PATH = os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json')
+
+SENHA = 'benchmark123'
+
+# Endpoints com bcrypt são ordens de grandeza mais lentos; usam menos iterações
+ENDPOINTS_BCRYPT = ('register', 'login')
+
+
+class Command(BaseCommand):
+    help = 'Mede vazão, latência, chamadas ao Firestore e memória dos endpoints da API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iteracoes', type=int, default=200,
+                            help='Requisições medidas por endpoint (padrão: 200)')
+        parser.add_argument('--iteracoes-bcrypt', type=int, default=10,
+                            help='Requisições medidas para register e login (padrão: 10)')
+        parser.add_argument('--aquecimento', type=int, default=5,
+                            help='Requisições de aquecimento descartadas por endpoint (padrão: 5)')
+        parser.add_argument('--amostras-memoria', type=int, default=10,
+                            help='Requisições medidas com tracemalloc por endpoint (padrão: 10)')
+        parser.add_argument('--transacoes', type=int, default=300,
+                            help='Transações de cada tipo criadas para o usuário de teste (padrão: 300)')
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help='Executa apenas os endpoints informados (pode repetir)')
+        parser.add_argument('--tolerancia', type=float, default=0.25,
+                            help='Regressão relativa tolerada em relação ao baseline (padrão: 0.25)')
+        parser.add_argument('--ignorar-tempo', action='store_true',
+                            help='Compara apenas chamadas ao Firestore e memória (útil em máquinas diferentes)')
+        parser.add_argument('--baseline', default=BASELINE_PATH,
+                            help='Arquivo de baseline (padrão: benchmarks/baseline.json)')
+        parser.add_argument('--atualizar-baseline', action='store_true',
+                            help='Grava os resultados como novo baseline em vez de comparar')
+        parser.add_argument('--saida', help='Grava os resultados desta execução em um arquivo JSON')
+
+    def handle(self, *args, **options):
+        if getattr(settings, 'FIRESTORE_BACKEND', 'firebase') != 'memory':
+            raise CommandError('O benchmark roda contra o Firestore em memória. Use FIRESTORE_BACKEND=memory.')
+
+        setup_test_environment()
+        try:
+            # Os cenários repetem cada endpoint muito além dos limites de requisição
+            with override_settings(THROTTLE_ENABLED=False):
+                resultados = self._executar(options)
+        finally:
+            teardown_test_environment()
+
+        self._imprimir(resultados)
+
+        if options['saida']:
+            self._gravar(options['saida'], resultados)
+
+        if options['atualizar_baseline']:
+            # Endpoints não executados nesta rodada mantêm o baseline anterior
+            if os.path.exists(options['baseline']):
+                with open(options['baseline'], encoding='utf-8') as arquivo:
+                    resultados = {**json.load(arquivo)['endpoints'], **resultados}
+            self._gravar(options['baseline'], resultados)
+            self.stdout.write(self.style.SUCCESS(f"Baseline atualizado em {options['baseline']}"))
+            return
+
+        if not os.path.exists(options['baseline']):
+            self.stdout.write(self.style.WARNING('Nenhum baseline encontrado; use --atualizar-baseline para criar um.'))
+            return
+
+        with open(options['baseline'], encoding='utf-8') as arquivo:
+            baseline = json.load(arquivo)['endpoints']
+
+        regressoes = self._comparar(resultados, baseline, options['tolerancia'], options['ignorar_tempo'])
+        if regressoes:
+            for regressao in regressoes:
+                self.stderr.write(self.style.ERROR(regressao))
+            raise CommandError(f'{len(regressoes)} regressão(ões) de desempenho acima da tolerância')
+
+        self.stdout.write(self.style.SUCCESS('Nenhuma regressão em relação ao baseline'))
+
+    # Preparação
+
+    def _executar(self, options):
+        db = get_memory_client()
+        db.reset()
+        self.client = Client()
+        self.db = db
+
+        user_id, token = self._criar_usuario('benchmark@viccoin.test')
+        self._popular(user_id, options['transacoes'])
+        salario_id = firestore_client.add_salario(user_id, {'valor': 5000, 'data_recebimento': '2026-01-05'})
+
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+        emails = (f'novo{i}@viccoin.test' for i in itertools.count())
+
+        cenarios = {
+            'register': lambda: self._post('/api/users/register/', {
+                'email': next(emails), 'password': SENHA, 'nome': 'Benchmark',
+            }),
+            'login': lambda: self._post('/api/users/login/', {
+                'email': 'benchmark@viccoin.test', 'password': SENHA,
+            }),
+            'perfil': lambda: self.client.get('/api/users/perfil/', **auth),
+            'despesa': lambda: self._post('/api/transacoes/despesa/', {
+                'valor': 42.5, 'data': '2026-03-10', 'categoria': 'Alimentação', 'descricao': 'Almoço',
+            }, **auth),
+            'ganho': lambda: self._post('/api/transacoes/ganho/', {
+                'valor': 300, 'data': '2026-03-11', 'categoria': 'Freelance', 'descricao': 'Projeto',
+            }, **auth),
+            'salario': lambda: self._post('/api/transacoes/salario/', {
+                'valor': 5000, 'data_recebimento': '2026-03-05',
+            }, **auth),
+            'listar': lambda: self.client.get('/api/transacoes/listar/', {'limite': 20}, **auth),
+            'resumo': lambda: self.client.get('/api/transacoes/resumo/', **auth),
+            'relatorio': lambda: self.client.get('/api/transacoes/relatorio/', {
+                'data_inicio': '2026-01-01', 'data_fim': '2026-12-31',
+            }, **auth),
+            'dashboard': lambda: self.client.get('/api/dashboard/', **auth),
+            'atualizar_salario': lambda: self.client.put(
+                f'/api/transacoes/salario/{salario_id}/',
+                data=json.dumps({'valor': 5100, 'data_recebimento': '2026-01-05'}),
+                content_type='application/json',
+                **auth,
+            ),
+        }
+
+        selecionados = options['endpoints'] or list(cenarios)
+        desconhecidos = set(selecionados) - set(cenarios)
+        if desconhecidos:
+            raise CommandError(f"Endpoints desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+        resultados = {}
+        for nome in selecionados:
+            iteracoes = options['iteracoes_bcrypt'] if nome in ENDPOINTS_BCRYPT else options['iteracoes']
+            amostras = min(options['amostras_memoria'], iteracoes)
+            resultados[nome] = self._medir(nome, cenarios[nome], iteracoes, options['aquecimento'], amostras)
+            self.stdout.write(f"  {nome}: ok")
+        return resultados
+
+    def _post(self, url, dados, **extra):
+        return self.client.post(url, data=json.dumps(dados), content_type='application/json', **extra)
+
+    def _criar_usuario(self, email):
+        resposta = self._post('/api/users/register/', {'email': email, 'password': SENHA, 'nome': 'Benchmark'})
+        self._verificar('register', resposta)
+        resposta = self._post('/api/users/login/', {'email': email, 'password': SENHA})
+        self._verificar('login', resposta)
+        dados = resposta.json()
+        return dados['user']['uid'], dados['token']
+
+    def _popular(self, user_id, quantidade):
+        categorias = ['Alimentação', 'Transporte', 'Moradia', 'Lazer', 'Saúde']
+        for i in range(quantidade):
+            data = f'2026-{i % 12 + 1:02d}-{i % 28 + 1:02d}'
+            firestore_client.add_despesa(user_id, {
+                'valor': 10 + i % 90, 'data': data, 'categoria': categorias[i % len(categorias)],
+            })
+            firestore_client.add_ganho(user_id, {'valor': 50 + i % 200, 'data': data, 'categoria': 'Extra'})
+            firestore_client.add_salario(user_id, {'valor': 3000, 'data_recebimento': data})
+
+    # Medição
+
+    def _verificar(self, nome, resposta):
+        if resposta.status_code >= 400:
+            raise CommandError(f'{nome} retornou {resposta.status_code}: {resposta.content[:500]!r}')
+
+    def _medir(self, nome, cenario, iteracoes, aquecimento, amostras_memoria):
+        for _ in range(aquecimento):
+            self._verificar(nome, cenario())
+
+        latencias = []
+        rpcs_inicio = self.db.stats['rpcs']
+        inicio = time.perf_counter()
+        for _ in range(iteracoes):
+            t0 = time.perf_counter()
+            resposta = cenario()
+            latencias.append(time.perf_counter() - t0)
+            self._verificar(nome, resposta)
+        total = time.perf_counter() - inicio
+        rpcs = self.db.stats['rpcs'] - rpcs_inicio
+
+        # Passagem separada para memória: o tracemalloc distorce os tempos
+        picos = []
+        tracemalloc.start()
+        try:
+            for _ in range(amostras_memoria):
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+                self._verificar(nome, cenario())
+                picos.append(tracemalloc.get_traced_memory()[1] - base)
+        finally:
+            tracemalloc.stop()
+
+        latencias.sort()
+        return {
+            'requisicoes': iteracoes,
+            'rps': round(iteracoes / total, 1),
+            'p50_ms': round(self._percentil(latencias, 50) * 1000, 3),
+            'p95_ms': round(self._percentil(latencias, 95) * 1000, 3),
+            'p99_ms': round(self._percentil(latencias, 99) * 1000, 3),
+            'rpcs_por_requisicao': round(rpcs / iteracoes, 2),
+            'memoria_kb': round(statistics.median(picos) / 1024, 1) if picos else None,
+        }
+
+    @staticmethod
+    def _percentil(valores_ordenados, percentil):
+        indice = max(0, min(len(valores_ordenados) - 1, round(percentil / 100 * len(valores_ordenados)) - 1))
+        return valores_ordenados[indice]
+
+    # Relatório e comparação
+
+    def _imprimir(self, resultados):
+        cabecalho = f"{'endpoint':<20}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rpcs/req':>10}{'mem KB':>10}"
+        self.stdout.write(cabecalho)
+        self.stdout.write('-' * len(cabecalho))
+        for nome, r in resultados.items():
+            self.stdout.write(
+                f"{nome:<20}{r['rps']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}"
+                f"{r['p99_ms']:>10}{r['rpcs_por_requisicao']:>10}{r['memoria_kb']:>10}"
+            )
+
+    def _gravar(self, caminho, resultados):
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            json.dump({'endpoints': resultados}, arquivo, indent=2, ensure_ascii=False, sort_keys=True)
+            arquivo.write('\n')
+
+    def _comparar(self, resultados, baseline, tolerancia, ignorar_tempo):
+        regressoes = []
+        for nome, atual in resultados.items():
+            base = baseline.get(nome)
+            if base is None:
+                continue
+
+            # Chamadas ao Firestore são determinísticas: qualquer aumento é regressão
+            if atual['rpcs_por_requisicao'] > base['rpcs_por_requisicao'] + 0.05:
+                regressoes.append(
+                    f"{nome}: chamadas ao Firestore por requisição {base['rpcs_por_requisicao']} -> {atual['rpcs_por_requisicao']}"
+                )
+
+            if base.get('memoria_kb') and atual['memoria_kb'] > base['memoria_kb'] * (1 + tolerancia):
+                regressoes.append(f"{nome}: memória por requisição {base['memoria_kb']} KB -> {atual['memoria_kb']} KB")
+
+            if ignorar_tempo:
+                continue
+
+            if atual['p95_ms'] > base['p95_ms'] * (1 + tolerancia):
+                regressoes.append(f"{nome}: latência p95 {base['p95_ms']} ms -> {atual['p95_ms']} ms")
+            if atual['rps'] < base['rps'] * (1 - tolerancia):
+                regressoes.append(f"{nome}: vazão {base['rps']} req/s -> {atual['rps']} req/s")
+        return regressoes
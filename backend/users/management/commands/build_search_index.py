@@ -0,0 +1,60 @@
+"""
+Grava os termos de busca nas transações criadas antes do índice de busca.
+
+Uso:
+    python manage.py build_search_index
+    python manage.py build_search_index --dry-run
+
+Despesas e ganhos sem `termos_busca` (ou com termos desatualizados) não são
+encontrados por /api/transacoes/busca/. O comando percorre as transações de
+todos os usuários e grava o campo apenas onde ele difere, em batches. O
+`updated_at` não muda, então a sincronização incremental não reenvia as
+transações.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from users.models import TIPOS_BUSCA
+from viccoin.busca import CAMPO_TERMOS, termos_busca
+from viccoin.firebase import firestore_client, COLECOES_TRANSACAO
+
+# Limite de escritas por batch do Firestore
+MAX_BATCH = 500
+
+
+class Command(BaseCommand):
+    help = 'Grava os termos de busca nas despesas e ganhos que ainda não os têm'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Apenas conta os documentos sem gravar')
+
+    def handle(self, *args, **options):
+        if firestore_client.db is None:
+            raise CommandError('Cliente Firestore não inicializado')
+
+        atualizados = 0
+        batch = firestore_client.batch()
+        pendentes = 0
+
+        for usuario in firestore_client.collection('users').list_documents():
+            for tipo in TIPOS_BUSCA:
+                colecao, _ = COLECOES_TRANSACAO[tipo]
+                for documento in usuario.collection(colecao).stream():
+                    dados = documento.to_dict()
+                    termos = termos_busca(dados)
+                    if dados.get(CAMPO_TERMOS) == termos:
+                        continue
+                    atualizados += 1
+                    if options['dry_run']:
+                        continue
+                    batch.update(documento.reference, {CAMPO_TERMOS: termos})
+                    pendentes += 1
+                    if pendentes >= MAX_BATCH:
+                        batch.commit()
+                        batch = firestore_client.batch()
+                        pendentes = 0
+
+        if pendentes:
+            batch.commit()
+
+        verbo = 'a indexar' if options['dry_run'] else 'indexadas'
+        self.stdout.write(self.style.SUCCESS(f'{atualizados} transações {verbo}'))
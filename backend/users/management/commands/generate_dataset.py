@@ -0,0 +1,220 @@
+"""
+Gera um conjunto de dados sintético para testes de escala.
+
+Uso:
+    python manage.py generate_dataset --usuarios 10 --despesas 10000 --seed 42
+    FIRESTORE_BACKEND=memory python manage.py generate_dataset --usuarios 5 --snapshot dataset.pkl.gz
+
+Cria usuários com despesas, ganhos e salários nos mesmos formatos de documento
+usados pelo FirestoreClient, com distribuições realistas de categoria, data e
+valor. As escritas são enviadas em batches paralelos. Com a mesma seed, o
+conjunto gerado (incluindo os IDs) é idêntico.
+
+Com o backend em memória, use --snapshot para salvar os dados e carregue-os
+no servidor com FIRESTORE_MEMORY_SNAPSHOT.
+"""
+import datetime
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from viccoin.firebase import firestore_client, get_memory_client, montar_despesa, montar_ganho, montar_salario
+from users.auth_utils import hash_password
+from users.models import User
+
+# Limite de escritas por batch do Firestore
+MAX_BATCH = 500
+
+# categoria: (peso, mediana do valor, dispersão log-normal, descrições, locais)
+CATEGORIAS_DESPESA = {
+    'Alimentação': (30, 45, 0.8, ['Almoço', 'Jantar', 'Lanche', 'Café', 'iFood'], ['Restaurante', 'Padaria', 'Lanchonete']),
+    'Mercado': (14, 180, 0.7, ['Compras do mês', 'Feira', 'Reposição'], ['Supermercado', 'Atacadão', 'Hortifruti']),
+    'Transporte': (14, 25, 0.9, ['Uber', 'Gasolina', 'Ônibus', 'Estacionamento'], ['Posto', 'Centro', '']),
+    'Moradia': (4, 1400, 0.3, ['Aluguel', 'Condomínio'], ['']),
+    'Contas': (8, 130, 0.5, ['Energia', 'Água', 'Internet', 'Celular'], ['']),
+    'Lazer': (10, 80, 0.9, ['Cinema', 'Show', 'Bar', 'Viagem'], ['Shopping', 'Centro', '']),
+    'Saúde': (6, 120, 1.0, ['Farmácia', 'Consulta', 'Academia'], ['Farmácia', 'Clínica', '']),
+    'Educação': (4, 250, 0.6, ['Curso', 'Livros', 'Mensalidade'], ['Online', 'Livraria', '']),
+    'Compras': (10, 150, 1.1, ['Roupas', 'Eletrônicos', 'Presente'], ['Shopping', 'Online', '']),
+}
+
+# Despesas destas categorias são sempre recorrentes
+CATEGORIAS_RECORRENTES = {'Moradia', 'Contas'}
+
+CATEGORIAS_GANHO = {
+    'Freelance': (40, 800, 0.7, ['Projeto', 'Consultoria', 'Manutenção']),
+    'Vendas': (25, 150, 0.9, ['Venda online', 'Brechó', 'Usados']),
+    'Investimentos': (20, 90, 1.0, ['Dividendos', 'Rendimento', 'Juros']),
+    'Presente': (10, 200, 0.8, ['Aniversário', 'Natal']),
+    'Outros': (5, 100, 1.0, ['Reembolso', 'Cashback']),
+}
+
+
+class Command(BaseCommand):
+    help = 'Gera usuários e transações sintéticos (despesas, ganhos e salários) no Firestore'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=10, help='Número de usuários (padrão: 10)')
+        parser.add_argument('--despesas', type=int, default=1000, help='Despesas por usuário (padrão: 1000)')
+        parser.add_argument('--ganhos', type=int, default=100, help='Ganhos por usuário (padrão: 100)')
+        parser.add_argument('--salarios', type=int, default=12,
+                            help='Salários mensais por usuário, terminando no mês atual (padrão: 12)')
+        parser.add_argument('--meses', type=int, default=12,
+                            help='Janela de datas das despesas e ganhos, em meses até hoje (padrão: 12)')
+        parser.add_argument('--seed', type=int, default=42, help='Seed para reprodutibilidade (padrão: 42)')
+        parser.add_argument('--workers', type=int, default=8, help='Batches enviados em paralelo (padrão: 8)')
+        parser.add_argument('--batch', type=int, default=MAX_BATCH,
+                            help=f'Escritas por batch, no máximo {MAX_BATCH} (padrão: {MAX_BATCH})')
+        parser.add_argument('--prefixo-email', default='dataset',
+                            help="Emails gerados: {prefixo}{n}@viccoin.test (padrão: 'dataset')")
+        parser.add_argument('--senha', default='dataset123', help="Senha de todos os usuários (padrão: 'dataset123')")
+        parser.add_argument('--snapshot',
+                            help='Com o backend em memória, salva os dados gerados neste arquivo')
+
+    def handle(self, *args, **options):
+        if not 1 <= options['batch'] <= MAX_BATCH:
+            raise CommandError(f'--batch deve estar entre 1 e {MAX_BATCH}')
+
+        memoria = getattr(settings, 'FIRESTORE_BACKEND', 'firebase') == 'memory'
+        if options['snapshot'] and not memoria:
+            raise CommandError('--snapshot só pode ser usado com FIRESTORE_BACKEND=memory')
+        if memoria and not options['snapshot']:
+            self.stdout.write(self.style.WARNING(
+                'Backend em memória sem --snapshot: os dados serão descartados ao final do comando.'
+            ))
+
+        if firestore_client.db is None:
+            raise CommandError('Cliente Firestore não inicializado')
+
+        # Um único hash bcrypt para todos os usuários: gerar um por usuário dominaria o tempo
+        password_hash = hash_password(options['senha'])
+        hoje = datetime.date.today()
+
+        self.escritas = 0
+        self._lock = threading.Lock()
+        pendentes = set()
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for indice in range(options['usuarios']):
+                rng = random.Random(f"{options['seed']}:{indice}")
+                for escritas in self._gerar_usuario(rng, indice, password_hash, hoje, options):
+                    # Limitar batches em voo para manter a memória constante
+                    while len(pendentes) >= options['workers'] * 2:
+                        concluidos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                        for futuro in concluidos:
+                            futuro.result()
+                    pendentes.add(executor.submit(self._commit, escritas))
+
+                self.stdout.write(f"  usuário {indice + 1}/{options['usuarios']} gerado")
+
+            for futuro in wait(pendentes).done:
+                futuro.result()
+
+        if options['snapshot']:
+            get_memory_client().dump(options['snapshot'])
+            self.stdout.write(f"Dados salvos em {options['snapshot']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['usuarios']} usuários e {self.escritas} documentos gravados"
+        ))
+
+    def _commit(self, escritas):
+        batch = firestore_client.batch()
+        for referencia, dados in escritas:
+            batch.set(referencia, dados)
+        batch.commit()
+        with self._lock:
+            self.escritas += len(escritas)
+
+    @staticmethod
+    def _novo_id(rng):
+        return f'{rng.getrandbits(100):025x}'[:20]
+
+    @staticmethod
+    def _valor(rng, mediana, dispersao):
+        return round(rng.lognormvariate(0, dispersao) * mediana, 2)
+
+    @staticmethod
+    def _data(rng, hoje, meses):
+        # Datas mais recentes são um pouco mais frequentes
+        dias = int(meses * 30.4 * rng.betavariate(1, 1.3))
+        return (hoje - datetime.timedelta(days=dias)).strftime('%Y-%m-%d')
+
+    def _gerar_usuario(self, rng, indice, password_hash, hoje, options):
+        """
+        Gera os documentos de um usuário e os entrega em lotes de escritas.
+        O documento do usuário vai no último lote, com o saldo final.
+        """
+        user_id = self._novo_id(rng)
+        base = f'users/{user_id}'
+        lote = []
+        saldo = 0.0
+
+        def adicionar(colecao, dados):
+            lote.append((firestore_client.collection(f'{base}/{colecao}').document(self._novo_id(rng)), dados))
+
+        nomes_despesa = list(CATEGORIAS_DESPESA)
+        pesos_despesa = [CATEGORIAS_DESPESA[nome][0] for nome in nomes_despesa]
+        for _ in range(options['despesas']):
+            categoria = rng.choices(nomes_despesa, pesos_despesa)[0]
+            _, mediana, dispersao, descricoes, locais = CATEGORIAS_DESPESA[categoria]
+            dados = montar_despesa({
+                'valor': self._valor(rng, mediana, dispersao),
+                'data': self._data(rng, hoje, options['meses']),
+                'descricao': rng.choice(descricoes),
+                'local': rng.choice(locais),
+                'categoria': categoria,
+                'recorrente': categoria in CATEGORIAS_RECORRENTES or rng.random() < 0.05,
+            })
+            saldo -= dados['valor']
+            adicionar('despesas', dados)
+            if len(lote) >= options['batch']:
+                yield lote
+                lote = []
+
+        nomes_ganho = list(CATEGORIAS_GANHO)
+        pesos_ganho = [CATEGORIAS_GANHO[nome][0] for nome in nomes_ganho]
+        for _ in range(options['ganhos']):
+            categoria = rng.choices(nomes_ganho, pesos_ganho)[0]
+            _, mediana, dispersao, descricoes = CATEGORIAS_GANHO[categoria]
+            dados = montar_ganho({
+                'valor': self._valor(rng, mediana, dispersao),
+                'data': self._data(rng, hoje, options['meses']),
+                'descricao': rng.choice(descricoes),
+                'categoria': categoria,
+                'recorrente': rng.random() < 0.1,
+            })
+            saldo += dados['valor']
+            adicionar('ganhos', dados)
+            if len(lote) >= options['batch']:
+                yield lote
+                lote = []
+
+        valor_salario = round(rng.lognormvariate(0, 0.5) * 3500, 2)
+        dia_pagamento = rng.choice([1, 5, 10, 15, 20])
+        ano, mes = hoje.year, hoje.month
+        for _ in range(options['salarios']):
+            dados = montar_salario({
+                'valor': valor_salario,
+                'data_recebimento': datetime.date(ano, mes, dia_pagamento).strftime('%Y-%m-%d'),
+                'periodo': 'mensal',
+                'recorrente': True,
+            })
+            saldo += dados['valor']
+            adicionar('salario', dados)
+            if len(lote) >= options['batch']:
+                yield lote
+                lote = []
+            ano, mes = (ano, mes - 1) if mes > 1 else (ano - 1, 12)
+
+        usuario = User(
+            email=f"{options['prefixo_email']}{indice}@viccoin.test",
+            nome=f'Usuário Sintético {indice}',
+            saldo=round(saldo, 2),
+        )
+        usuario.password_hash = password_hash
+        lote.append((firestore_client.document(base), usuario.to_dict()))
+        yield lote
@@ -0,0 +1,91 @@
+"""
+Materializa as ocorrências das transações recorrentes.
+
+Uso:
+    python manage.py materialize_recurring
+    python manage.py materialize_recurring --desde 2026-01-01 --ate 2026-03-31
+    python manage.py materialize_recurring --simular
+
+Deve ser executado periodicamente (por exemplo, uma vez por dia em um cron
+job). Para cada usuário, cria em batch as ocorrências vencidas das despesas,
+ganhos e salários marcados como recorrentes, com IDs determinísticos, e
+aplica a variação total do saldo. Executar de novo para o mesmo intervalo
+não cria duplicatas, então o intervalo padrão (do início do mês até hoje)
+também recupera execuções perdidas no mês.
+
+Cada lançamento recorrente gera ocorrências até ser desmarcado como
+recorrente ou até a véspera de um lançamento recorrente que o substitui: o
+cliente envia 'substitui' com o ID do anterior ao registrar, por exemplo, um
+aumento de salário. Lançamentos com a mesma categoria e descrição sem
+'substitui' (dois salários, duas contas de energia) são séries independentes.
+"""
+import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+
+from viccoin.firebase import firestore_client
+
+
+def _data(valor):
+    return datetime.datetime.strptime(valor, '%Y-%m-%d').date()
+
+
+class Command(BaseCommand):
+    help = (
+        'Cria as ocorrências vencidas das transações recorrentes de todos os usuários. '
+        'Um lançamento recorrente só encerra outro quando o substitui explicitamente '
+        "(campo 'substitui' com o ID do anterior)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=_data, help='Início do intervalo, AAAA-MM-DD (padrão: primeiro dia do mês)')
+        parser.add_argument('--ate', type=_data, help='Fim do intervalo, AAAA-MM-DD (padrão: hoje)')
+        parser.add_argument('--workers', type=int, default=8, help='Usuários processados em paralelo (padrão: 8)')
+        parser.add_argument('--usuario', action='append', dest='usuarios',
+                            help='Processa apenas este usuário (pode ser repetido)')
+        parser.add_argument('--simular', action='store_true', help='Apenas conta as ocorrências que seriam criadas')
+
+    def handle(self, *args, **options):
+        if firestore_client.db is None:
+            raise CommandError('Cliente Firestore não inicializado')
+
+        ate = options['ate'] or datetime.date.today()
+        desde = options['desde'] or ate.replace(day=1)
+        if desde > ate:
+            raise CommandError('--desde deve ser anterior a --ate')
+
+        if options['usuarios']:
+            user_ids = options['usuarios']
+        else:
+            user_ids = [referencia.id for referencia in firestore_client.collection('users').list_documents()]
+
+        self.stdout.write(f'{len(user_ids)} usuários, ocorrências de {desde} a {ate}')
+
+        criadas = 0
+        usuarios_alterados = 0
+        erros = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futuros = {
+                executor.submit(firestore_client.materializar_recorrencias, user_id, desde, ate, options['simular']): user_id
+                for user_id in user_ids
+            }
+            for futuro in as_completed(futuros):
+                user_id = futuros[futuro]
+                try:
+                    resultado = futuro.result()
+                except Exception as e:
+                    erros += 1
+                    self.stderr.write(f'  {user_id}: {e}')
+                    continue
+                if resultado['criadas']:
+                    usuarios_alterados += 1
+                    criadas += resultado['criadas']
+                    self.stdout.write(
+                        f"  {user_id}: {resultado['criadas']} ocorrências (saldo {resultado['delta_saldo']:+.2f})"
+                    )
+
+        verbo = 'a criar' if options['simular'] else 'criadas'
+        self.stdout.write(self.style.SUCCESS(
+            f'{criadas} ocorrências {verbo} para {usuarios_alterados} usuários ({erros} erros)'
+        ))
@@ -0,0 +1,59 @@
+"""
+Recalcula os gastos mensais por categoria usados nos orçamentos.
+
+Uso:
+    python manage.py rebuild_budget_totals
+    python manage.py rebuild_budget_totals --usuario <id>
+
+Os gastos (campo 'gastos' de users/{id}/indices/orcamentos) são mantidos com
+incrementos a cada escrita de despesa; este comando os recalcula do zero
+para usuários com despesas anteriores aos orçamentos ou gravadas fora do
+FirestoreClient (por exemplo, pelo `generate_dataset`). Os limites definidos
+pelo usuário são preservados.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from viccoin.firebase import firestore_client
+from viccoin.orcamentos import DOCUMENTO_ORCAMENTOS, TIPO_ORCAMENTO, mes_transacao
+
+
+def calcular_gastos(usuario_ref):
+    """
+    Soma as despesas de um usuário por mês e categoria, incluindo as
+    arquivadas.
+    """
+    gastos = {}
+    for _, _, dados in firestore_client.iterar_transacoes(usuario_ref.id, [TIPO_ORCAMENTO]):
+        categoria = dados.get('categoria')
+        mes = mes_transacao(dados)
+        if not categoria or mes is None:
+            continue
+        gastos_mes = gastos.setdefault(mes, {})
+        gastos_mes[categoria] = gastos_mes.get(categoria, 0.0) + float(dados.get('valor') or 0)
+    return gastos
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os gastos mensais por categoria dos orçamentos a partir das despesas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', action='append', dest='usuarios',
+                            help='Recalcula apenas os gastos deste usuário (pode ser repetido)')
+
+    def handle(self, *args, **options):
+        if firestore_client.db is None:
+            raise CommandError('Cliente Firestore não inicializado')
+
+        if options['usuarios']:
+            usuarios = [firestore_client.document(f'users/{user_id}') for user_id in options['usuarios']]
+        else:
+            usuarios = list(firestore_client.collection('users').list_documents())
+
+        for usuario_ref in usuarios:
+            documento_ref = firestore_client.document(f'users/{usuario_ref.id}/{DOCUMENTO_ORCAMENTOS}')
+            atual = documento_ref.get()
+            dados = atual.to_dict() if atual.exists else {}
+            dados['gastos'] = calcular_gastos(usuario_ref)
+            documento_ref.set(dados)
+
+        self.stdout.write(self.style.SUCCESS(f'Gastos dos orçamentos recalculados para {len(usuarios)} usuários'))
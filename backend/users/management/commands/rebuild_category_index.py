@@ -0,0 +1,65 @@
+"""
+Reconstrói o índice de categorias de cada usuário a partir das transações.
+
+Uso:
+    python manage.py rebuild_category_index
+    python manage.py rebuild_category_index --usuario <id>
+
+O índice (users/{id}/indices/categorias) é mantido com incrementos a cada
+escrita; este comando o recalcula do zero para usuários com transações
+anteriores ao índice ou gravadas fora do FirestoreClient (por exemplo, pelo
+`generate_dataset`). As transações arquivadas também são contadas.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from viccoin.categorias import DOCUMENTO_INDICE, TIPOS_CATEGORIA, grupos_descricao
+from viccoin.firebase import firestore_client
+
+
+def montar_indice(usuario_ref):
+    """
+    Calcula o documento do índice de categorias de um usuário, com as
+    transações das subcoleções e as do arquivo.
+    """
+    categorias = {tipo: {} for tipo in TIPOS_CATEGORIA}
+    palavras = {tipo: {} for tipo in TIPOS_CATEGORIA}
+    for tipo, _, dados in firestore_client.iterar_transacoes(usuario_ref.id, TIPOS_CATEGORIA):
+        categoria = dados.get('categoria')
+        if not categoria:
+            continue
+        entrada = categorias[tipo].setdefault(categoria, {'usos': 0, 'ultimo_uso': None})
+        entrada['usos'] += 1
+        momento = dados.get('updated_at')
+        if momento is not None and (entrada['ultimo_uso'] is None or momento > entrada['ultimo_uso']):
+            entrada['ultimo_uso'] = momento
+        for grupo in grupos_descricao(dados.get('descricao')):
+            contagem = palavras[tipo].setdefault(grupo, {})
+            contagem[categoria] = contagem.get(categoria, 0) + 1
+
+    indice = {}
+    for tipo in TIPOS_CATEGORIA:
+        if categorias[tipo]:
+            indice[tipo] = {'categorias': categorias[tipo], 'palavras': palavras[tipo]}
+    return indice
+
+
+class Command(BaseCommand):
+    help = 'Recalcula o índice de categorias dos usuários a partir das transações'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', action='append', dest='usuarios',
+                            help='Reconstrói apenas o índice deste usuário (pode ser repetido)')
+
+    def handle(self, *args, **options):
+        if firestore_client.db is None:
+            raise CommandError('Cliente Firestore não inicializado')
+
+        if options['usuarios']:
+            usuarios = [firestore_client.document(f'users/{user_id}') for user_id in options['usuarios']]
+        else:
+            usuarios = list(firestore_client.collection('users').list_documents())
+
+        for usuario_ref in usuarios:
+            firestore_client.document(f'users/{usuario_ref.id}/{DOCUMENTO_INDICE}').set(montar_indice(usuario_ref))
+
+        self.stdout.write(self.style.SUCCESS(f'Índice de categorias reconstruído para {len(usuarios)} usuários'))
@@ -0,0 +1,249 @@
+"""
+Reconcilia o saldo armazenado de cada usuário com a soma das transações.
+
+Uso:
+    python manage.py reconcile_balances
+    python manage.py reconcile_balances --corrigir --workers 8 --checkpoint reconcile.ndjson
+    python manage.py reconcile_balances --corrigir --checkpoint reconcile.ndjson --retomar
+
+Para cada usuário, as despesas, ganhos e salários são lidos em páginas
+(ordenadas pelo ID do documento) e somados, junto com as transações dos
+pacotes do arquivo (users/{id}/arquivo); o resultado é comparado com o
+saldo armazenado (o campo `saldo` mais os shards do saldo, para usuários no
+modo distribuído). Com --corrigir, o saldo é regravado no documento do
+usuário e os shards são zerados, com uma pré-condição de `update_time` em
+cada documento: se o usuário recebeu uma transação durante a leitura, a
+reconciliação dele é refeita.
+
+Os usuários são distribuídos entre processos (ou threads, com o backend em
+memória, cujos dados não são compartilhados entre processos). Cada usuário
+concluído é gravado no arquivo de checkpoint (uma linha JSON por usuário);
+com --retomar, os usuários já presentes no arquivo são pulados.
+"""
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Tentativas por usuário quando o saldo muda durante a leitura
+MAX_TENTATIVAS = 5
+
+
+def _inicializar_worker():
+    # Processos criados com spawn começam sem o Django configurado
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'viccoin.settings')
+    django.setup()
+
+
+def _somar_transacoes(firestore_client, user_id, pagina):
+    """
+    Soma as transações do usuário com o sinal de cada tipo, lendo cada
+    coleção em páginas de `pagina` documentos, e as arquivadas.
+    """
+    from viccoin.arquivo import COLECAO_ARQUIVO, descompactar
+    from viccoin.firebase import COLECOES_TRANSACAO, sinal_saldo
+
+    # Uma transação ainda não removida por um arquivamento interrompido está
+    # nos dois lugares e conta uma vez só
+    arquivadas = {}
+    for pacote in firestore_client.collection(f"users/{user_id}/{COLECAO_ARQUIVO}").stream():
+        for transacao in descompactar(pacote.to_dict()['dados']):
+            arquivadas[(transacao['tipo'], transacao['id'])] = float(transacao.get('valor') or 0)
+
+    total = 0.0
+    quantidade = 0
+    for tipo, (colecao, _) in COLECOES_TRANSACAO.items():
+        query = firestore_client.collection(f"users/{user_id}/{colecao}").order_by('__name__').limit(pagina)
+        ultimo = None
+        while True:
+            documentos = (query.start_after(ultimo) if ultimo is not None else query).get()
+            for documento in documentos:
+                total += sinal_saldo(tipo) * float(documento.to_dict().get('valor') or 0)
+                arquivadas.pop((tipo, documento.id), None)
+            quantidade += len(documentos)
+            if len(documentos) < pagina:
+                break
+            ultimo = documentos[-1]
+    for (tipo, _), valor in arquivadas.items():
+        total += sinal_saldo(tipo) * valor
+    quantidade += len(arquivadas)
+    return round(total, 2), quantidade
+
+
+def reconciliar_usuario(user_id, pagina, corrigir, tolerancia):
+    """
+    Reconcilia um usuário e retorna o registro gravado no checkpoint.
+    """
+    from google.api_core.exceptions import FailedPrecondition
+    from viccoin.firebase import firestore_client
+    from viccoin.saldo import CAMPO_SHARDS
+
+    usuario_ref = firestore_client.document(f"users/{user_id}")
+    for tentativa in range(1, MAX_TENTATIVAS + 1):
+        usuario = usuario_ref.get()
+        if not usuario.exists:
+            return {'user_id': user_id, 'erro': 'usuário não encontrado'}
+
+        dados = usuario.to_dict()
+        shards = firestore_client.ler_shards_saldo(user_id) if CAMPO_SHARDS in dados else []
+        armazenado = float(dados.get('saldo') or 0) + sum(float(shard.to_dict().get('saldo') or 0) for shard in shards)
+        calculado, quantidade = _somar_transacoes(firestore_client, user_id, pagina)
+        diferenca = round(calculado - armazenado, 2)
+        registro = {
+            'user_id': user_id,
+            'transacoes': quantidade,
+            'saldo_armazenado': armazenado,
+            'saldo_calculado': calculado,
+            'diferenca': diferenca,
+            'corrigido': False,
+        }
+        if abs(diferenca) <= tolerancia or not corrigir:
+            return registro
+
+        batch = firestore_client.batch()
+        batch.update(
+            usuario_ref, {'saldo': calculado},
+            option=firestore_client.db.write_option(last_update_time=usuario.update_time)
+        )
+        for shard in shards:
+            batch.update(
+                shard.reference, {'saldo': 0.0},
+                option=firestore_client.db.write_option(last_update_time=shard.update_time)
+            )
+        try:
+            batch.commit()
+        except FailedPrecondition:
+            # O saldo mudou durante a leitura das transações: ler tudo de novo
+            continue
+        registro['corrigido'] = True
+        registro['tentativas'] = tentativa
+        return registro
+
+    return {'user_id': user_id, 'erro': f'saldo alterado durante {MAX_TENTATIVAS} tentativas'}
+
+
+def reconciliar_lote(user_ids, pagina, corrigir, tolerancia):
+    """
+    Reconcilia uma lista de usuários; executado em um worker.
+    """
+    resultados = []
+    for user_id in user_ids:
+        try:
+            resultados.append(reconciliar_usuario(user_id, pagina, corrigir, tolerancia))
+        except Exception as e:
+            resultados.append({'user_id': user_id, 'erro': str(e)})
+    return resultados
+
+
+class Command(BaseCommand):
+    help = 'Recalcula o saldo de todos os usuários a partir das transações e reporta ou corrige divergências'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corrigir', action='store_true', help='Regrava os saldos divergentes')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processos em paralelo (padrão: número de CPUs)')
+        parser.add_argument('--lote', type=int, default=20, help='Usuários por tarefa enviada a um worker (padrão: 20)')
+        parser.add_argument('--pagina', type=int, default=500,
+                            help='Documentos lidos por consulta em cada coleção (padrão: 500)')
+        parser.add_argument('--tolerancia', type=float, default=0.005,
+                            help='Diferença abaixo da qual o saldo é considerado correto (padrão: 0.005)')
+        parser.add_argument('--checkpoint', help='Arquivo NDJSON com o resultado de cada usuário concluído')
+        parser.add_argument('--retomar', action='store_true',
+                            help='Pula os usuários já presentes no arquivo de --checkpoint')
+        parser.add_argument('--usuario', action='append', dest='usuarios',
+                            help='Reconcilia apenas este usuário (pode ser repetido)')
+
+    def handle(self, *args, **options):
+        from viccoin.firebase import firestore_client
+
+        if firestore_client.db is None:
+            raise CommandError('Cliente Firestore não inicializado')
+        if options['retomar'] and not options['checkpoint']:
+            raise CommandError('--retomar exige --checkpoint')
+
+        concluidos = self._ler_checkpoint(options['checkpoint']) if options['retomar'] else set()
+        if options['usuarios']:
+            user_ids = options['usuarios']
+        else:
+            user_ids = [referencia.id for referencia in firestore_client.collection('users').list_documents()]
+        pendentes = [user_id for user_id in user_ids if user_id not in concluidos]
+
+        self.stdout.write(
+            f'{len(pendentes)} usuários a reconciliar'
+            + (f' ({len(concluidos)} já concluídos no checkpoint)' if concluidos else '')
+        )
+
+        lotes = [pendentes[i:i + options['lote']] for i in range(0, len(pendentes), options['lote'])]
+        argumentos = (options['pagina'], options['corrigir'], options['tolerancia'])
+
+        if getattr(settings, 'FIRESTORE_BACKEND', 'firebase') == 'memory':
+            executor = ThreadPoolExecutor(max_workers=options['workers'])
+        else:
+            executor = ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_inicializar_worker,
+            )
+
+        totais = {'usuarios': 0, 'divergentes': 0, 'corrigidos': 0, 'erros': 0, 'diferenca_total': 0.0}
+        checkpoint = open(options['checkpoint'], 'a', encoding='utf-8') if options['checkpoint'] else None
+        inicio = time.monotonic()
+        try:
+            with executor:
+                futuros = [executor.submit(reconciliar_lote, lote, *argumentos) for lote in lotes]
+                for futuro in as_completed(futuros):
+                    for registro in futuro.result():
+                        self._contabilizar(totais, registro, options['tolerancia'])
+                        if checkpoint:
+                            checkpoint.write(json.dumps(registro, ensure_ascii=False) + '\n')
+                    if checkpoint:
+                        checkpoint.flush()
+                    self.stdout.write(
+                        f"  {totais['usuarios']}/{len(pendentes)} usuários "
+                        f"({time.monotonic() - inicio:.1f}s)"
+                    )
+        finally:
+            if checkpoint:
+                checkpoint.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{totais['usuarios']} usuários reconciliados: {totais['divergentes']} com divergência "
+            f"(soma {totais['diferenca_total']:.2f}), {totais['corrigidos']} corrigidos, {totais['erros']} erros"
+        ))
+
+    @staticmethod
+    def _ler_checkpoint(caminho):
+        if not os.path.exists(caminho):
+            return set()
+        concluidos = set()
+        with open(caminho, encoding='utf-8') as arquivo:
+            for linha in arquivo:
+                try:
+                    registro = json.loads(linha)
+                except ValueError:
+                    # Linha incompleta de uma execução interrompida
+                    continue
+                if 'erro' not in registro:
+                    concluidos.add(registro['user_id'])
+        return concluidos
+
+    def _contabilizar(self, totais, registro, tolerancia):
+        totais['usuarios'] += 1
+        if 'erro' in registro:
+            totais['erros'] += 1
+            self.stderr.write(f"  {registro['user_id']}: {registro['erro']}")
+            return
+        if abs(registro['diferenca']) > tolerancia:
+            totais['divergentes'] += 1
+            totais['diferenca_total'] += registro['diferenca']
+            self.stdout.write(
+                f"  {registro['user_id']}: armazenado {registro['saldo_armazenado']:.2f}, "
+                f"calculado {registro['saldo_calculado']:.2f} (diferença {registro['diferenca']:+.2f})"
+            )
+        if registro['corrigido']:
+            totais['corrigidos'] += 1
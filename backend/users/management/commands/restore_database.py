@@ -0,0 +1,90 @@
+"""
+Restaura no Firestore um backup gravado pelo `backup_database`.
+
+Uso:
+    python manage.py restore_database <diretorio>
+    python manage.py restore_database <diretorio> --verificar
+    python manage.py restore_database <diretorio> --apenas-verificar
+
+Antes de qualquer escrita, confere o checksum de todos os shards do
+manifesto; um backup incompleto ou corrompido não é restaurado. Cada shard é
+gravado com batches de até 500 escritas, em paralelo. Documentos do backup
+sobrescrevem os existentes; documentos que não estão no backup não são
+removidos.
+
+Com --verificar, depois de restaurar, relê todos os documentos do backup
+com get_all e informa os ausentes ou diferentes; --apenas-verificar faz só
+essa comparação, sem gravar nada. A restauração não passa pelos
+observadores do FirestoreClient: com o modelo de leitura ativo, execute
+`backfill_read_model` em seguida.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from viccoin.backup import Manifesto, comparar_shard, restaurar_shard, verificar_shard
+from viccoin.firebase import firestore_client, MAX_ESCRITAS_BATCH
+
+# Caminhos divergentes listados por shard na verificação
+MAX_DIVERGENCIAS_LISTADAS = 10
+
+
+class Command(BaseCommand):
+    help = 'Restaura no Firestore um backup gravado pelo backup_database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('diretorio', help='Diretório do backup')
+        parser.add_argument('--workers', type=int, default=8, help='Shards restaurados em paralelo (padrão: 8)')
+        parser.add_argument('--verificar', action='store_true',
+                            help='Compara o banco com o backup depois de restaurar')
+        parser.add_argument('--apenas-verificar', action='store_true',
+                            help='Apenas compara o banco com o backup, sem gravar')
+
+    def handle(self, *args, **options):
+        if firestore_client.db is None:
+            raise CommandError('Cliente Firestore não inicializado')
+
+        try:
+            manifesto = Manifesto.abrir(options['diretorio'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if not manifesto.dados.get('concluido_em'):
+            raise CommandError('Backup incompleto; conclua-o com backup_database antes de restaurar')
+
+        shards = list(range(manifesto.dados['shards']))
+        inicio = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            try:
+                list(executor.map(lambda indice: verificar_shard(manifesto, indice), shards))
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(f'Checksums conferidos: {len(shards)} shards ({time.monotonic() - inicio:.1f}s)')
+
+            if not options['apenas_verificar']:
+                gravados = sum(executor.map(
+                    lambda indice: restaurar_shard(firestore_client.db, manifesto, indice, MAX_ESCRITAS_BATCH),
+                    shards
+                ))
+                self.stdout.write(self.style.SUCCESS(
+                    f'{gravados} documentos restaurados ({time.monotonic() - inicio:.1f}s)'
+                ))
+
+            if options['verificar'] or options['apenas_verificar']:
+                self._comparar(executor, manifesto, shards)
+
+    def _comparar(self, executor, manifesto, shards):
+        conferidos = 0
+        divergentes = 0
+        for indice, (total, ausentes, diferentes) in zip(
+            shards, executor.map(lambda indice: comparar_shard(firestore_client.db, manifesto, indice), shards)
+        ):
+            conferidos += total
+            divergentes += len(ausentes) + len(diferentes)
+            for rotulo, caminhos in (('ausente', ausentes), ('diferente', diferentes)):
+                for caminho in caminhos[:MAX_DIVERGENCIAS_LISTADAS]:
+                    self.stderr.write(f'  shard {indice}: {rotulo}: {caminho}')
+
+        if divergentes:
+            raise CommandError(f'{divergentes} de {conferidos} documentos divergem do backup')
+        self.stdout.write(self.style.SUCCESS(f'{conferidos} documentos conferem com o backup'))
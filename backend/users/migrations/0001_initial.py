@@ -0,0 +1,50 @@
+# Generated by Django 5.1.7 on 2026-10-19 00:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsuarioLeitura',
+            fields=[
+                ('user_id', models.CharField(max_length=128, primary_key=True, serialize=False)),
+                ('email', models.CharField(blank=True, db_index=True, default='', max_length=254)),
+                ('nome', models.CharField(blank=True, default='', max_length=255)),
+                ('saldo', models.FloatField(default=0.0)),
+            ],
+            options={
+                'db_table': 'leitura_usuarios',
+            },
+        ),
+        migrations.CreateModel(
+            name='TransacaoLeitura',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.CharField(max_length=128)),
+                ('tipo', models.CharField(max_length=10)),
+                ('transacao_id', models.CharField(max_length=128)),
+                ('valor', models.FloatField(default=0.0)),
+                ('data', models.DateField(null=True)),
+                ('descricao', models.TextField(blank=True, default='')),
+                ('local', models.CharField(blank=True, default='', max_length=255)),
+                ('categoria', models.CharField(max_length=255, null=True)),
+                ('periodo', models.CharField(max_length=20, null=True)),
+                ('recorrente', models.BooleanField(default=False)),
+                ('origem_recorrencia', models.CharField(max_length=128, null=True)),
+                ('substitui', models.CharField(max_length=128, null=True)),
+                ('updated_at', models.DateTimeField(null=True)),
+            ],
+            options={
+                'db_table': 'leitura_transacoes',
+                'indexes': [models.Index(fields=['user_id', 'data'], name='leitura_usuario_data'), models.Index(fields=['user_id', 'categoria', 'data'], name='leitura_usuario_categoria'), models.Index(fields=['user_id', 'tipo', 'data'], name='leitura_usuario_tipo')],
+                'constraints': [models.UniqueConstraint(fields=('user_id', 'tipo', 'transacao_id'), name='leitura_transacao_unica')],
+            },
+        ),
+    ]
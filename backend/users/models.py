@@ -1,76 +1,315 @@
+from operator import attrgetter
+
 from django.db import models
+from firebase_admin import firestore
+
+from viccoin.busca import CAMPO_TERMOS, CAMPOS_BUSCA, termos_busca
+from viccoin.saldo import CAMPO_SHARDS
+
 
 class User:
     """
     Classe que representa um usuário no sistema.
     Não é um modelo Django, já que estamos usando Firebase como banco de dados.
+
+    Os campos conhecidos ficam em slots; campos adicionais do documento do
+    Firestore ficam em `extras`.
     """
-    def __init__(self, uid=None, email=None, nome=None, saldo=0.0, **kwargs):
+    __slots__ = ('uid', 'email', 'nome', 'saldo', 'password_hash', 'extras')
+
+    # Campos do documento com slot próprio e seus valores padrão
+    CAMPOS = (('email', None), ('nome', None), ('saldo', 0.0), ('password_hash', None))
+    _NOMES_CAMPOS = frozenset(nome for nome, _ in CAMPOS)
+
+    def __init__(self, uid=None, email=None, nome=None, saldo=0.0, password_hash=None, **kwargs):
         """
         Inicializa um novo usuário.
-        
+
         Args:
             uid (str, opcional): ID único do usuário no Firebase Auth.
             email (str, opcional): Email do usuário.
             nome (str, opcional): Nome do usuário.
             saldo (float, opcional): Saldo inicial do usuário. Padrão é 0.0.
+            password_hash (str, opcional): Hash da senha do usuário.
             **kwargs: Atributos adicionais do usuário.
         """
         self.uid = uid
         self.email = email
         self.nome = nome
         self.saldo = saldo
-        
-        # Adicionar atributos extras
-        for key, value in kwargs.items():
-            setattr(self, key, value)
-    
+        self.password_hash = password_hash
+        self.extras = kwargs
+
     def to_dict(self):
         """
         Converte o usuário em um dicionário para armazenamento no Firestore.
-        
+
         Returns:
             dict: Dicionário com os atributos do usuário.
         """
-        user_dict = {
-            'email': self.email,
-            'nome': self.nome,
-            'saldo': self.saldo,
-        }
-        
-        # Adicionar atributos extras
-        for attr, value in self.__dict__.items():
-            if attr not in ['uid', 'email', 'nome', 'saldo']:
-                user_dict[attr] = value
-        
+        user_dict = dict(self.extras)
+        user_dict['email'] = self.email
+        user_dict['nome'] = self.nome
+        user_dict['saldo'] = self.saldo
+        if self.password_hash is not None:
+            user_dict['password_hash'] = self.password_hash
         return user_dict
-    
+
+    def to_update_dict(self):
+        """
+        Campos gravados ao atualizar um usuário existente.
+
+        O saldo é mantido por incrementos atômicos a cada transação, o modo do
+        saldo (`saldo_shards`) só muda pelo `balance_shards` e o hash da senha
+        só muda na migração de senhas, então nenhum deles é regravado a partir
+        de uma cópia possivelmente desatualizada.
+
+        Returns:
+            dict: Dicionário com os atributos editáveis do usuário.
+        """
+        user_dict = dict(self.extras)
+        user_dict.pop(CAMPO_SHARDS, None)
+        user_dict['email'] = self.email
+        user_dict['nome'] = self.nome
+        return user_dict
+
     @classmethod
     def from_dict(cls, user_dict, uid=None):
         """
         Cria um objeto User a partir de um dicionário do Firestore.
-        
+
         Args:
             user_dict (dict): Dicionário com os atributos do usuário.
             uid (str, opcional): ID único do usuário no Firebase Auth.
-            
+
         Returns:
             User: Objeto User criado a partir do dicionário.
         """
         if user_dict is None:
             return None
-        
-        # Extrair campos conhecidos
-        email = user_dict.get('email')
-        nome = user_dict.get('nome')
-        saldo = user_dict.get('saldo', 0.0)
-        
-        # Criar usuário com campos conhecidos
-        user = cls(uid=uid, email=email, nome=nome, saldo=saldo)
-        
-        # Adicionar campos extras
-        for key, value in user_dict.items():
-            if key not in ['email', 'nome', 'saldo']:
-                setattr(user, key, value)
-        
+
+        user = cls.__new__(cls)
+        user.uid = uid
+        for nome, padrao in cls.CAMPOS:
+            setattr(user, nome, user_dict.get(nome, padrao))
+        user.extras = {key: value for key, value in user_dict.items() if key not in cls._NOMES_CAMPOS}
         return user
+
+
+def _texto(valor):
+    return '' if valor is None else str(valor)
+
+
+def _opcional(valor):
+    return valor
+
+
+def _booleano(valor):
+    if isinstance(valor, str):
+        return valor.strip().lower() in ('true', '1', 'sim')
+    return bool(valor)
+
+
+def _valor(valor):
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        raise ValueError('Valor inválido')
+
+
+# Campos de cada tipo de transação: (nome no Firestore, conversor, padrão)
+ESQUEMAS_TRANSACAO = {
+    'despesa': (
+        ('valor', _valor, 0.0),
+        ('data', _opcional, None),
+        ('descricao', _texto, ''),
+        ('local', _texto, ''),
+        ('categoria', _texto, ''),
+        ('recorrente', _booleano, False),
+    ),
+    'ganho': (
+        ('valor', _valor, 0.0),
+        ('data', _opcional, None),
+        ('descricao', _texto, ''),
+        ('categoria', _texto, ''),
+        ('recorrente', _booleano, False),
+    ),
+    'salario': (
+        ('valor', _valor, 0.0),
+        ('data_recebimento', _opcional, None),
+        ('periodo', _texto, 'mensal'),
+        ('recorrente', _booleano, True),
+    ),
+}
+
+# Tipos com campos de texto indexados para a busca (viccoin/busca.py)
+TIPOS_BUSCA = tuple(
+    tipo for tipo, esquema in ESQUEMAS_TRANSACAO.items()
+    if any(nome in CAMPOS_BUSCA for nome, _, _ in esquema)
+)
+
+# Campos gravados pelo próprio sistema, fora dos esquemas
+_CAMPOS_SISTEMA = frozenset(('tipo', 'updated_at', 'origem_recorrencia', 'substitui', CAMPO_TERMOS))
+_NOMES_ESQUEMA = {
+    tipo: frozenset(nome for nome, _, _ in esquema) | _CAMPOS_SISTEMA
+    for tipo, esquema in ESQUEMAS_TRANSACAO.items()
+}
+
+# Campos (nome, padrão) de cada tipo lidos dos documentos do Firestore
+_PADROES = {
+    tipo: tuple((nome, padrao) for nome, _, padrao in esquema)
+    for tipo, esquema in ESQUEMAS_TRANSACAO.items()
+}
+# Nomes dos campos de cada tipo e a função que lê os slots correspondentes
+_NOMES_CAMPOS = {tipo: tuple(nome for nome, _ in padroes) for tipo, padroes in _PADROES.items()}
+_LER_SLOTS = {tipo: attrgetter(*nomes) for tipo, nomes in _NOMES_CAMPOS.items()}
+
+
+class Transacao:
+    """
+    Uma despesa, ganho ou salário de um usuário.
+
+    Cada tipo declara seus campos em ESQUEMAS_TRANSACAO; apenas esses slots são
+    preenchidos. Campos desconhecidos de documentos antigos ficam em `extras`
+    e são devolvidos sem alteração.
+    """
+    __slots__ = (
+        'id', 'tipo', 'valor', 'data', 'data_recebimento', 'descricao', 'local', 'categoria',
+        'recorrente', 'periodo', 'updated_at', 'origem_recorrencia', 'substitui', 'extras'
+    )
+
+    @classmethod
+    def from_dict(cls, tipo, dados, transacao_id=None):
+        """
+        Cria uma transação a partir dos dados de uma requisição, convertendo
+        cada campo e aplicando os padrões do esquema.
+
+        Raises:
+            ValueError: Se o tipo for desconhecido ou o valor for inválido
+        """
+        esquema = ESQUEMAS_TRANSACAO.get(tipo)
+        if esquema is None:
+            raise ValueError(f"Tipo de transação inválido: {tipo}")
+
+        transacao = cls.__new__(cls)
+        transacao.id = transacao_id
+        transacao.tipo = tipo
+        for nome, conversor, padrao in esquema:
+            valor = dados.get(nome)
+            setattr(transacao, nome, padrao if valor is None else conversor(valor))
+        transacao.updated_at = None
+        transacao.origem_recorrencia = dados.get('origem_recorrencia')
+        transacao.substitui = str(dados['substitui']) if dados.get('substitui') else None
+        transacao.extras = None
+        return transacao
+
+    @classmethod
+    def from_snapshot(cls, tipo, snapshot):
+        """
+        Cria uma transação a partir de um documento do Firestore, sem
+        converter os campos já gravados.
+        """
+        dados = snapshot.to_dict()
+        transacao = cls.__new__(cls)
+        transacao.id = snapshot.id
+        transacao.tipo = tipo
+        for nome, padrao in _PADROES[tipo]:
+            setattr(transacao, nome, dados.get(nome, padrao))
+        transacao.updated_at = dados.get('updated_at')
+        transacao.origem_recorrencia = dados.get('origem_recorrencia')
+        transacao.substitui = dados.get('substitui')
+
+        nomes = _NOMES_ESQUEMA[tipo]
+        if nomes.issuperset(dados):
+            transacao.extras = None
+        else:
+            transacao.extras = {chave: valor for chave, valor in dados.items() if chave not in nomes}
+        return transacao
+
+    @property
+    def data_transacao(self):
+        """
+        Data da transação, qualquer que seja o nome do campo no tipo.
+        """
+        return self.data_recebimento if self.tipo == 'salario' else self.data
+
+    def _campos(self):
+        nomes = _NOMES_CAMPOS[self.tipo]
+        dados = dict(zip(nomes, _LER_SLOTS[self.tipo](self)))
+        dados['tipo'] = self.tipo
+        if self.origem_recorrencia is not None:
+            dados['origem_recorrencia'] = self.origem_recorrencia
+        if self.substitui is not None:
+            dados['substitui'] = self.substitui
+        return dados
+
+    def to_firestore(self):
+        """
+        Dicionário a gravar no Firestore, com `updated_at` do servidor.
+        """
+        dados = self._campos()
+        if self.tipo in TIPOS_BUSCA:
+            dados[CAMPO_TERMOS] = termos_busca(dados)
+        dados['updated_at'] = firestore.SERVER_TIMESTAMP
+        return dados
+
+    def to_dict(self):
+        """
+        Dicionário da transação para as respostas da API, com o ID.
+        """
+        if self.extras:
+            dados = dict(self.extras)
+            dados.update(self._campos())
+        else:
+            dados = self._campos()
+        if self.updated_at is not None:
+            dados['updated_at'] = self.updated_at
+        dados['id'] = self.id
+        return dados
+
+
+class UsuarioLeitura(models.Model):
+    """
+    Cópia de um usuário no modelo de leitura relacional (viccoin/read_model.py).
+    """
+    user_id = models.CharField(max_length=128, primary_key=True)
+    email = models.CharField(max_length=254, blank=True, default='', db_index=True)
+    nome = models.CharField(max_length=255, blank=True, default='')
+    saldo = models.FloatField(default=0.0)
+
+    class Meta:
+        db_table = 'leitura_usuarios'
+
+
+class TransacaoLeitura(models.Model):
+    """
+    Cópia de uma transação no modelo de leitura relacional.
+
+    `data` guarda o campo de data de qualquer tipo ('data' ou
+    'data_recebimento'); `categoria` fica nula quando o documento não tem o
+    campo (salários).
+    """
+    user_id = models.CharField(max_length=128)
+    tipo = models.CharField(max_length=10)
+    transacao_id = models.CharField(max_length=128)
+    valor = models.FloatField(default=0.0)
+    data = models.DateField(null=True)
+    descricao = models.TextField(blank=True, default='')
+    local = models.CharField(max_length=255, blank=True, default='')
+    categoria = models.CharField(max_length=255, null=True)
+    periodo = models.CharField(max_length=20, null=True)
+    recorrente = models.BooleanField(default=False)
+    origem_recorrencia = models.CharField(max_length=128, null=True)
+    substitui = models.CharField(max_length=128, null=True)
+    updated_at = models.DateTimeField(null=True)
+
+    class Meta:
+        db_table = 'leitura_transacoes'
+        constraints = [
+            models.UniqueConstraint(fields=['user_id', 'tipo', 'transacao_id'], name='leitura_transacao_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['user_id', 'data'], name='leitura_usuario_data'),
+            models.Index(fields=['user_id', 'categoria', 'data'], name='leitura_usuario_categoria'),
+            models.Index(fields=['user_id', 'tipo', 'data'], name='leitura_usuario_tipo'),
+        ]
@@ -107,9 +107,8 @@ class UserSerializer:
             'saldo': user.saldo
         }
         
-        # Adicionar atributos extras
-        for attr, value in user.__dict__.items():
-            if attr not in ['uid', 'email', 'nome', 'saldo', 'password_hash']:
-                user_dict[attr] = value
+        # Adicionar atributos extras (o hash da senha tem slot próprio e não
+        # faz parte deles)
+        user_dict.update(user.extras)
         
         return user_dict 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from viccoin.firebase import db
+from viccoin.firebase import db, firestore_client
 from .models import User
 from .auth_utils import hash_password, check_password
 from .auth_migration import check_sha256_password, migrate_password_if_needed
@@ -40,8 +40,7 @@ class UserService:
         password_hash = hash_password(password)
         
         # Criar novo usuário
-        new_user = User(email=email, nome=nome, saldo=0.0)
-        new_user.password_hash = password_hash
+        new_user = User(email=email, nome=nome, saldo=0.0, password_hash=password_hash)
         
         # Salvar usuário no Firestore
         user_ref = users_ref.document()
@@ -49,6 +48,7 @@ class UserService:
         
         # Atualizar UID do usuário
         new_user.uid = user_ref.id
+        firestore_client.notificar('usuario_gravado', new_user.uid, new_user.to_dict())
         
         return new_user
     
@@ -73,24 +73,29 @@ class UserService:
             return None
         
         # Obter dados do usuário
-        user_id = results[0].id
-        user_data = results[0].to_dict()
+        usuario = results[0]
+        user_id = usuario.id
+        user_data = usuario.to_dict()
         stored_password_hash = user_data.get('password_hash')
         
         # Primeiro, tentar verificar com bcrypt
         if check_password(password, stored_password_hash):
             # Autenticação bem-sucedida com bcrypt
-            return User.from_dict(user_data, uid=user_id)
+            user = User.from_dict(user_data, uid=user_id)
+            user.saldo = firestore_client.saldo_usuario(usuario)
+            return user
         
         # Se falhar, tentar com SHA-256 (para compatibilidade com senhas antigas)
         if check_sha256_password(password, stored_password_hash):
             # Autenticação bem-sucedida com SHA-256
-            logger.info(f"Usuário {user_id} ainda usa hash SHA-256, migrando para bcrypt")
+            logger.info("Usuário %s ainda usa hash SHA-256, migrando para bcrypt", user_id)
             
             # Migrar para bcrypt
             migrate_password_if_needed(user_id, password, stored_password_hash)
             
-            return User.from_dict(user_data, uid=user_id)
+            user = User.from_dict(user_data, uid=user_id)
+            user.saldo = firestore_client.saldo_usuario(usuario)
+            return user
         
         # Autenticação falhou com ambos os métodos
         return None
@@ -107,12 +112,15 @@ class UserService:
             User or None: Objeto User se o usuário existir, None caso contrário.
         """
         user_ref = db.collection('users').document(uid)
-        user_data = user_ref.get().to_dict()
+        usuario = user_ref.get()
+        user_data = usuario.to_dict()
         
         if user_data is None:
             return None
             
-        return User.from_dict(user_data, uid=uid)
+        user = User.from_dict(user_data, uid=uid)
+        user.saldo = firestore_client.saldo_usuario(usuario)
+        return user
     
     @staticmethod
     def update_user(user):
@@ -128,7 +136,9 @@ class UserService:
         if user.uid is None:
             return False
             
+        # Saldo e hash da senha não são regravados (ver User.to_update_dict)
         user_ref = db.collection('users').document(user.uid)
-        user_ref.update(user.to_dict())
+        user_ref.update(user.to_update_dict())
+        firestore_client.notificar('usuario_gravado', user.uid, user.to_update_dict())
         
         return True 
\ No newline at end of file
@@ -1,3 +1,362 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+
+from users.management.commands.benchmark_endpoints import Command as BenchmarkCommand
+from users.management.commands.rebuild_budget_totals import calcular_gastos
+from users.management.commands.rebuild_category_index import montar_indice
+from users.models import Transacao, TransacaoLeitura
+from viccoin import backup
+from viccoin.firebase import datas_recorrencia, firestore_client, get_memory_client
+from viccoin.tests import FirestoreMemoriaTestCase, modelo_leitura_ativo
+
+
+class _Snapshot:
+    def __init__(self, transacao_id, dados):
+        self.id = transacao_id
+        self._dados = dados
+
+    def to_dict(self):
+        return dict(self._dados)
+
+
+class TransacaoTests(SimpleTestCase):
+
+    def test_from_snapshot_aplica_padroes_e_preserva_extras(self):
+        snapshot = _Snapshot('d1', {'valor': 10.0, 'data': '2026-01-05', 'tipo': 'despesa', 'antigo': 'x'})
+        transacao = Transacao.from_snapshot('despesa', snapshot)
+
+        self.assertEqual(transacao.to_dict(), {
+            'antigo': 'x', 'valor': 10.0, 'data': '2026-01-05', 'descricao': '', 'local': '',
+            'categoria': '', 'recorrente': False, 'tipo': 'despesa', 'id': 'd1',
+        })
+
+    def test_campos_seguem_o_esquema_do_tipo(self):
+        transacao = Transacao.from_dict('salario', {'valor': '1500', 'data_recebimento': '2026-01-05'}, 's1')
+        dados = transacao.to_dict()
+
+        self.assertEqual(dados, {
+            'valor': 1500.0, 'data_recebimento': '2026-01-05', 'periodo': 'mensal',
+            'recorrente': True, 'tipo': 'salario', 'id': 's1',
+        })
+        self.assertEqual(Transacao.from_snapshot('salario', _Snapshot('s1', dados)).to_dict(), dados)
+
+    def test_tipo_ou_valor_invalido(self):
+        with self.assertRaises(ValueError):
+            Transacao.from_dict('transferencia', {'valor': 1})
+        with self.assertRaises(ValueError):
+            Transacao.from_dict('despesa', {'valor': 'abc'})
+
+
+class BenchmarkComparacaoTests(SimpleTestCase):
+
+    def setUp(self):
+        self.base = {'listar': {'rpcs_por_requisicao': 2.0, 'memoria_kb': 100.0, 'p95_ms': 10.0, 'rps': 500.0}}
+
+    def comparar(self, atual, ignorar_tempo=False):
+        return BenchmarkCommand()._comparar({'listar': atual}, self.base, 0.25, ignorar_tempo)
+
+    def test_dentro_da_tolerancia(self):
+        atual = {'rpcs_por_requisicao': 2.0, 'memoria_kb': 120.0, 'p95_ms': 12.0, 'rps': 400.0}
+        self.assertEqual(self.comparar(atual), [])
+
+    def test_qualquer_chamada_a_mais_e_regressao(self):
+        atual = {'rpcs_por_requisicao': 3.0, 'memoria_kb': 100.0, 'p95_ms': 10.0, 'rps': 500.0}
+        regressoes = self.comparar(atual, ignorar_tempo=True)
+        self.assertEqual(len(regressoes), 1)
+        self.assertIn('chamadas ao Firestore', regressoes[0])
+
+    def test_ignorar_tempo_mantem_memoria(self):
+        atual = {'rpcs_por_requisicao': 2.0, 'memoria_kb': 200.0, 'p95_ms': 50.0, 'rps': 100.0}
+        self.assertEqual(len(self.comparar(atual)), 3)
+        regressoes = self.comparar(atual, ignorar_tempo=True)
+        self.assertEqual(len(regressoes), 1)
+        self.assertIn('memória', regressoes[0])
+
+    def test_endpoint_sem_baseline_e_ignorado(self):
+        self.assertEqual(BenchmarkCommand()._comparar({'novo': self.base['listar']}, {}, 0.25, False), [])
+
+
+class GerarDatasetTests(FirestoreMemoriaTestCase):
+
+    def gerar(self, seed, **opcoes):
+        get_memory_client().reset()
+        call_command('generate_dataset', usuarios=2, despesas=30, ganhos=5, salarios=3, seed=seed,
+                     batch=7, workers=3, stdout=StringIO(), **opcoes)
+        documentos = {}
+        for usuario in firestore_client.collection('users').stream():
+            dados = usuario.to_dict()
+            # O hash bcrypt usa um salt aleatório a cada execução
+            dados.pop('password_hash')
+            documentos[usuario.reference.path] = dados
+            for subcolecao in ('despesas', 'ganhos', 'salario'):
+                for documento in usuario.reference.collection(subcolecao).stream():
+                    # updated_at é o horário do servidor, usado pela sincronização
+                    documentos[documento.reference.path] = {
+                        campo: valor for campo, valor in documento.to_dict().items() if campo != 'updated_at'
+                    }
+        return documentos
+
+    def test_mesma_seed_gera_os_mesmos_documentos(self):
+        primeiro = self.gerar(7)
+        self.assertEqual(len(primeiro), 2 * (1 + 30 + 5 + 3))
+        self.assertEqual(self.gerar(7), primeiro)
+        self.assertNotEqual(set(self.gerar(8)), set(primeiro))
+
+    def test_saldo_do_usuario_soma_as_transacoes(self):
+        documentos = self.gerar(7)
+        for caminho, dados in documentos.items():
+            if caminho.count('/') != 1:
+                continue
+            total = 0.0
+            for outro, transacao in documentos.items():
+                if outro.startswith(caminho + '/'):
+                    total += -transacao['valor'] if '/despesas/' in outro else transacao['valor']
+            self.assertAlmostEqual(dados['saldo'], total, places=2)
+
+
+class ReconciliacaoSaldoTests(FirestoreMemoriaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for valor in (10, 20, 30):
+            firestore_client.add_despesa(self.user_id, {'valor': valor, 'data': '2026-01-05'})
+        firestore_client.add_ganho(self.user_id, {'valor': 200, 'data': '2026-01-06'})
+        firestore_client.add_salario(self.user_id, {'valor': 1000, 'data_recebimento': '2026-01-05'})
+        # Saldo divergente, como deixado por uma escrita perdida
+        self.usuario_ref = firestore_client.document(f'users/{self.user_id}')
+        self.usuario_ref.update({'saldo': 1000.0})
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.checkpoint = os.path.join(diretorio.name, 'reconcile.ndjson')
+
+    def reconciliar(self, *args):
+        saida = StringIO()
+        call_command('reconcile_balances', *args, pagina=2, workers=2, checkpoint=self.checkpoint,
+                     stdout=saida, stderr=StringIO())
+        return saida.getvalue()
+
+    def registros(self):
+        with open(self.checkpoint, encoding='utf-8') as arquivo:
+            return [json.loads(linha) for linha in arquivo]
+
+    def test_relatorio_sem_corrigir(self):
+        self.reconciliar()
+
+        self.assertEqual(self.registros(), [{
+            'user_id': self.user_id, 'transacoes': 5, 'saldo_armazenado': 1000.0, 'saldo_calculado': 1140.0,
+            'diferenca': 140.0, 'corrigido': False,
+        }])
+        self.assertEqual(self.usuario_ref.get().to_dict()['saldo'], 1000.0)
+
+    def test_corrigir_e_retomar(self):
+        self.reconciliar('--corrigir')
+        self.assertTrue(self.registros()[0]['corrigido'])
+        self.assertEqual(self.usuario_ref.get().to_dict()['saldo'], 1140.0)
+
+        self.assertIn('0 usuários a reconciliar', self.reconciliar('--retomar'))
+        self.assertEqual(len(self.registros()), 1)
+
+
+class RecorrenciasTests(FirestoreMemoriaTestCase):
+
+    def test_datas_de_recorrencia(self):
+        data = datetime.date
+        self.assertEqual(list(datas_recorrencia(data(2026, 1, 31), 'mensal', data(2026, 1, 1), data(2026, 4, 30))),
+                         [data(2026, 2, 28), data(2026, 3, 31), data(2026, 4, 30)])
+        self.assertEqual(list(datas_recorrencia(data(2026, 1, 1), 'semanal', data(2026, 2, 1), data(2026, 2, 14))),
+                         [data(2026, 2, 5), data(2026, 2, 12)])
+
+    def test_materializa_uma_vez_com_um_delta_de_saldo(self):
+        aluguel_id = firestore_client.add_despesa(self.user_id, {'valor': 1000, 'data': '2026-01-10', 'categoria': 'Moradia',
+                                                                 'descricao': 'Aluguel', 'recorrente': True})
+        # Reajuste lançado à mão: a partir de março vale o novo valor
+        firestore_client.add_despesa(self.user_id, {'valor': 1100, 'data': '2026-03-10', 'categoria': 'Moradia',
+                                                    'descricao': 'Aluguel', 'recorrente': True, 'substitui': aluguel_id})
+        firestore_client.add_salario(self.user_id, {'valor': 5000, 'data_recebimento': '2026-01-05'})
+        # Segundo emprego: sem 'substitui', não encerra o primeiro salário
+        firestore_client.add_salario(self.user_id, {'valor': 800, 'data_recebimento': '2026-03-20'})
+        firestore_client.add_ganho(self.user_id, {'valor': 50, 'data': '2026-01-02'})
+        usuario_ref = firestore_client.document(f'users/{self.user_id}')
+        saldo = usuario_ref.get().to_dict()['saldo']
+
+        def materializar(*args):
+            call_command('materialize_recurring', '--desde', '2026-02-01', '--ate', '2026-04-30', *args,
+                         usuarios=[self.user_id], stdout=StringIO())
+
+        materializar('--simular')
+        self.assertEqual(usuario_ref.get().to_dict()['saldo'], saldo)
+
+        with mock.patch.object(firestore_client, 'batch', wraps=firestore_client.batch) as batch:
+            materializar()
+        self.assertEqual(batch.call_count, 1)
+        materializar()
+
+        despesas = sorted((d.to_dict()['data'], d.to_dict()['valor'])
+                          for d in firestore_client.collection(f'users/{self.user_id}/despesas').stream())
+        self.assertEqual(despesas, [('2026-01-10', 1000.0), ('2026-02-10', 1000.0),
+                                    ('2026-03-10', 1100.0), ('2026-04-10', 1100.0)])
+        salarios = sorted((d.to_dict()['data_recebimento'], d.to_dict()['valor'])
+                          for d in firestore_client.collection(f'users/{self.user_id}/salario').stream())
+        self.assertEqual(salarios, [('2026-01-05', 5000.0), ('2026-02-05', 5000.0), ('2026-03-05', 5000.0),
+                                    ('2026-03-20', 800.0), ('2026-04-05', 5000.0), ('2026-04-20', 800.0)])
+        self.assertEqual(usuario_ref.get().to_dict()['saldo'], saldo - 2100 + 15800)
+
+
+class BackupTests(FirestoreMemoriaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cadastrar('outro@viccoin.com')
+        firestore_client.add_despesa(self.user_id, {'valor': 10, 'data': '2026-01-05', 'categoria': 'Mercado'})
+        firestore_client.add_ganho(self.user_id, {'valor': 50, 'data': '2026-01-06'})
+        # Tipos que o JSON não representa diretamente
+        firestore_client.document(f'users/{self.user_id}/extras/tipos').set({
+            'bytes': b'\x00\x01', 'momento': datetime.datetime(2026, 1, 5, 12, tzinfo=datetime.timezone.utc),
+            'lista': [1, {'nulo': None}],
+        })
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.diretorio = diretorio.name
+
+    def documentos(self):
+        documentos = {}
+        for usuario in firestore_client.collection('users').list_documents():
+            documentos[usuario.path] = usuario.get().to_dict()
+            for colecao in usuario.collections():
+                for documento in colecao.stream():
+                    documentos[documento.reference.path] = documento.to_dict()
+        return documentos
+
+    def copiar(self, shards=3):
+        call_command('backup_database', self.diretorio, shards=shards, workers=2, stdout=StringIO())
+        with open(os.path.join(self.diretorio, 'manifest.json'), encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+
+    def test_restauracao_reproduz_os_documentos(self):
+        antes = self.documentos()
+        manifesto = self.copiar()
+        self.assertEqual(sum(e['documentos'] for e in manifesto['arquivos'].values()), len(antes))
+
+        get_memory_client().reset()
+        with self.assertRaises(CommandError):
+            call_command('restore_database', self.diretorio, apenas_verificar=True, stdout=StringIO(), stderr=StringIO())
+        call_command('restore_database', self.diretorio, verificar=True, stdout=StringIO())
+        self.assertEqual(self.documentos(), antes)
+
+    def test_backup_interrompido_continua_de_onde_parou(self):
+        manifesto = self.copiar()
+        arquivo = os.path.join(self.diretorio, manifesto['arquivos']['1']['arquivo'])
+        os.remove(arquivo)
+
+        with mock.patch('users.management.commands.backup_database.exportar_shard',
+                        wraps=backup.exportar_shard) as exportar:
+            self.assertEqual(self.copiar()['arquivos'], manifesto['arquivos'])
+        self.assertEqual([c.args[2] for c in exportar.call_args_list], [1])
+        with self.assertRaises(CommandError):
+            self.copiar(shards=4)
+
+    def test_shard_corrompido_nao_e_restaurado(self):
+        manifesto = self.copiar()
+        arquivo = os.path.join(self.diretorio, manifesto['arquivos']['0']['arquivo'])
+        with open(arquivo, 'r+b') as shard:
+            shard.seek(20)
+            byte = shard.read(1)
+            shard.seek(20)
+            shard.write(bytes([byte[0] ^ 1]))
+
+        get_memory_client().reset()
+        with self.assertRaises(CommandError):
+            call_command('restore_database', self.diretorio, stdout=StringIO())
+        self.assertEqual(self.documentos(), {})
+
+
+class ArquivoTestCase(FirestoreMemoriaTestCase):
+    """
+    Usuário com um ano de transações antigas, arquivadas por `arquivar`.
+    """
+
+    def setUp(self):
+        super().setUp()
+        for mes in range(1, 13):
+            firestore_client.add_despesa(self.user_id, {
+                'valor': 10, 'data': f'2022-{mes:02d}-10', 'categoria': 'Mercado', 'descricao': 'Feira do mes'
+            })
+        firestore_client.add_ganho(self.user_id, {'valor': 50, 'data': '2022-03-05', 'categoria': 'Extra'})
+        firestore_client.add_despesa(self.user_id, {'valor': 7, 'data': '2026-01-10', 'categoria': 'Mercado'})
+        self.usuario_ref = firestore_client.document(f'users/{self.user_id}')
+
+    def arquivar(self):
+        call_command('archive_transactions', usuarios=[self.user_id], stdout=StringIO())
+        self.assertEqual(len(firestore_client.collection(f'users/{self.user_id}/despesas').get()), 1)
+
+
+class ArquivoComandosTests(ArquivoTestCase):
+    """
+    Comandos que recalculam dados de todo o histórico, depois de
+    `archive_transactions`.
+    """
+
+    def test_indice_de_categorias_conta_arquivadas(self):
+        antes = montar_indice(self.usuario_ref)
+        self.assertEqual(antes['despesa']['categorias']['Mercado']['usos'], 13)
+
+        self.arquivar()
+        call_command('rebuild_category_index', usuarios=[self.user_id], stdout=StringIO())
+        depois = firestore_client.get_indice_categorias(self.user_id)
+        self.assertEqual(depois['despesa']['categorias']['Mercado']['usos'], 13)
+        self.assertEqual(depois['despesa']['palavras'], antes['despesa']['palavras'])
+        self.assertEqual(depois['ganho']['categorias']['Extra']['usos'], 1)
+
+    def test_gastos_dos_orcamentos_contam_arquivadas(self):
+        antes = calcular_gastos(self.usuario_ref)
+        self.assertEqual(antes['2022-05'], {'Mercado': 10.0})
+
+        self.arquivar()
+        call_command('rebuild_budget_totals', usuarios=[self.user_id], stdout=StringIO())
+        self.assertEqual(firestore_client.get_orcamentos(self.user_id)['gastos'], antes)
+
+    def test_reconciliacao_conta_arquivadas(self):
+        saldo = self.usuario_ref.get().to_dict()['saldo']
+        self.arquivar()
+        self.assertEqual(self.usuario_ref.get().to_dict()['saldo'], saldo)
+
+        saida = StringIO()
+        call_command('reconcile_balances', '--corrigir', usuarios=[self.user_id], workers=1, stdout=saida)
+        self.assertIn('0 com divergência', saida.getvalue())
+        self.assertEqual(self.usuario_ref.get().to_dict()['saldo'], saldo)
+
+    def test_transacao_em_arquivamento_interrompido_conta_uma_vez(self):
+        self.arquivar()
+        pacote = firestore_client.document(f'users/{self.user_id}/arquivo/2022-01').get().to_dict()
+        transacao = next(dados for _, _, dados in firestore_client.iterar_transacoes(self.user_id, ['despesa'])
+                         if dados.get('data') == '2022-01-10')
+        self.assertEqual(pacote['quantidade'], 1)
+        # A cópia ainda na subcoleção, como se a remoção não tivesse terminado
+        firestore_client.document(f"users/{self.user_id}/despesas/{transacao['id']}").set(
+            {campo: valor for campo, valor in transacao.items() if campo != 'id'}
+        )
+
+        self.assertEqual(calcular_gastos(self.usuario_ref)['2022-01'], {'Mercado': 10.0})
+        self.assertEqual(montar_indice(self.usuario_ref)['despesa']['categorias']['Mercado']['usos'], 13)
+
+
+class ModeloLeituraArquivoTests(ArquivoTestCase):
+    databases = {'default'}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.modelo_leitura = cls.enterClassContext(modelo_leitura_ativo())
+
+    def test_copia_inclui_arquivadas(self):
+        self.arquivar()
+        self.assertEqual(self.modelo_leitura.copiar_usuario(firestore_client, self.user_id), 14)
+        self.assertEqual(TransacaoLeitura.objects.filter(user_id=self.user_id, data__year=2022).count(), 13)
@@ -206,7 +206,7 @@ def firebase_test(request):
         test_doc_ref.set(test_data)
         response['tests']['write']['status'] = 'success'
         response['tests']['write']['message'] = f'Documento criado com sucesso: {test_doc_ref.id}'
-        logger.info(f"Teste de Firebase: Escrita bem-sucedida em {test_doc_ref.id}")
+        logger.info("Teste de Firebase: Escrita bem-sucedida em %s", test_doc_ref.id)
         
         # Teste 3: Operação de leitura
         read_data = test_doc_ref.get().to_dict()
@@ -224,14 +224,14 @@ def firebase_test(request):
         count = len(query_result)
         response['tests']['query']['status'] = 'success'
         response['tests']['query']['message'] = f'Consulta retornou {count} documentos'
-        logger.info(f"Teste de Firebase: Consulta retornou {count} documentos")
+        logger.info("Teste de Firebase: Consulta retornou %s documentos", count)
         
         # Definir status geral
         all_success = all(test['status'] == 'success' for test in response['tests'].values())
         response['overall_status'] = 'success' if all_success else 'error'
         
     except Exception as e:
-        logger.error(f"Erro no teste de Firebase: {str(e)}")
+        logger.error("Erro no teste de Firebase: %s", e)
         # Atualizar status dos testes que ainda estão pendentes
         for test_name, test_data in response['tests'].items():
             if test_data['status'] == 'pending':
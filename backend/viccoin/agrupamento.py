@@ -0,0 +1,94 @@
+"""
+Agrupamento das escritas de um usuário em um único commit (group commit).
+
+O modal de transações em formato de chat e o reenvio de transações criadas
+offline mandam várias escritas do mesmo usuário em poucos milissegundos.
+Cada uma seria um commit com um incremento do saldo no documento do usuário,
+que tem limite de escritas sustentadas. Com o `AgrupadorEscritas`, a primeira
+escrita de um usuário abre um grupo e espera `janela` segundos; as escritas
+que chegam nesse intervalo entram no mesmo grupo, gravado com uma única
+chamada a `gravar(user_id, itens)` (um batch com uma variação combinada do
+saldo). Cada chamador recebe o resultado do seu item, ou a exceção do grupo.
+
+Os grupos são por processo: escritas do mesmo usuário em workers diferentes
+continuam em commits separados.
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class _Grupo:
+    __slots__ = ('itens', 'resultados', 'erro', 'cheio', 'concluido')
+
+    def __init__(self):
+        self.itens = []
+        self.resultados = None
+        self.erro = None
+        self.cheio = threading.Event()
+        self.concluido = threading.Event()
+
+
+class AgrupadorEscritas:
+    """
+    Junta as escritas de cada usuário feitas dentro de uma janela de tempo.
+
+    Args:
+        gravar: Função `gravar(user_id, itens)` que grava os itens em um único
+            commit e retorna a lista de resultados, na mesma ordem
+        janela: Segundos que o primeiro item de um grupo espera por outros
+        maximo: Itens por grupo; um grupo cheio é gravado sem esperar o fim
+            da janela
+    """
+
+    def __init__(self, gravar, janela, maximo):
+        self.gravar = gravar
+        self.janela = janela
+        self.maximo = maximo
+        self._grupos = {}
+        self._lock = threading.Lock()
+
+    def enviar(self, user_id, item):
+        """
+        Inclui um item no grupo aberto do usuário (ou abre um) e espera a
+        gravação do grupo.
+
+        Returns:
+            Resultado de `gravar` para o item
+        """
+        with self._lock:
+            grupo = self._grupos.get(user_id)
+            lider = grupo is None
+            if lider:
+                grupo = self._grupos[user_id] = _Grupo()
+            indice = len(grupo.itens)
+            grupo.itens.append(item)
+            if len(grupo.itens) >= self.maximo:
+                # Escritas seguintes abrem um novo grupo
+                del self._grupos[user_id]
+                grupo.cheio.set()
+
+        if lider:
+            self._gravar_grupo(user_id, grupo)
+        else:
+            grupo.concluido.wait()
+
+        if grupo.erro is not None:
+            raise grupo.erro
+        return grupo.resultados[indice]
+
+    def _gravar_grupo(self, user_id, grupo):
+        grupo.cheio.wait(self.janela)
+        with self._lock:
+            if self._grupos.get(user_id) is grupo:
+                del self._grupos[user_id]
+
+        try:
+            if len(grupo.itens) > 1:
+                logger.debug("Gravando %s escritas agrupadas do usuário %s", len(grupo.itens), user_id)
+            grupo.resultados = self.gravar(user_id, grupo.itens)
+        except Exception as e:
+            grupo.erro = e
+        finally:
+            grupo.concluido.set()
@@ -0,0 +1,101 @@
+"""
+Arquivo das transações antigas em pacotes mensais.
+
+O comando `archive_transactions` move as transações com data anterior a
+ARQUIVO_MESES meses para um documento por usuário e mês,
+users/{id}/arquivo/{AAAA-MM}:
+
+    {
+        'mes': '2023-04',
+        'quantidade': 183,
+        'dados': <JSON das transações comprimido com zlib>,
+        'arquivado_em': <timestamp>,
+    }
+
+As consultas das listagens e relatórios leem os pacotes só quando o
+intervalo pedido começa antes do mês limite (`mes_limite`); as consultas de
+dados recentes continuam lendo apenas as subcoleções, que passam a ter só as
+transações recentes. Transações arquivadas não são editáveis, não aparecem
+na busca nem na sincronização; continuam contadas no saldo, no índice de
+categorias, nos orçamentos e no modelo de leitura (os comandos que recalculam
+esses dados usam `FirestoreClient.iterar_transacoes`). Os modelos de transações recorrentes nunca são
+arquivados.
+"""
+import datetime
+import json
+import zlib
+
+from django.conf import settings
+
+from .backup import codificar_valor, decodificar_valor
+
+COLECAO_ARQUIVO = 'arquivo'
+VERSAO_PACOTE = 1
+
+# Tamanho máximo dos dados comprimidos de um pacote (o limite de um
+# documento do Firestore é 1 MiB); meses maiores continuam nas subcoleções
+TAMANHO_MAXIMO_PACOTE = 900 * 1024
+
+# Pacotes lidos por consulta ao percorrer o arquivo na listagem
+PACOTES_POR_LEITURA = 3
+
+
+def mes_limite(hoje=None, meses=None):
+    """
+    Primeiro mês (AAAA-MM) que não é arquivado, ou None se o arquivo estiver
+    desativado (ARQUIVO_MESES = 0). Os pacotes só contêm meses anteriores.
+    """
+    meses = settings.ARQUIVO_MESES if meses is None else meses
+    if meses <= 0:
+        return None
+    hoje = hoje or datetime.date.today()
+    indice = hoje.year * 12 + hoje.month - 1 - meses
+    return f'{indice // 12:04d}-{indice % 12 + 1:02d}'
+
+
+def alcanca_arquivo(data_inicio, limite):
+    """
+    Indica se um intervalo que começa em `data_inicio` (None = sem início)
+    pode incluir meses arquivados.
+    """
+    return limite is not None and (not data_inicio or data_inicio[:7] < limite)
+
+
+def compactar(transacoes):
+    """
+    Comprime uma lista de transações (dicionários com 'tipo' e 'id').
+    """
+    texto = json.dumps([codificar_valor(transacao) for transacao in transacoes], separators=(',', ':'))
+    return zlib.compress(texto.encode('utf-8'), 9)
+
+
+def descompactar(dados):
+    """
+    Inverso de `compactar`.
+    """
+    return [decodificar_valor(transacao) for transacao in json.loads(zlib.decompress(dados))]
+
+
+def pacote(mes, transacoes):
+    """
+    Documento do pacote de um mês, com as transações ordenadas por data,
+    tipo e ID.
+    """
+    transacoes = sorted(transacoes, key=chave_transacao)
+    return {
+        'mes': mes,
+        'versao': VERSAO_PACOTE,
+        'quantidade': len(transacoes),
+        'dados': compactar(transacoes),
+    }
+
+
+def data_transacao(transacao):
+    return transacao.get('data_recebimento' if transacao['tipo'] == 'salario' else 'data') or ''
+
+
+def chave_transacao(transacao):
+    """
+    Chave (data, tipo, id) da ordem das listagens.
+    """
+    return data_transacao(transacao), transacao['tipo'], transacao['id']
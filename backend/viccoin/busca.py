@@ -0,0 +1,69 @@
+"""
+Termos do índice de busca das transações.
+
+O Firestore não faz buscas por substring, então cada despesa e ganho grava em
+`termos_busca` os tokens normalizados (minúsculos e sem acentos) de
+`descricao` e `local` e todos os seus prefixos. O índice de arrays do
+Firestore, que fica na subcoleção de cada usuário, funciona como um índice
+invertido: `array_contains` encontra as transações de um termo sem ler as
+demais.
+"""
+import re
+import unicodedata
+
+CAMPO_TERMOS = 'termos_busca'
+
+# Campos indexados
+CAMPOS_BUSCA = ('descricao', 'local')
+
+# Tamanho mínimo de um prefixo indexado e tamanho máximo de um termo; termos
+# de busca maiores são truncados da mesma forma
+PREFIXO_MINIMO = 2
+TERMO_MAXIMO = 20
+
+# Limite de termos por transação, para manter o documento e o índice pequenos
+MAX_TERMOS = 200
+
+_SEPARADORES = re.compile(r'[^0-9a-z]+')
+
+
+def normalizar(texto):
+    """
+    Converte o texto em tokens minúsculos, sem acentos e sem pontuação.
+    """
+    if not texto:
+        return []
+    decomposto = unicodedata.normalize('NFKD', str(texto).lower())
+    sem_acentos = ''.join(caractere for caractere in decomposto if not unicodedata.combining(caractere))
+    return [token for token in _SEPARADORES.split(sem_acentos) if token]
+
+
+def termo(token):
+    """
+    Forma de um token como é gravado no índice.
+    """
+    return token[:TERMO_MAXIMO]
+
+
+def termos_busca(dados):
+    """
+    Termos indexados de uma transação: os prefixos de cada token de
+    CAMPOS_BUSCA a partir de PREFIXO_MINIMO caracteres (tokens menores não
+    são indexados).
+    """
+    termos = set()
+    for campo in CAMPOS_BUSCA:
+        for token in normalizar(dados.get(campo)):
+            token = termo(token)
+            termos.update(token[:tamanho] for tamanho in range(PREFIXO_MINIMO, len(token) + 1))
+    return sorted(termos)[:MAX_TERMOS]
+
+
+def termos_consulta(consulta):
+    """
+    Termos de uma consulta, do mais seletivo (mais longo) para o menos.
+    Cada palavra da consulta é tratada como prefixo; palavras com menos de
+    PREFIXO_MINIMO caracteres são ignoradas.
+    """
+    termos = {termo(token) for token in normalizar(consulta) if len(token) >= PREFIXO_MINIMO}
+    return sorted(termos, key=lambda valor: (-len(valor), valor))
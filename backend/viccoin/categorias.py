@@ -0,0 +1,185 @@
+"""
+Índice de categorias de cada usuário.
+
+O documento users/{id}/indices/categorias guarda, por tipo de transação, o
+número de usos e o último uso de cada categoria, e quantas vezes as palavras
+das descrições apareceram com cada categoria:
+
+    {
+        'despesa': {
+            'categorias': {'Alimentação': {'usos': 12, 'ultimo_uso': <timestamp>}},
+            'palavras': {'p1c7': {'Alimentação': 7}},
+        },
+        'ganho': {...},
+    }
+
+As palavras são contadas em GRUPOS_PALAVRAS grupos (`grupo_palavra`), e não
+uma a uma: as escritas são incrementos sem leitura do documento, então só um
+conjunto fixo de chaves mantém o mapa longe dos limites do Firestore (1 MiB e
+40 mil entradas de índice por documento) qualquer que seja o vocabulário do
+usuário. Palavras do mesmo grupo somam suas contagens, o que pouco afeta as
+sugestões, feitas com várias palavras da descrição.
+
+O documento é atualizado com incrementos no mesmo batch de cada escrita de
+transação (`AlteracoesCategorias`), então o seletor de categorias e as
+sugestões custam a leitura de um único documento.
+"""
+import datetime
+import zlib
+
+from firebase_admin import firestore
+
+from users.models import ESQUEMAS_TRANSACAO
+from .busca import normalizar
+
+# Caminho do documento do índice, relativo a users/{id}
+DOCUMENTO_INDICE = 'indices/categorias'
+
+# Tipos de transação que têm categoria
+TIPOS_CATEGORIA = tuple(
+    tipo for tipo, esquema in ESQUEMAS_TRANSACAO.items()
+    if any(nome == 'categoria' for nome, _, _ in esquema)
+)
+
+# Palavras de cada descrição contadas no índice e seu tamanho mínimo
+PALAVRAS_POR_TRANSACAO = 5
+PALAVRA_MINIMA = 3
+
+# Grupos em que as palavras são contadas, por tipo
+GRUPOS_PALAVRAS = 1024
+
+_MOMENTO_MINIMO = datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
+
+
+def palavras_descricao(descricao):
+    """
+    Palavras de uma descrição usadas nas sugestões de categoria.
+    """
+    palavras = []
+    for palavra in normalizar(descricao):
+        if len(palavra) >= PALAVRA_MINIMA and palavra not in palavras:
+            palavras.append(palavra)
+            if len(palavras) == PALAVRAS_POR_TRANSACAO:
+                break
+    return palavras
+
+
+def grupo_palavra(palavra):
+    """
+    Chave do grupo de uma palavra no mapa 'palavras' do índice.
+    """
+    return f"p{zlib.crc32(palavra.encode()) % GRUPOS_PALAVRAS:x}"
+
+
+def grupos_descricao(descricao):
+    """
+    Grupos das palavras de uma descrição, sem repetições.
+    """
+    return list(dict.fromkeys(grupo_palavra(palavra) for palavra in palavras_descricao(descricao)))
+
+
+class AlteracoesCategorias:
+    """
+    Acumula as variações do índice de categorias causadas por um conjunto de
+    escritas de transações, para gravá-las com uma única escrita no batch.
+    """
+    __slots__ = ('categorias', 'palavras')
+
+    def __init__(self):
+        self.categorias = {}
+        self.palavras = {}
+
+    def adicionar(self, tipo, dados, sinal=1):
+        """
+        Conta (sinal 1) ou desconta (sinal -1) uma transação no índice.
+        """
+        categoria = dados.get('categoria')
+        if tipo not in TIPOS_CATEGORIA or not categoria:
+            return
+        chave = (tipo, categoria)
+        self.categorias[chave] = self.categorias.get(chave, 0) + sinal
+        for grupo in grupos_descricao(dados.get('descricao')):
+            chave = (tipo, grupo, categoria)
+            self.palavras[chave] = self.palavras.get(chave, 0) + sinal
+
+    def alterar(self, tipo, antes, depois):
+        """
+        Troca a contagem de uma transação alterada de `antes` para `depois`.
+        """
+        if antes.get('categoria') == depois.get('categoria') and antes.get('descricao') == depois.get('descricao'):
+            return
+        self.adicionar(tipo, antes, -1)
+        self.adicionar(tipo, depois, 1)
+
+    def to_firestore(self):
+        """
+        Dados para `set(..., merge=True)` no documento do índice, ou None se
+        nada mudou.
+        """
+        dados = {}
+        for (tipo, categoria), delta in self.categorias.items():
+            if not delta:
+                continue
+            entrada = {'usos': firestore.Increment(delta)}
+            if delta > 0:
+                entrada['ultimo_uso'] = firestore.SERVER_TIMESTAMP
+            dados.setdefault(tipo, {}).setdefault('categorias', {})[categoria] = entrada
+        for (tipo, grupo, categoria), delta in self.palavras.items():
+            if delta:
+                palavras = dados.setdefault(tipo, {}).setdefault('palavras', {})
+                palavras.setdefault(grupo, {})[categoria] = firestore.Increment(delta)
+        return dados or None
+
+
+def sugerir_categorias(indice, tipo, prefixo=None, descricao=None, limite=20):
+    """
+    Monta as categorias do tipo a partir do documento do índice.
+
+    Args:
+        indice: Dicionário do documento do índice (ou None)
+        tipo: 'despesa' ou 'ganho'
+        prefixo: Filtra as categorias cujo nome (ou uma de suas palavras)
+            começa com o prefixo, sem diferenciar maiúsculas nem acentos
+        descricao: Descrição da transação sendo criada, para sugerir as
+            categorias mais usadas com as mesmas palavras
+        limite: Número máximo de categorias
+
+    Returns:
+        Dicionário com 'categorias' (mais usadas primeiro, desempatando pelo
+        uso mais recente) e 'sugestoes' (nomes, a melhor primeiro)
+    """
+    dados_tipo = (indice or {}).get(tipo) or {}
+    categorias = [
+        {'nome': nome, 'usos': entrada.get('usos', 0), 'ultimo_uso': entrada.get('ultimo_uso')}
+        for nome, entrada in (dados_tipo.get('categorias') or {}).items()
+        if entrada.get('usos', 0) > 0
+    ]
+
+    if prefixo:
+        termos_prefixo = normalizar(prefixo)
+        if termos_prefixo:
+            procurado = ' '.join(termos_prefixo)
+            categorias = [
+                categoria for categoria in categorias
+                if ' '.join(normalizar(categoria['nome'])).startswith(procurado)
+                or any(palavra.startswith(procurado) for palavra in normalizar(categoria['nome']))
+            ]
+
+    categorias.sort(key=lambda categoria: (categoria['usos'], categoria['ultimo_uso'] or _MOMENTO_MINIMO), reverse=True)
+
+    sugestoes = []
+    if descricao:
+        pontos = {}
+        palavras = dados_tipo.get('palavras') or {}
+        for grupo in grupos_descricao(descricao):
+            for categoria, usos in (palavras.get(grupo) or {}).items():
+                if usos > 0:
+                    pontos[categoria] = pontos.get(categoria, 0) + usos
+        usos_categoria = {categoria['nome']: categoria['usos'] for categoria in categorias}
+        sugestoes = sorted(
+            (categoria for categoria in pontos if categoria in usos_categoria or not prefixo),
+            key=lambda categoria: (pontos[categoria], usos_categoria.get(categoria, 0)),
+            reverse=True
+        )[:3]
+
+    return {'categorias': categorias[:limite], 'sugestoes': sugestoes}
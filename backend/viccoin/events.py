@@ -0,0 +1,197 @@
+"""
+Distribuição de eventos de saldo e transações para conexões SSE.
+
+Cada usuário com ao menos uma conexão aberta tem um único conjunto de
+listeners do Firestore (`on_snapshot`): um no documento do usuário e um nos
+shards do saldo (viccoin/saldo.py), para o saldo, e um por coleção de
+transações, restrito às alterações feitas depois da abertura do canal. Os eventos são repassados a todas as conexões do
+usuário; quando a última fecha, os listeners são cancelados.
+
+Os callbacks dos listeners rodam em threads do cliente do Firestore; a
+entrega às conexões é feita com `call_soon_threadsafe` no event loop de cada
+uma.
+"""
+import asyncio
+import datetime
+import logging
+import threading
+
+from google.cloud.firestore_v1.watch import ChangeType
+
+from users.models import Transacao
+
+from .firebase import firestore_client, COLECOES_TRANSACAO
+from .saldo import COLECAO_SHARDS
+
+logger = logging.getLogger(__name__)
+
+ACOES = {
+    ChangeType.ADDED: 'criada',
+    ChangeType.MODIFIED: 'alterada',
+    ChangeType.REMOVED: 'removida',
+}
+
+
+class Assinatura:
+    """
+    Uma conexão inscrita nos eventos de um usuário.
+
+    Args:
+        user_id: ID do usuário
+        loop: Event loop da conexão
+        tamanho_fila: Máximo de eventos pendentes; quando cheia, o mais antigo
+            é descartado
+    """
+
+    def __init__(self, user_id, loop, tamanho_fila=100):
+        self.user_id = user_id
+        self.loop = loop
+        self.fila = asyncio.Queue(maxsize=tamanho_fila)
+
+    def publicar(self, evento):
+        """
+        Entrega um evento a partir de qualquer thread.
+        """
+        self.loop.call_soon_threadsafe(self._entregar, evento)
+
+    def _entregar(self, evento):
+        if self.fila.full():
+            self.fila.get_nowait()
+        self.fila.put_nowait(evento)
+
+
+class CanalUsuario:
+    """
+    Listeners do Firestore compartilhados pelas conexões de um usuário.
+    """
+
+    def __init__(self, client, user_id):
+        self.user_id = user_id
+        self.assinaturas = set()
+        self.saldo = None
+        # Partes do saldo: o campo do documento do usuário e os shards
+        self._saldo_usuario = None
+        self._saldo_shards = 0.0
+        self._lock = threading.Lock()
+
+        inicio = datetime.datetime.now(datetime.timezone.utc)
+        self.listeners = [
+            client.collection(f"users/{user_id}/{COLECAO_SHARDS}").on_snapshot(self._ao_alterar_shards),
+            client.document(f"users/{user_id}").on_snapshot(self._ao_alterar_usuario),
+        ]
+        for tipo, (colecao, _) in COLECOES_TRANSACAO.items():
+            query = client.collection(f"users/{user_id}/{colecao}").where('updated_at', '>', inicio)
+            self.listeners.append(query.on_snapshot(self._criar_callback_transacoes(tipo)))
+
+    def adicionar(self, assinatura):
+        with self._lock:
+            self.assinaturas.add(assinatura)
+            saldo = self.saldo
+        # Conexões novas recebem o saldo atual sem esperar uma alteração
+        if saldo is not None:
+            assinatura.publicar(('saldo', {'saldo': saldo}))
+
+    def remover(self, assinatura):
+        """
+        Remove uma conexão. Retorna True se o canal ficou sem conexões.
+        """
+        with self._lock:
+            self.assinaturas.discard(assinatura)
+            return not self.assinaturas
+
+    def encerrar(self):
+        for listener in self.listeners:
+            try:
+                listener.unsubscribe()
+            except Exception as e:
+                logger.warning("Erro ao cancelar listener do usuário %s: %s", self.user_id, e)
+
+    def _publicar(self, evento):
+        with self._lock:
+            assinaturas = list(self.assinaturas)
+        for assinatura in assinaturas:
+            assinatura.publicar(evento)
+
+    def _ao_alterar_usuario(self, snapshots, changes, read_time):
+        documento = snapshots[0] if snapshots else None
+        if documento is None or not documento.exists:
+            return
+        with self._lock:
+            self._saldo_usuario = documento.to_dict().get('saldo')
+        self._atualizar_saldo()
+
+    def _ao_alterar_shards(self, snapshots, changes, read_time):
+        soma = sum(float(documento.to_dict().get('saldo') or 0) for documento in snapshots)
+        with self._lock:
+            self._saldo_shards = soma
+        self._atualizar_saldo()
+
+    def _atualizar_saldo(self):
+        with self._lock:
+            if self._saldo_usuario is None:
+                return
+            saldo = self._saldo_usuario + self._saldo_shards if self._saldo_shards else self._saldo_usuario
+            if saldo == self.saldo:
+                return
+            self.saldo = saldo
+        self._publicar(('saldo', {'saldo': saldo}))
+
+    def _criar_callback_transacoes(self, tipo):
+        def callback(snapshots, changes, read_time):
+            for change in changes:
+                documento = change.document
+                acao = ACOES[change.type]
+                if acao == 'criada' and documento.create_time != documento.update_time:
+                    # Documento antigo que entrou na consulta por ter sido alterado
+                    acao = 'alterada'
+
+                evento = {'acao': acao, 'tipo': tipo, 'id': documento.id}
+                if acao != 'removida':
+                    evento['transacao'] = Transacao.from_snapshot(tipo, documento).to_dict()
+                self._publicar(('transacao', evento))
+        return callback
+
+
+class EventHub:
+    """
+    Mantém um `CanalUsuario` por usuário com conexões abertas.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._canais = {}
+        self._lock = threading.Lock()
+
+    def assinar(self, user_id, loop, tamanho_fila=100):
+        """
+        Inscreve uma conexão nos eventos do usuário, criando os listeners se
+        for a primeira.
+        """
+        assinatura = Assinatura(user_id, loop, tamanho_fila)
+        with self._lock:
+            canal = self._canais.get(user_id)
+            if canal is None:
+                canal = self._canais[user_id] = CanalUsuario(self.client, user_id)
+                logger.debug("Listeners criados para o usuário %s", user_id)
+            canal.adicionar(assinatura)
+        return assinatura
+
+    def cancelar(self, assinatura):
+        """
+        Remove a conexão e cancela os listeners se era a última do usuário.
+        """
+        with self._lock:
+            canal = self._canais.get(assinatura.user_id)
+            if canal is None or not canal.remover(assinatura):
+                return
+            del self._canais[assinatura.user_id]
+        canal.encerrar()
+        logger.debug("Listeners encerrados para o usuário %s", assinatura.user_id)
+
+    def usuarios_ativos(self):
+        with self._lock:
+            return len(self._canais)
+
+
+# Singleton para acesso global
+event_hub = EventHub(firestore_client)
@@ -8,6 +8,26 @@ import logging
 import time
 from functools import wraps
 import datetime
+import calendar
+import base64
+import heapq
+import itertools
+import threading
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition
+from users.models import ESQUEMAS_TRANSACAO, TIPOS_BUSCA, Transacao
+from .categorias import DOCUMENTO_INDICE, AlteracoesCategorias
+from .orcamentos import DOCUMENTO_ORCAMENTOS, AlteracoesOrcamentos, limites_firestore, mes_valido
+from .arquivo import (
+    COLECAO_ARQUIVO, PACOTES_POR_LEITURA, TAMANHO_MAXIMO_PACOTE, alcanca_arquivo, chave_transacao, data_transacao,
+    descompactar, mes_limite, pacote
+)
+from .busca import CAMPO_TERMOS, CAMPOS_BUSCA, termos_busca, termos_consulta
+from .agrupamento import AgrupadorEscritas
+from .saldo import (
+    CAMPO_SHARDS, COLECAO_SHARDS, descartar_soma, guardar_modo, guardar_soma, modo_em_cache,
+    shard_aleatorio, soma_em_cache, validar_shards
+)
+from .memory_firestore import MemoryFirestore
 
 # Configurar logger
 logger = logging.getLogger(__name__)
@@ -30,20 +50,47 @@ def retry_on_exception(max_retries=MAX_RETRIES, delay=RETRY_DELAY):
                 except Exception as e:
                     retries += 1
                     if retries >= max_retries:
-                        logger.error(f"Falha após {max_retries} tentativas: {str(e)}", exc_info=True)
+                        logger.error("Falha após %s tentativas: %s", max_retries, e, exc_info=True)
                         raise
                     
-                    logger.warning(f"Tentativa {retries} falhou: {str(e)}. Tentando novamente em {delay}s...")
+                    logger.warning("Tentativa %s falhou: %s. Tentando novamente em %ss...", retries, e, delay)
                     time.sleep(delay)
         return wrapper
     return decorator
 
+# Instância única do backend em memória, compartilhada por todos os clientes
+_memory_client = None
+_memory_client_lock = threading.Lock()
+
+def get_memory_client():
+    """
+    Retorna o cliente do Firestore em memória, criando-o na primeira chamada.
+    """
+    global _memory_client
+    with _memory_client_lock:
+        if _memory_client is None:
+            latency = getattr(settings, 'FIRESTORE_MEMORY_LATENCY_MS', 0) / 1000
+            _memory_client = MemoryFirestore(latency=latency)
+            logger.info("Usando backend do Firestore em memória (latência simulada: %ss)", latency)
+            
+            snapshot = getattr(settings, 'FIRESTORE_MEMORY_SNAPSHOT', None)
+            if snapshot and os.path.exists(snapshot):
+                _memory_client.load(snapshot)
+                logger.info("Dados do Firestore em memória carregados de %s", snapshot)
+        return _memory_client
+
 @retry_on_exception()
 def initialize_firebase():
     """
     Inicializa o SDK do Firebase Admin com as credenciais fornecidas.
     Retorna o cliente do Firestore.
+    
+    Com FIRESTORE_BACKEND='memory', retorna o backend em memória e não
+    precisa de credenciais.
     """
+    if getattr(settings, 'FIRESTORE_BACKEND', 'firebase') == 'memory':
+        return get_memory_client()
+    
     try:
         # Verificar se o Firebase já foi inicializado
         app = firebase_admin.get_app()
@@ -71,13 +118,13 @@ def initialize_firebase():
                         temp.write(firebase_creds_json.encode())
                         temp_path = temp.name
                     
-                    logger.info(f"Arquivo temporário criado em: {temp_path}")
+                    logger.info("Arquivo temporário criado em: %s", temp_path)
                     cred = credentials.Certificate(temp_path)
                     # Remover o arquivo após uso
                     os.unlink(temp_path)
                     logger.info("Credenciais carregadas via arquivo temporário")
                 except Exception as e:
-                    logger.error(f"Erro ao criar arquivo temporário: {str(e)}")
+                    logger.error("Erro ao criar arquivo temporário: %s", e)
                     raise
         else:
             logger.info("Variável de ambiente FIREBASE_CREDENTIALS_JSON não encontrada, tentando arquivo local")
@@ -85,12 +132,12 @@ def initialize_firebase():
             # Verificar primeiro se o arquivo está no diretório raiz do projeto
             root_creds_path = os.path.join(os.path.dirname(settings.BASE_DIR), 'viccoin-a2fa7-firebase-adminsdk-fbsvc-9e866bc6d3.json')
             if os.path.exists(root_creds_path):
-                logger.info(f"Usando arquivo de credenciais encontrado em: {root_creds_path}")
+                logger.info("Usando arquivo de credenciais encontrado em: %s", root_creds_path)
                 cred = credentials.Certificate(root_creds_path)
             else:
                 # Usar o caminho configurado nas settings como fallback
                 creds_path = settings.FIREBASE_CREDENTIALS_PATH
-                logger.info(f"Tentando usar arquivo de credenciais configurado: {creds_path}")
+                logger.info("Tentando usar arquivo de credenciais configurado: %s", creds_path)
                 
                 if os.path.exists(creds_path):
                     cred = credentials.Certificate(creds_path)
@@ -104,7 +151,7 @@ def initialize_firebase():
                     
                     for path in alternative_paths:
                         if os.path.exists(path):
-                            logger.info(f"Encontrado arquivo de credenciais alternativo em: {path}")
+                            logger.info("Encontrado arquivo de credenciais alternativo em: %s", path)
                             cred = credentials.Certificate(path)
                             break
                     else:
@@ -116,13 +163,347 @@ def initialize_firebase():
             logger.info("Firebase inicializado com sucesso")
             return firestore.client()
         except Exception as e:
-            logger.error(f"Erro na inicialização do Firebase: {str(e)}")
+            logger.error("Erro na inicialização do Firebase: %s", e)
             raise
 
+def montar_despesa(dados):
+    """
+    Monta o documento de uma despesa no formato salvo em users/{id}/despesas.
+    """
+    return Transacao.from_dict('despesa', dados).to_firestore()
+
+def montar_ganho(dados):
+    """
+    Monta o documento de um ganho no formato salvo em users/{id}/ganhos.
+    """
+    return Transacao.from_dict('ganho', dados).to_firestore()
+
+def montar_salario(dados):
+    """
+    Monta o documento de um salário no formato salvo em users/{id}/salario.
+    """
+    return Transacao.from_dict('salario', dados).to_firestore()
+
+# Subcoleção e campo de data de cada tipo de transação
+COLECOES_TRANSACAO = {
+    'despesa': ('despesas', 'data'),
+    'ganho': ('ganhos', 'data'),
+    'salario': ('salario', 'data_recebimento'),
+}
+
+# Máximo de períodos por agrupamento na série temporal
+SERIE_MAX_PERIODOS = {
+    'mensal': 36,
+    'semanal': 104,
+}
+
+# Campos que podem ser alterados em cada tipo de transação
+CAMPOS_EDITAVEIS = {
+    tipo: tuple(nome for nome, _, _ in esquema) for tipo, esquema in ESQUEMAS_TRANSACAO.items()
+}
+
+def sinal_saldo(tipo):
+    """
+    Sinal com que o valor de uma transação do tipo entra no saldo.
+    """
+    return -1 if tipo == 'despesa' else 1
+
+def normalizar_alteracoes(tipo, dados):
+    """
+    Filtra e valida os campos de uma alteração de transação.
+    
+    Raises:
+        ValueError: Se o tipo for desconhecido, nenhum campo editável for
+            informado ou o valor for inválido
+    """
+    if tipo not in CAMPOS_EDITAVEIS:
+        raise ValueError(f"Tipo de transação inválido: {tipo}")
+    
+    campos = {
+        nome: conversor(dados[nome]) if dados[nome] is not None else padrao
+        for nome, conversor, padrao in ESQUEMAS_TRANSACAO[tipo] if nome in dados
+    }
+    if not campos:
+        raise ValueError('Nenhum campo para atualizar')
+    if 'valor' in campos and not campos['valor']:
+        raise ValueError('Valor é obrigatório')
+    return campos
+
+# Campos que podem ser pedidos com `fields=` nas listagens e relatórios
+CAMPOS_RESPOSTA = frozenset(
+    nome for esquema in ESQUEMAS_TRANSACAO.values() for nome, _, _ in esquema
+) | {'id', 'tipo', 'updated_at', 'origem_recorrencia', 'substitui'}
+
+# Campos lidos pelos resumos (totais por tipo e por categoria)
+CAMPOS_RESUMO = ('valor', 'tipo', 'categoria')
+
+def normalizar_campos(texto):
+    """
+    Converte o parâmetro `fields` ('valor,data,categoria') na tupla de campos
+    pedidos, ou None se nenhum campo for informado.
+
+    Raises:
+        ValueError: Se algum campo for desconhecido
+    """
+    campos = tuple(dict.fromkeys(campo.strip() for campo in (texto or '').split(',') if campo.strip()))
+    desconhecidos = [campo for campo in campos if campo not in CAMPOS_RESPOSTA]
+    if desconhecidos:
+        raise ValueError(f"Campos inválidos: {', '.join(desconhecidos)}")
+    return campos or None
+
+def projecao(tipo, campos):
+    """
+    Campos lidos do Firestore (`select`) para montar as transações de um tipo
+    com `campos`. O campo de data sempre é lido: ele ordena as listagens e
+    forma os cursores; 'id' e 'tipo' não são lidos do documento.
+    """
+    _, campo_data = COLECOES_TRANSACAO[tipo]
+    return list(dict.fromkeys(campo for campo in (campo_data, *campos) if campo not in ('id', 'tipo')))
+
+def filtrar_campos(dados, campos):
+    """
+    Restringe o dicionário de uma transação aos `campos` pedidos e ao ID.
+    """
+    filtrados = {campo: dados[campo] for campo in campos if campo in dados}
+    filtrados['id'] = dados.get('id')
+    return filtrados
+
+# Subcoleção com os marcadores de transações removidas, lidos pela sincronização
+COLECAO_REMOVIDAS = 'removidas'
+
+# Coleções lidas pela sincronização incremental, com o tipo de transação de
+# cada uma (None para os marcadores de remoção)
+COLECOES_SYNC = {colecao: tipo for tipo, (colecao, _) in COLECOES_TRANSACAO.items()}
+COLECOES_SYNC[COLECAO_REMOVIDAS] = None
+
+def codificar_token_sync(posicao):
+    """
+    Codifica a posição da última alteração entregue em um token opaco.
+    
+    Args:
+        posicao: Tupla (datetime com fuso horário, coleção, id do documento);
+            o instante é o valor de 'updated_at' e a coleção e o id desempatam
+            documentos gravados no mesmo commit
+    """
+    momento, colecao, documento_id = posicao
+    micros = calendar.timegm(momento.utctimetuple()) * 1000000 + momento.microsecond
+    return f"{micros:x}.{colecao}.{documento_id}"
+
+def decodificar_token_sync(token):
+    """
+    Decodifica um token de `codificar_token_sync`.
+    
+    Returns:
+        Tupla (datetime em UTC, coleção, id do documento)
+        
+    Raises:
+        ValueError: Se o token for inválido
+    """
+    partes = token.split('.', 2)
+    if len(partes) != 3 or partes[1] not in COLECOES_SYNC or not partes[2] or '/' in partes[2]:
+        raise ValueError(f'Token de sincronização inválido: {token}')
+    micros, colecao, documento_id = partes
+    micros = int(micros, 16)
+    if micros < 0:
+        raise ValueError(f'Token de sincronização fora do intervalo: {token}')
+    try:
+        momento = datetime.datetime.fromtimestamp(micros // 1000000, tz=datetime.timezone.utc)
+    except (OverflowError, OSError):
+        # Instantes fora do intervalo de datetime ou do relógio da plataforma
+        raise ValueError(f'Token de sincronização fora do intervalo: {token}')
+    return momento.replace(microsecond=micros % 1000000), colecao, documento_id
+
+def codificar_cursor(chave):
+    """
+    Codifica a chave (data, tipo, id) da última transação de uma página em um
+    cursor opaco para a página seguinte.
+    """
+    return base64.urlsafe_b64encode(json.dumps(list(chave)).encode()).decode().rstrip('=')
+
+def decodificar_cursor(cursor):
+    """
+    Decodifica um cursor de `codificar_cursor`.
+    
+    Raises:
+        ValueError: Se o cursor for inválido
+    """
+    try:
+        data, tipo, transacao_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError('Cursor inválido')
+    if tipo not in COLECOES_TRANSACAO:
+        raise ValueError('Cursor inválido')
+    return str(data), tipo, str(transacao_id)
+
+def calcular_intervalo(periodo, hoje=None):
+    """
+    Calcula o intervalo de datas ('YYYY-MM-DD') que contém a data de hoje.
+    
+    Args:
+        periodo: 'semanal', 'mensal' ou 'anual'
+        hoje: Data de referência (padrão: data atual)
+        
+    Returns:
+        Tupla (data_inicio, data_fim), ou (None, None) para período desconhecido
+    """
+    hoje = hoje or datetime.datetime.now().date()
+    if periodo == 'semanal':
+        # Início da semana (segunda-feira)
+        dia_semana = hoje.weekday()
+        inicio = hoje - datetime.timedelta(days=dia_semana)
+        fim = hoje + datetime.timedelta(days=6-dia_semana)
+    elif periodo == 'mensal':
+        # Início do mês
+        inicio = hoje.replace(day=1)
+        # Fim do mês (trata diferentes números de dias por mês)
+        if hoje.month == 12:
+            fim = hoje.replace(year=hoje.year+1, month=1, day=1)
+        else:
+            fim = hoje.replace(month=hoje.month+1, day=1)
+        fim = fim - datetime.timedelta(days=1)
+    elif periodo == 'anual':
+        inicio = hoje.replace(month=1, day=1)
+        fim = hoje.replace(month=12, day=31)
+    else:
+        return None, None
+    return inicio.strftime('%Y-%m-%d'), fim.strftime('%Y-%m-%d')
+
+# Intervalo, em dias, das recorrências que não são mensais
+PASSOS_RECORRENCIA = {'semanal': 7, 'quinzenal': 14}
+
+# Máximo de escritas por batch do Firestore
+MAX_ESCRITAS_BATCH = 500
+
+def datas_recorrencia(origem, periodo, desde, ate):
+    """
+    Gera as datas em que uma transação recorrente se repete dentro de
+    [desde, ate], sem incluir a data de origem.
+    
+    Args:
+        origem: Data (date) da transação original
+        periodo: 'mensal' (padrão), 'quinzenal' ou 'semanal'
+        desde, ate: Limites do intervalo (date, inclusivos)
+    """
+    if periodo in PASSOS_RECORRENCIA:
+        passo = PASSOS_RECORRENCIA[periodo]
+        # Pular direto para a primeira repetição a partir de `desde`
+        saltos = max(1, -(-(desde - origem).days // passo))
+        data = origem + datetime.timedelta(days=saltos * passo)
+        while data <= ate:
+            yield data
+            data += datetime.timedelta(days=passo)
+        return
+    
+    # Mensal: mesmo dia do mês, limitado ao último dia dos meses mais curtos
+    ano, mes = origem.year, origem.month
+    while True:
+        ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+        data = datetime.date(ano, mes, min(origem.day, calendar.monthrange(ano, mes)[1]))
+        if data > ate:
+            return
+        if data >= desde:
+            yield data
+
+def montar_instancia_recorrente(tipo, modelo_id, modelo, data):
+    """
+    Monta o documento de uma ocorrência de uma transação recorrente.
+    
+    A ocorrência não é recorrente (só o modelo gera novas ocorrências) e
+    guarda o ID do modelo em 'origem_recorrencia'.
+    """
+    _, campo_data = COLECOES_TRANSACAO[tipo]
+    return Transacao.from_dict(tipo, {
+        **modelo,
+        campo_data: data.strftime('%Y-%m-%d'),
+        'recorrente': False,
+        'origem_recorrencia': modelo_id,
+        'substitui': None,
+    }).to_firestore()
+
+class ResumoTransacoes:
+    """
+    Acumula totais e categorias de transações em uma única passagem, sem
+    guardar os documentos.
+    """
+    __slots__ = ('total_despesas', 'total_ganhos', 'categorias', 'quantidade')
+    
+    def __init__(self):
+        self.total_despesas = 0.0
+        self.total_ganhos = 0.0
+        self.categorias = {}
+        self.quantidade = 0
+    
+    def adicionar(self, dados):
+        """
+        Soma uma transação (dicionário do Firestore) aos totais.
+        """
+        valor = float(dados.get('valor', 0))
+        categoria = dados.get('categoria', 'Sem categoria')
+        totais_categoria = self.categorias.get(categoria)
+        if totais_categoria is None:
+            totais_categoria = self.categorias[categoria] = {'despesas': 0, 'ganhos': 0}
+        
+        if dados.get('tipo') == 'despesa':
+            self.total_despesas += valor
+            totais_categoria['despesas'] += valor
+        else:
+            if dados.get('tipo') in ('ganho', 'salario'):
+                self.total_ganhos += valor
+            totais_categoria['ganhos'] += valor
+        self.quantidade += 1
+    
+    def to_dict(self):
+        return {
+            'total_despesas': self.total_despesas,
+            'total_ganhos': self.total_ganhos,
+            'saldo_periodo': self.total_ganhos - self.total_despesas,
+            'categorias': self.categorias,
+            'quantidade': self.quantidade,
+        }
+
+class AlteracoesIndices:
+    """
+    Variações dos documentos derivados das transações (índice de categorias e
+    gastos dos orçamentos), gravadas no mesmo batch das transações.
+    """
+    __slots__ = ('categorias', 'orcamentos')
+    
+    # Escritas que `gravar` pode acrescentar a um batch
+    ESCRITAS = 2
+    
+    def __init__(self):
+        self.categorias = AlteracoesCategorias()
+        self.orcamentos = AlteracoesOrcamentos()
+    
+    def adicionar(self, tipo, dados, sinal=1):
+        self.categorias.adicionar(tipo, dados, sinal)
+        self.orcamentos.adicionar(tipo, dados, sinal)
+    
+    def alterar(self, tipo, antes, depois):
+        self.categorias.alterar(tipo, antes, depois)
+        self.orcamentos.alterar(tipo, antes, depois)
+    
+    def gravar(self, batch, cliente, user_id):
+        """
+        Acrescenta ao batch um `set(..., merge=True)` por documento alterado.
+        """
+        for documento, alteracoes in ((DOCUMENTO_INDICE, self.categorias), (DOCUMENTO_ORCAMENTOS, self.orcamentos)):
+            dados = alteracoes.to_firestore()
+            if dados:
+                batch.set(cliente.document(f"users/{user_id}/{documento}"), dados, merge=True)
+
 # Classe para encapsular operações do Firestore com retry
 class FirestoreClient:
     def __init__(self):
         self.db = None
+        self.observadores = []
+        self.agrupador = None
+        janela = getattr(settings, 'GRUPO_ESCRITAS_JANELA_MS', 0)
+        if janela > 0:
+            # Cada transação do grupo é uma escrita; o saldo e os índices completam o batch
+            self.agrupador = AgrupadorEscritas(
+                self._gravar_grupo, janela / 1000, MAX_ESCRITAS_BATCH - 1 - AlteracoesIndices.ESCRITAS
+            )
         self._initialize()
     
     def _initialize(self):
@@ -133,7 +514,7 @@ class FirestoreClient:
             self.db = initialize_firebase()
             logger.info("Cliente Firestore inicializado com sucesso")
         except Exception as e:
-            logger.error(f"Erro ao inicializar cliente Firestore: {str(e)}")
+            logger.error("Erro ao inicializar cliente Firestore: %s", e)
             # Não propagar o erro para evitar falha na inicialização da aplicação
             # O cliente tentará novamente nas operações subsequentes
     
@@ -165,116 +546,218 @@ class FirestoreClient:
         """
         return self.db.transaction()
     
+    def adicionar_observador(self, observador):
+        """
+        Registra um observador das escritas feitas por este cliente, como o
+        modelo de leitura relacional (viccoin/read_model.py).
+        
+        Depois de cada commit bem-sucedido, o observador recebe uma chamada a
+        `usuario_gravado(user_id, dados)`, `transacoes_gravadas(user_id,
+        itens, delta_saldo)`, com itens (tipo, id, dados completos), ou
+        `transacoes_removidas(user_id, chaves, delta_saldo)`.
+        """
+        self.observadores.append(observador)
+    
+    def notificar(self, evento, *args):
+        """
+        Repassa uma escrita aos observadores. Erros de um observador são
+        registrados e não afetam a escrita, que já foi confirmada.
+        """
+        for observador in self.observadores:
+            try:
+                getattr(observador, evento)(*args)
+            except Exception as e:
+                logger.error("Erro ao notificar %s de %s: %s", type(observador).__name__, evento, e)
+    
+    def _shards_saldo(self, user_id):
+        """
+        Número de shards em que as escritas de saldo do usuário são
+        distribuídas (0 no modo normal), lido do cache ou do documento do
+        usuário (viccoin/saldo.py).
+        """
+        shards = modo_em_cache(user_id)
+        if shards is None:
+            usuario = self.document(f"users/{user_id}").get(field_paths=[CAMPO_SHARDS])
+            dados = usuario.to_dict() if usuario.exists else {}
+            guardar_modo(user_id, dados)
+            shards = dados.get(CAMPO_SHARDS) or 0
+        return shards
+    
+    def _incrementar_saldo(self, batch, user_id, delta_saldo):
+        """
+        Acrescenta ao batch o incremento do saldo: no documento do usuário ou,
+        no modo distribuído, em um shard sorteado.
+        
+        Returns:
+            True se o incremento foi para um shard (a soma em cache deve ser
+            descartada depois do commit)
+        """
+        shards = self._shards_saldo(user_id)
+        if shards:
+            shard_ref = self.document(f"users/{user_id}/{COLECAO_SHARDS}/{shard_aleatorio(shards)}")
+            batch.update(shard_ref, {'saldo': firestore.Increment(delta_saldo)})
+            return True
+        batch.update(self.document(f"users/{user_id}"), {'saldo': firestore.Increment(delta_saldo)})
+        return False
+    
+    def _gravar_transacao(self, user_id, transacao_ref, dados, delta_saldo, indices=None):
+        """
+        Cria a transação e aplica a variação do saldo (e dos índices de
+        categorias e orçamentos, se houver) em um único batch.
+        
+        Não repete a escrita: as repetições ficam em `_gravar_transacoes`, que
+        chama este método.
+        
+        Returns:
+            True se o documento foi criado, False se já existia
+        """
+        batch = self.batch()
+        batch.create(transacao_ref, dados)
+        distribuido = self._incrementar_saldo(batch, user_id, delta_saldo)
+        if indices is not None:
+            indices.gravar(batch, self, user_id)
+        try:
+            batch.commit()
+        except AlreadyExists:
+            logger.debug("Transação já gravada, ignorando repetição: %s", transacao_ref.id)
+            return False
+        if distribuido:
+            descartar_soma(user_id)
+        return True
+    
     @retry_on_exception()
-    def add_despesa(self, user_id, dados_despesa):
+    def _gravar_transacoes(self, user_id, itens):
+        """
+        Cria as transações (tipo, referência, dados, variação do saldo) em um
+        único batch, com uma variação combinada do saldo e dos índices.
+        
+        Se alguma já existia (repetição de uma escrita confirmada), nenhuma é
+        gravada pelo batch e cada uma é gravada com `_gravar_transacao`.
+        
+        Os IDs dos documentos são definidos antes da primeira tentativa: se uma
+        tentativa anterior já gravou o batch e só a resposta se perdeu, a
+        repetição encontra os documentos existentes e não altera o saldo de novo.
+        
+        Returns:
+            Lista com True para cada transação criada e False para as que já
+            existiam
+        """
+        if len(itens) == 1:
+            tipo, transacao_ref, dados, delta_saldo = itens[0]
+            indices = AlteracoesIndices()
+            indices.adicionar(tipo, dados)
+            return [self._gravar_transacao(user_id, transacao_ref, dados, delta_saldo, indices)]
+        
+        batch = self.batch()
+        indices = AlteracoesIndices()
+        for tipo, transacao_ref, dados, _ in itens:
+            batch.create(transacao_ref, dados)
+            indices.adicionar(tipo, dados)
+        distribuido = self._incrementar_saldo(batch, user_id, sum(item[3] for item in itens))
+        indices.gravar(batch, self, user_id)
+        try:
+            batch.commit()
+        except AlreadyExists:
+            logger.debug("Grupo com transação já gravada, gravando %s transações uma a uma", len(itens))
+            criadas = []
+            for tipo, transacao_ref, dados, delta_saldo in itens:
+                indices = AlteracoesIndices()
+                indices.adicionar(tipo, dados)
+                criadas.append(self._gravar_transacao(user_id, transacao_ref, dados, delta_saldo, indices))
+            return criadas
+        if distribuido:
+            descartar_soma(user_id)
+        return [True] * len(itens)
+    
+    def _gravar_grupo(self, user_id, itens):
+        """
+        Grava um grupo de transações do usuário e notifica os observadores
+        uma única vez com as que foram criadas.
+        """
+        criadas = self._gravar_transacoes(user_id, itens)
+        gravadas = [item for item, criada in zip(itens, criadas) if criada]
+        if gravadas:
+            self.notificar(
+                'transacoes_gravadas', user_id,
+                [(tipo, transacao_ref.id, dados) for tipo, transacao_ref, dados, _ in gravadas],
+                sum(item[3] for item in gravadas)
+            )
+        return criadas
+    
+    def _adicionar_transacao(self, user_id, tipo, dados, delta_saldo, transacao_id=None):
+        """
+        Cria uma transação. Com GRUPO_ESCRITAS_JANELA_MS, a escrita é agrupada
+        com as demais do usuário na janela (viccoin/agrupamento.py).
+        """
+        colecao, _ = COLECOES_TRANSACAO[tipo]
+        transacao_ref = self.collection(f"users/{user_id}/{colecao}").document(transacao_id)
+        item = (tipo, transacao_ref, dados, delta_saldo)
+        if self.agrupador is not None:
+            self.agrupador.enviar(user_id, item)
+        else:
+            self._gravar_grupo(user_id, [item])
+        return transacao_ref.id
+    
+    def add_despesa(self, user_id, dados_despesa, transacao_id=None):
         """
         Adiciona uma nova despesa à subcoleção 'despesas' de um usuário.
         
         Args:
             user_id: ID do documento do usuário
             dados_despesa: Dicionário com os dados da despesa
+            transacao_id: ID do documento a criar (por exemplo, derivado de uma
+                Idempotency-Key), ou None para gerar um
         
         Returns:
             ID do documento criado
         """
         try:
-            despesa_ref = self.collection(f"users/{user_id}/despesas").add({
-                'valor': float(dados_despesa.get('valor', 0)),
-                'data': dados_despesa.get('data'),
-                'descricao': dados_despesa.get('descricao', ''),
-                'local': dados_despesa.get('local', ''),
-                'categoria': dados_despesa.get('categoria', ''),
-                'recorrente': dados_despesa.get('recorrente', False),
-                'tipo': 'despesa'
-            })
-            
-            # Atualiza o saldo do usuário
-            usuario_ref = self.document(f"users/{user_id}")
-            usuario = usuario_ref.get()
-            
-            if usuario.exists:
-                saldo_atual = usuario.to_dict().get('saldo', 0)
-                novo_saldo = saldo_atual - float(dados_despesa.get('valor', 0))
-                usuario_ref.update({'saldo': novo_saldo})
-            
-            return despesa_ref[1].id
+            transacao = Transacao.from_dict('despesa', dados_despesa)
+            return self._adicionar_transacao(user_id, 'despesa', transacao.to_firestore(), -transacao.valor, transacao_id)
         except Exception as e:
-            logger.error(f"Erro ao adicionar despesa: {str(e)}")
+            logger.error("Erro ao adicionar despesa: %s", e)
             raise
     
-    @retry_on_exception()
-    def add_ganho(self, user_id, dados_ganho):
+    def add_ganho(self, user_id, dados_ganho, transacao_id=None):
         """
         Adiciona um novo ganho à subcoleção 'ganhos' de um usuário.
         
         Args:
             user_id: ID do documento do usuário
             dados_ganho: Dicionário com os dados do ganho
+            transacao_id: ID do documento a criar, ou None para gerar um
         
         Returns:
             ID do documento criado
         """
         try:
-            ganho_ref = self.collection(f"users/{user_id}/ganhos").add({
-                'valor': float(dados_ganho.get('valor', 0)),
-                'data': dados_ganho.get('data'),
-                'descricao': dados_ganho.get('descricao', ''),
-                'categoria': dados_ganho.get('categoria', ''),
-                'recorrente': dados_ganho.get('recorrente', False),
-                'tipo': 'ganho'
-            })
-            
-            # Atualiza o saldo do usuário
-            usuario_ref = self.document(f"users/{user_id}")
-            usuario = usuario_ref.get()
-            
-            if usuario.exists:
-                saldo_atual = usuario.to_dict().get('saldo', 0)
-                novo_saldo = saldo_atual + float(dados_ganho.get('valor', 0))
-                usuario_ref.update({'saldo': novo_saldo})
-            
-            return ganho_ref[1].id
+            transacao = Transacao.from_dict('ganho', dados_ganho)
+            return self._adicionar_transacao(user_id, 'ganho', transacao.to_firestore(), transacao.valor, transacao_id)
         except Exception as e:
-            logger.error(f"Erro ao adicionar ganho: {str(e)}")
+            logger.error("Erro ao adicionar ganho: %s", e)
             raise
     
-    @retry_on_exception()
-    def add_salario(self, user_id, dados_salario):
+    def add_salario(self, user_id, dados_salario, transacao_id=None):
         """
         Adiciona um novo registro de salário à subcoleção 'salario' de um usuário.
         
         Args:
             user_id: ID do documento do usuário
             dados_salario: Dicionário com os dados do salário
+            transacao_id: ID do documento a criar, ou None para gerar um
         
         Returns:
             ID do documento criado
         """
         try:
-            salario_ref = self.collection(f"users/{user_id}/salario").add({
-                'valor': float(dados_salario.get('valor', 0)),
-                'data_recebimento': dados_salario.get('data_recebimento'),
-                'periodo': dados_salario.get('periodo', 'mensal'),
-                'recorrente': dados_salario.get('recorrente', True),
-                'tipo': 'salario'
-            })
-            
-            # Atualiza o saldo do usuário
-            usuario_ref = self.document(f"users/{user_id}")
-            usuario = usuario_ref.get()
-            
-            if usuario.exists:
-                saldo_atual = usuario.to_dict().get('saldo', 0)
-                novo_saldo = saldo_atual + float(dados_salario.get('valor', 0))
-                usuario_ref.update({'saldo': novo_saldo})
-            
-            return salario_ref[1].id
+            transacao = Transacao.from_dict('salario', dados_salario)
+            return self._adicionar_transacao(user_id, 'salario', transacao.to_firestore(), transacao.valor, transacao_id)
         except Exception as e:
-            logger.error(f"Erro ao adicionar salário: {str(e)}")
+            logger.error("Erro ao adicionar salário: %s", e)
             raise
     
     @retry_on_exception()
-    def get_transacoes(self, user_id, tipo=None, limite=10):
+    def get_transacoes(self, user_id, tipo=None, limite=10, campos=None):
         """
         Obtém todas as transações (despesas, ganhos, salários) de um usuário.
         
@@ -282,6 +765,8 @@ class FirestoreClient:
             user_id: ID do documento do usuário
             tipo: Tipo de transação (despesa, ganho, salario) ou None para todas
             limite: Número máximo de transações a retornar por tipo
+            campos: Campos de cada transação (`normalizar_campos`), lidos com
+                projeção; None para todos
             
         Returns:
             Lista de transações
@@ -289,34 +774,384 @@ class FirestoreClient:
         transacoes = []
         
         try:
-            if tipo is None or tipo == 'despesa':
-                despesas_ref = self.collection(f"users/{user_id}/despesas").limit(limite).get()
-                for despesa in despesas_ref:
-                    dados = despesa.to_dict()
-                    dados['id'] = despesa.id
-                    transacoes.append(dados)
-            
-            if tipo is None or tipo == 'ganho':
-                ganhos_ref = self.collection(f"users/{user_id}/ganhos").limit(limite).get()
-                for ganho in ganhos_ref:
-                    dados = ganho.to_dict()
-                    dados['id'] = ganho.id
-                    transacoes.append(dados)
-            
-            if tipo is None or tipo == 'salario':
-                salarios_ref = self.collection(f"users/{user_id}/salario").limit(limite).get()
-                for salario in salarios_ref:
-                    dados = salario.to_dict()
-                    dados['id'] = salario.id
-                    transacoes.append(dados)
+            for tipo_atual, (colecao, _) in COLECOES_TRANSACAO.items():
+                if tipo is not None and tipo != tipo_atual:
+                    continue
+                query = self.collection(f"users/{user_id}/{colecao}")
+                if campos:
+                    query = query.select(projecao(tipo_atual, campos))
+                for documento in query.limit(limite).get():
+                    dados = Transacao.from_snapshot(tipo_atual, documento).to_dict()
+                    transacoes.append(filtrar_campos(dados, campos) if campos else dados)
             
             return transacoes
         except Exception as e:
-            logger.error(f"Erro ao obter transações: {str(e)}")
+            logger.error("Erro ao obter transações: %s", e)
+            raise
+
+    def _fluxo_recentes(self, user_id, tipo, limite, cursor=None, campos=None):
+        """
+        Gera as transações de um tipo da mais recente para a mais antiga, como
+        tuplas ((data, tipo, id), Transacao), começando depois de `cursor`.
+        Com `campos`, lê apenas os campos necessários (`projecao`).
+        """
+        colecao, campo_data = COLECOES_TRANSACAO[tipo]
+        query = self.collection(f"users/{user_id}/{colecao}")
+        if campos:
+            query = query.select(projecao(tipo, campos))
+        
+        if cursor is not None:
+            data, tipo_cursor, transacao_id = cursor
+            # A ordem global é (data, tipo, id) decrescente: no mesmo dia, os
+            # tipos "menores" que o do cursor ainda não foram entregues
+            if tipo < tipo_cursor:
+                query = query.where(campo_data, '<=', data)
+            elif tipo > tipo_cursor:
+                query = query.where(campo_data, '<', data)
+        
+        query = query.order_by(campo_data, direction=firestore.Query.DESCENDING) \
+            .order_by('__name__', direction=firestore.Query.DESCENDING)
+        if cursor is not None and tipo == cursor[1]:
+            query = query.start_after({campo_data: cursor[0], '__name__': cursor[2]})
+        
+        for documento in query.limit(limite).stream():
+            transacao = Transacao.from_snapshot(tipo, documento)
+            yield (transacao.data_transacao or '', tipo, documento.id), transacao
+    
+    @retry_on_exception()
+    def get_transacoes_recentes(self, user_id, limite=5, tipo=None, cursor=None, campos=None):
+        """
+        Obtém as transações mais recentes de um usuário, ordenadas por data
+        (decrescente) entre todos os tipos.
+        
+        Cada tipo é lido já ordenado e os resultados são combinados com um
+        merge k-way (heap), lendo no máximo `limite` documentos por tipo.
+        
+        Args:
+            user_id: ID do documento do usuário
+            limite: Número de transações a retornar
+            tipo: Restringe a um tipo (despesa, ganho, salario), ou None para todos
+            cursor: Cursor devolvido pela página anterior (`codificar_cursor`)
+            campos: Campos de cada transação (`normalizar_campos`), lidos com
+                projeção; None para todos
+            
+        Returns:
+            Tupla (transações, cursor da próxima página ou None)
+            
+        Raises:
+            ValueError: Se o cursor ou o tipo forem inválidos, ou o limite
+                menor que 1
+        """
+        if tipo and tipo not in COLECOES_TRANSACAO:
+            raise ValueError(f'Tipo de transação inválido: {tipo}')
+        if limite < 1:
+            raise ValueError('O limite deve ser maior que zero')
+        chave_cursor = decodificar_cursor(cursor) if cursor else None
+        tipos = [tipo] if tipo else list(COLECOES_TRANSACAO)
+        
+        try:
+            fluxos = [self._fluxo_recentes(user_id, t, limite, chave_cursor, campos) for t in tipos]
+            mesclados = heapq.merge(*fluxos, key=lambda item: item[0], reverse=True)
+            limite_arquivo = mes_limite()
+            if limite_arquivo is not None:
+                mesclados = self._com_arquivo(user_id, tipos, mesclados, chave_cursor, limite_arquivo)
+            pagina = list(itertools.islice(mesclados, limite))
+            
+            proximo = codificar_cursor(pagina[-1][0]) if len(pagina) == limite else None
+            transacoes = [
+                transacao if isinstance(transacao, dict) else transacao.to_dict() for _, transacao in pagina
+            ]
+            if campos:
+                transacoes = [filtrar_campos(dados, campos) for dados in transacoes]
+            return transacoes, proximo
+        except Exception as e:
+            logger.error("Erro ao obter transações recentes: %s", e)
             raise
 
+    def _com_arquivo(self, user_id, tipos, recentes, cursor, limite_arquivo):
+        """
+        Continua o fluxo das transações recentes com as arquivadas.
+        
+        Enquanto as transações têm data a partir do mês limite, apenas o fluxo
+        recente é consumido; o arquivo só é lido quando a listagem chega aos
+        meses arquivados. Daí em diante, os dois fluxos são mesclados (as
+        subcoleções podem ter transações antigas gravadas depois do arquivo).
+        """
+        corte = f"{limite_arquivo}-01"
+        for item in recentes:
+            if item[0][0] >= corte:
+                yield item
+                continue
+            restantes = itertools.chain([item], recentes)
+            break
+        else:
+            restantes = iter(())
+        
+        anterior = None
+        for item in heapq.merge(
+            restantes, self._fluxo_arquivo(user_id, tipos, cursor, limite_arquivo),
+            key=lambda item: item[0], reverse=True
+        ):
+            # Uma transação ainda não removida por um arquivamento interrompido
+            # aparece nos dois fluxos
+            if item[0] != anterior:
+                anterior = item[0]
+                yield item
+    
+    def _fluxo_arquivo(self, user_id, tipos, cursor, limite_arquivo):
+        """
+        Gera as transações arquivadas dos tipos, da mais recente para a mais
+        antiga, como tuplas ((data, tipo, id), dicionário), lendo
+        PACOTES_POR_LEITURA pacotes por consulta.
+        """
+        query = self.collection(f"users/{user_id}/{COLECAO_ARQUIVO}").where('mes', '<', limite_arquivo)
+        if cursor is not None:
+            query = query.where('mes', '<=', cursor[0][:7])
+        query = query.order_by('mes', direction=firestore.Query.DESCENDING).limit(PACOTES_POR_LEITURA)
+        
+        ultimo = None
+        while True:
+            pacotes = (query.start_after(ultimo) if ultimo is not None else query).get()
+            for documento in pacotes:
+                transacoes = [
+                    transacao for transacao in descompactar(documento.to_dict()['dados'])
+                    if transacao['tipo'] in tipos
+                ]
+                for transacao in reversed(transacoes):
+                    chave = chave_transacao(transacao)
+                    if cursor is None or chave < cursor:
+                        yield chave, transacao
+            if len(pacotes) < PACOTES_POR_LEITURA:
+                break
+            ultimo = pacotes[-1]
+    
+    def _fluxo_arquivo_periodo(self, user_id, tipos, data_inicio, data_fim, limite_arquivo):
+        """
+        Gera as transações arquivadas dos tipos com data no intervalo, da mais
+        antiga para a mais recente, como tuplas ((data, tipo, id), dicionário),
+        descompactando um pacote de cada vez.
+        """
+        query = self.collection(f"users/{user_id}/{COLECAO_ARQUIVO}").where('mes', '<', limite_arquivo)
+        if data_inicio:
+            query = query.where('mes', '>=', data_inicio[:7])
+        if data_fim:
+            query = query.where('mes', '<=', data_fim[:7])
+        
+        for documento in query.order_by('mes').stream():
+            for transacao in descompactar(documento.to_dict()['dados']):
+                if transacao['tipo'] not in tipos:
+                    continue
+                data = data_transacao(transacao)
+                if (not data_inicio or data >= data_inicio) and (not data_fim or data <= data_fim):
+                    yield chave_transacao(transacao), transacao
+    
+    def _fluxo_tipo_periodo(self, user_id, tipo, data_inicio, data_fim, limite, selecao=None):
+        """
+        Gera as transações de um tipo com data no intervalo, da mais antiga
+        para a mais recente, como tuplas ((data, tipo, id), snapshot).
+        """
+        _, campo_data = COLECOES_TRANSACAO[tipo]
+        query = self._consulta_periodo(user_id, tipo, data_inicio, data_fim).order_by(campo_data).limit(limite)
+        if selecao:
+            query = query.select(selecao)
+        for documento in query.stream():
+            yield (documento.to_dict().get(campo_data) or '', tipo, documento.id), documento
+    
+    def _fluxo_periodo(self, user_id, tipos, data_inicio, data_fim, limite, selecoes, estado):
+        """
+        Gera as transações dos tipos com data no intervalo como tuplas
+        (tipo, documento), até `limite` por tipo (estado['truncado'] indica o
+        corte). Os documentos são snapshots das subcoleções, lidos com os
+        campos de `selecoes[tipo]` (None para todos), ou dicionários dos
+        pacotes arquivados.
+        
+        Se o intervalo alcança os meses arquivados, cada tipo é lido em ordem
+        de data e mesclado (merge k-way) com os pacotes, que são descompactados
+        um de cada vez; a leitura para quando todos os tipos chegam ao limite.
+        """
+        limite_arquivo = mes_limite()
+        if not alcanca_arquivo(data_inicio, limite_arquivo):
+            for tipo in tipos:
+                query = self._consulta_periodo(user_id, tipo, data_inicio, data_fim).limit(limite)
+                if selecoes:
+                    query = query.select(selecoes[tipo])
+                lidos = 0
+                for documento in query.stream():
+                    lidos += 1
+                    yield tipo, documento
+                if lidos >= limite:
+                    estado['truncado'] = True
+            return
+        
+        fluxos = [
+            self._fluxo_tipo_periodo(user_id, tipo, data_inicio, data_fim, limite, selecoes and selecoes[tipo])
+            for tipo in tipos
+        ]
+        # Com chaves iguais, o merge entrega antes os fluxos das subcoleções
+        fluxos.append(self._fluxo_arquivo_periodo(user_id, tipos, data_inicio, data_fim, limite_arquivo))
+        lidos = dict.fromkeys(tipos, 0)
+        abertos = len(tipos)
+        anterior = None
+        for chave, documento in heapq.merge(*fluxos, key=lambda item: item[0]):
+            # Uma transação ainda não removida por um arquivamento interrompido
+            # aparece nos dois fluxos: vale a da subcoleção
+            if chave == anterior:
+                continue
+            anterior = chave
+            tipo = chave[1]
+            if lidos[tipo] >= limite:
+                continue
+            lidos[tipo] += 1
+            yield tipo, documento
+            if lidos[tipo] >= limite:
+                estado['truncado'] = True
+                abertos -= 1
+                if not abertos:
+                    return
+    
+    def _fluxo_busca(self, user_id, tipo, termos, data_inicio, data_fim, pagina, estado):
+        """
+        Gera as transações de um tipo que contêm todos os `termos`, da mais
+        recente para a mais antiga, como tuplas ((data, tipo, id), Transacao).
+        
+        A consulta usa o termo mais seletivo (`array_contains`) e os demais
+        são conferidos nos documentos retornados, lidos em páginas até
+        BUSCA_MAX_LEITURAS documentos (estado['truncado'] indica o corte).
+        """
+        _, campo_data = COLECOES_TRANSACAO[tipo]
+        principal, restantes = termos[0], termos[1:]
+        query = self._consulta_periodo(user_id, tipo, data_inicio, data_fim) \
+            .where(CAMPO_TERMOS, 'array_contains', principal) \
+            .order_by(campo_data, direction=firestore.Query.DESCENDING) \
+            .order_by('__name__', direction=firestore.Query.DESCENDING) \
+            .limit(pagina)
+        
+        ultimo = None
+        while True:
+            documentos = (query.start_after(ultimo) if ultimo is not None else query).get()
+            for documento in documentos:
+                termos_documento = documento.get(CAMPO_TERMOS)
+                if all(termo in termos_documento for termo in restantes):
+                    transacao = Transacao.from_snapshot(tipo, documento)
+                    yield (transacao.data_transacao or '', tipo, documento.id), transacao
+            
+            estado['lidos'] += len(documentos)
+            if len(documentos) < pagina:
+                return
+            if estado['lidos'] >= settings.BUSCA_MAX_LEITURAS:
+                estado['truncado'] = True
+                return
+            ultimo = documentos[-1]
+    
     @retry_on_exception()
-    def get_transacoes_por_periodo(self, user_id, periodo=None, data_inicio=None, data_fim=None, tipo=None, limite=100):
+    def get_indice_categorias(self, user_id):
+        """
+        Lê o índice de categorias do usuário (viccoin/categorias.py) com uma
+        única leitura de documento.
+        
+        Returns:
+            Dicionário do documento, ou {} se o usuário ainda não tem transações
+        """
+        try:
+            documento = self.document(f"users/{user_id}/{DOCUMENTO_INDICE}").get()
+            return documento.to_dict() if documento.exists else {}
+        except Exception as e:
+            logger.error("Erro ao obter índice de categorias: %s", e)
+            raise
+    
+    @retry_on_exception()
+    def get_orcamentos(self, user_id):
+        """
+        Lê os limites e os gastos mensais do usuário (viccoin/orcamentos.py)
+        com uma única leitura de documento.
+        
+        Returns:
+            Dicionário do documento, ou {} se o usuário ainda não tem despesas
+            nem orçamentos
+        """
+        try:
+            documento = self.document(f"users/{user_id}/{DOCUMENTO_ORCAMENTOS}").get()
+            return documento.to_dict() if documento.exists else {}
+        except Exception as e:
+            logger.error("Erro ao obter orçamentos: %s", e)
+            raise
+    
+    @retry_on_exception()
+    def definir_orcamentos(self, user_id, limites):
+        """
+        Define ou remove limites mensais de categorias, sem alterar os gastos.
+        
+        Args:
+            user_id: ID do documento do usuário
+            limites: Dicionário validado por `validar_limites`
+                ({categoria: valor, ou None para remover})
+        """
+        try:
+            self.document(f"users/{user_id}/{DOCUMENTO_ORCAMENTOS}").set(limites_firestore(limites), merge=True)
+        except Exception as e:
+            logger.error("Erro ao definir orçamentos: %s", e)
+            raise
+    
+    @retry_on_exception()
+    def buscar_transacoes(self, user_id, consulta, tipo=None, data_inicio=None, data_fim=None, limite=20):
+        """
+        Busca transações pelas palavras de `descricao` e `local`, usando o
+        índice de termos (viccoin/busca.py) em vez de ler todo o histórico.
+        
+        Cada palavra da consulta é um prefixo e todas precisam aparecer. Os
+        resultados de cada tipo são combinados por data (decrescente), como
+        em `get_transacoes_recentes`.
+        
+        Args:
+            user_id: ID do documento do usuário
+            consulta: Texto buscado
+            tipo: 'despesa' ou 'ganho', ou None para ambos
+            data_inicio, data_fim: Intervalo de datas ('YYYY-MM-DD'), opcionais
+            limite: Número máximo de transações
+            
+        Returns:
+            Dicionário com 'transacoes' e 'truncado' (True se a busca parou em
+            BUSCA_MAX_LEITURAS documentos lidos)
+            
+        Raises:
+            ValueError: Se a consulta não tiver palavras com ao menos 2 letras
+        """
+        termos = termos_consulta(consulta)
+        if not termos:
+            raise ValueError('Consulta sem palavras para buscar')
+        
+        try:
+            estado = {'lidos': 0, 'truncado': False}
+            tipos = [tipo] if tipo else list(TIPOS_BUSCA)
+            fluxos = [
+                self._fluxo_busca(user_id, t, termos, data_inicio, data_fim, limite, estado) for t in tipos
+            ]
+            mesclados = heapq.merge(*fluxos, key=lambda item: item[0], reverse=True)
+            pagina = list(itertools.islice(mesclados, limite))
+            
+            return {
+                'transacoes': [transacao.to_dict() for _, transacao in pagina],
+                'truncado': estado['truncado'],
+            }
+        except Exception as e:
+            logger.error("Erro ao buscar transações: %s", e)
+            raise
+
+    def _consulta_periodo(self, user_id, tipo, data_inicio=None, data_fim=None):
+        """
+        Monta a consulta de um tipo de transação filtrada pelo intervalo de datas.
+        """
+        colecao, campo_data = COLECOES_TRANSACAO[tipo]
+        query = self.collection(f"users/{user_id}/{colecao}")
+        if data_inicio:
+            query = query.where(campo_data, '>=', data_inicio)
+        if data_fim:
+            query = query.where(campo_data, '<=', data_fim)
+        return query
+
+    @retry_on_exception()
+    def get_transacoes_por_periodo(self, user_id, periodo=None, data_inicio=None, data_fim=None, tipo=None, limite=100,
+                                   apenas_resumo=False, campos=None):
         """
         Obtém transações de um usuário filtradas por período e/ou intervalo de datas.
         
@@ -326,116 +1161,700 @@ class FirestoreClient:
             data_inicio: Data inicial para filtro (formato 'YYYY-MM-DD')
             data_fim: Data final para filtro (formato 'YYYY-MM-DD')
             tipo: Tipo de transação ('despesa', 'ganho', 'salario') ou None para todas
-            limite: Número máximo de transações a retornar por tipo
+            limite: Número máximo de transações a retornar por tipo (até RELATORIO_LIMITE_MAXIMO)
+            apenas_resumo: Se True, não retorna as transações: os resultados são
+                lidos em streaming e agregados em uma única passagem, com até
+                RELATORIO_RESUMO_LIMITE documentos por tipo, lendo apenas a
+                data e CAMPOS_RESUMO de cada documento
+            campos: Campos de cada transação listada (`normalizar_campos`),
+                lidos com projeção junto com CAMPOS_RESUMO; None para todos
             
         Returns:
             Lista de transações filtradas e estatísticas agregadas
         """
-        transacoes = []
-        
         try:
             # Definir automaticamente intervalos de data com base no período, se não fornecidos
             if periodo and not (data_inicio and data_fim):
-                hoje = datetime.datetime.now().date()
-                if periodo == 'semanal':
-                    # Início da semana (segunda-feira)
-                    dia_semana = hoje.weekday()
-                    data_inicio = (hoje - datetime.timedelta(days=dia_semana)).strftime('%Y-%m-%d')
-                    data_fim = (hoje + datetime.timedelta(days=6-dia_semana)).strftime('%Y-%m-%d')
-                elif periodo == 'mensal':
-                    # Início do mês
-                    data_inicio = hoje.replace(day=1).strftime('%Y-%m-%d')
-                    # Fim do mês (trata diferentes números de dias por mês)
-                    if hoje.month == 12:
-                        data_fim = hoje.replace(year=hoje.year+1, month=1, day=1)
-                    else:
-                        data_fim = hoje.replace(month=hoje.month+1, day=1)
-                    data_fim = (data_fim - datetime.timedelta(days=1)).strftime('%Y-%m-%d')
-                elif periodo == 'anual':
-                    # Início do ano
-                    data_inicio = hoje.replace(month=1, day=1).strftime('%Y-%m-%d')
-                    # Fim do ano
-                    data_fim = hoje.replace(month=12, day=31).strftime('%Y-%m-%d')
-            
-            logger.info(f"Consultando transações de {data_inicio} até {data_fim}")
-            
-            # Obter transações de cada tipo com filtros de data
-            if tipo is None or tipo == 'despesa':
-                despesas_query = self.collection(f"users/{user_id}/despesas")
-                if data_inicio:
-                    despesas_query = despesas_query.where('data', '>=', data_inicio)
-                if data_fim:
-                    despesas_query = despesas_query.where('data', '<=', data_fim)
-                despesas_query = despesas_query.limit(limite)
-                despesas_ref = despesas_query.get()
+                data_inicio, data_fim = calcular_intervalo(periodo)
+            
+            logger.debug("Consultando transações de %s até %s", data_inicio, data_fim)
+            
+            if apenas_resumo:
+                limite = settings.RELATORIO_RESUMO_LIMITE
+            else:
+                limite = max(1, min(limite, settings.RELATORIO_LIMITE_MAXIMO))
+            
+            tipos = [tipo] if tipo else list(COLECOES_TRANSACAO)
+            if apenas_resumo:
+                selecoes = {t: [COLECOES_TRANSACAO[t][1], *CAMPOS_RESUMO] for t in tipos}
+            elif campos:
+                selecoes = {t: projecao(t, CAMPOS_RESUMO + campos) for t in tipos}
+            else:
+                selecoes = None
+            
+            # Obter as transações de cada tipo com filtros de data, agregando em uma única passagem
+            por_tipo = None if apenas_resumo else {t: [] for t in tipos}
+            resumo = ResumoTransacoes()
+            estado = {'truncado': False}
+            for tipo_atual, documento in self._fluxo_periodo(
+                user_id, tipos, data_inicio, data_fim, limite, selecoes, estado
+            ):
+                if isinstance(documento, dict):
+                    dados = documento
+                elif por_tipo is None:
+                    dados = documento.to_dict()
+                else:
+                    dados = Transacao.from_snapshot(tipo_atual, documento).to_dict()
+                resumo.adicionar(dados)
+                if por_tipo is not None:
+                    por_tipo[tipo_atual].append(filtrar_campos(dados, campos) if campos else dados)
+            
+            resultado = resumo.to_dict()
+            resultado['periodo'] = {
+                'tipo': periodo,
+                'data_inicio': data_inicio,
+                'data_fim': data_fim
+            }
+            resultado['truncado'] = estado['truncado']
+            if por_tipo is not None:
+                resultado['transacoes'] = [dados for t in tipos for dados in por_tipo[t]]
+            return resultado
+        except Exception as e:
+            logger.error("Erro ao obter transações por período: %s", e)
+            raise
+
+    @retry_on_exception()
+    def get_serie_temporal(self, user_id, agrupamento='mensal', periodos=12, hoje=None):
+        """
+        Obtém totais de despesas, ganhos e saldo por mês ou semana nos últimos
+        `periodos` períodos (incluindo o atual).
+        
+        Faz uma única consulta por intervalo para cada tipo de transação, lendo
+        apenas a data e o valor, e distribui os documentos nos períodos em uma
+        única passagem.
+        
+        Args:
+            user_id: ID do documento do usuário
+            agrupamento: 'mensal' ou 'semanal'
+            periodos: Número de períodos (até SERIE_MAX_PERIODOS[agrupamento])
+            hoje: Data de referência (padrão: data atual)
+            
+        Returns:
+            Dicionário com a lista de períodos em ordem cronológica
+        """
+        try:
+            hoje = hoje or datetime.datetime.now().date()
+            periodos = max(1, min(periodos, SERIE_MAX_PERIODOS[agrupamento]))
+            
+            # Montar os períodos em ordem cronológica, indexados pela chave
+            serie = []
+            if agrupamento == 'mensal':
+                ano, mes = hoje.year, hoje.month
+                for _ in range(periodos):
+                    inicio = datetime.date(ano, mes, 1)
+                    proximo = datetime.date(ano + mes // 12, mes % 12 + 1, 1)
+                    serie.append((inicio.strftime('%Y-%m'), inicio, proximo - datetime.timedelta(days=1)))
+                    ano, mes = (ano, mes - 1) if mes > 1 else (ano - 1, 12)
+            else:
+                inicio = hoje - datetime.timedelta(days=hoje.weekday())
+                for _ in range(periodos):
+                    serie.append((inicio.strftime('%Y-%m-%d'), inicio, inicio + datetime.timedelta(days=6)))
+                    inicio -= datetime.timedelta(days=7)
+            serie.reverse()
+            
+            buckets = {
+                chave: {
+                    'chave': chave,
+                    'data_inicio': inicio.strftime('%Y-%m-%d'),
+                    'data_fim': fim.strftime('%Y-%m-%d'),
+                    'total_despesas': 0.0,
+                    'total_ganhos': 0.0,
+                }
+                for chave, inicio, fim in serie
+            }
+            data_inicio = serie[0][1].strftime('%Y-%m-%d')
+            data_fim = serie[-1][2].strftime('%Y-%m-%d')
+            
+            def somar(dados, campo_data, campo_total):
+                try:
+                    dia = datetime.date.fromisoformat(dados.get(campo_data)[:10])
+                except (TypeError, ValueError):
+                    # Datas ausentes ou inválidas gravadas sem validação
+                    return
+                if agrupamento == 'mensal':
+                    chave = dia.strftime('%Y-%m')
+                else:
+                    chave = (dia - datetime.timedelta(days=dia.weekday())).strftime('%Y-%m-%d')
+                bucket = buckets.get(chave)
+                if bucket is not None:
+                    bucket[campo_total] += float(dados.get('valor', 0))
+            
+            selecoes = {tipo: [campo_data, 'valor'] for tipo, (_, campo_data) in COLECOES_TRANSACAO.items()}
+            estado = {'truncado': False}
+            for tipo, documento in self._fluxo_periodo(
+                user_id, list(COLECOES_TRANSACAO), data_inicio, data_fim, settings.RELATORIO_RESUMO_LIMITE, selecoes, estado
+            ):
+                dados = documento if isinstance(documento, dict) else documento.to_dict()
+                somar(dados, COLECOES_TRANSACAO[tipo][1], 'total_despesas' if tipo == 'despesa' else 'total_ganhos')
+            
+            resultado = []
+            for chave, _, _ in serie:
+                bucket = buckets[chave]
+                bucket['saldo'] = bucket['total_ganhos'] - bucket['total_despesas']
+                resultado.append(bucket)
+            
+            return {
+                'agrupamento': agrupamento,
+                'data_inicio': data_inicio,
+                'data_fim': data_fim,
+                'periodos': resultado,
+                'truncado': estado['truncado']
+            }
+        except Exception as e:
+            logger.error("Erro ao obter série temporal: %s", e)
+            raise
+
+    @retry_on_exception()
+    def materializar_recorrencias(self, user_id, desde, ate, simular=False):
+        """
+        Cria as ocorrências das transações recorrentes do usuário com data em
+        [desde, ate] e aplica a variação total do saldo.
+        
+        Cada lançamento recorrente gera ocorrências até a véspera do primeiro
+        lançamento recorrente que o substitui (campo 'substitui' com o ID do
+        anterior, definido pelo cliente); lançamentos independentes, mesmo com
+        a mesma categoria e descrição, seguem em paralelo. As ocorrências têm ID determinístico
+        (rec_{modelo}_{AAAAMMDD}), então executar de novo para o mesmo intervalo não duplica nada: as
+        existentes são detectadas com um get_all e apenas as que faltam são
+        criadas, junto com o incremento do saldo, no mesmo batch.
+        
+        Args:
+            user_id: ID do documento do usuário
+            desde, ate: Limites do intervalo (date, inclusivos)
+            simular: Se True, apenas calcula o que seria criado
+            
+        Returns:
+            Dicionário com 'criadas' (quantidade) e 'delta_saldo'
+        """
+        try:
+            # Ocorrências de meses já arquivados não são recriadas
+            limite_arquivo = mes_limite()
+            if limite_arquivo is not None:
+                desde = max(desde, datetime.date.fromisoformat(f"{limite_arquivo}-01"))
+            
+            ocorrencias = []
+            for tipo, (colecao, campo_data) in COLECOES_TRANSACAO.items():
+                colecao_ref = self.db.collection(f"users/{user_id}/{colecao}")
                 
-                for despesa in despesas_ref:
-                    dados = despesa.to_dict()
-                    dados['id'] = despesa.id
-                    transacoes.append(dados)
-            
-            if tipo is None or tipo == 'ganho':
-                ganhos_query = self.collection(f"users/{user_id}/ganhos")
-                if data_inicio:
-                    ganhos_query = ganhos_query.where('data', '>=', data_inicio)
-                if data_fim:
-                    ganhos_query = ganhos_query.where('data', '<=', data_fim)
-                ganhos_query = ganhos_query.limit(limite)
-                ganhos_ref = ganhos_query.get()
+                modelos = []
+                # Um lançamento que substitui outro (um aumento de salário, um
+                # aluguel reajustado) encerra o anterior na véspera da sua data
+                substituicoes = {}
+                for modelo in colecao_ref.where('recorrente', '==', True).stream():
+                    dados = modelo.to_dict()
+                    try:
+                        origem = datetime.datetime.strptime(dados.get(campo_data) or '', '%Y-%m-%d').date()
+                    except ValueError:
+                        continue
+                    modelos.append((origem, modelo.id, dados))
+                    substituido = dados.get('substitui')
+                    if substituido and substituido != modelo.id:
+                        substituicoes[substituido] = min(substituicoes.get(substituido, origem), origem)
                 
-                for ganho in ganhos_ref:
-                    dados = ganho.to_dict()
-                    dados['id'] = ganho.id
-                    transacoes.append(dados)
-            
-            if tipo is None or tipo == 'salario':
-                salarios_query = self.collection(f"users/{user_id}/salario")
-                if data_inicio:
-                    salarios_query = salarios_query.where('data_recebimento', '>=', data_inicio)
-                if data_fim:
-                    salarios_query = salarios_query.where('data_recebimento', '<=', data_fim)
-                salarios_query = salarios_query.limit(limite)
-                salarios_ref = salarios_query.get()
+                for origem, modelo_id, dados in modelos:
+                    fim = ate
+                    if modelo_id in substituicoes:
+                        fim = min(ate, substituicoes[modelo_id] - datetime.timedelta(days=1))
+                    for data in datas_recorrencia(origem, dados.get('periodo', 'mensal'), desde, fim):
+                        referencia = colecao_ref.document(f"rec_{modelo_id}_{data.strftime('%Y%m%d')}")
+                        ocorrencias.append((tipo, referencia, montar_instancia_recorrente(tipo, modelo_id, dados, data)))
+            
+            if not ocorrencias:
+                return {'criadas': 0, 'delta_saldo': 0.0}
+            
+            existentes = {
+                snapshot.reference.path
+                for snapshot in self.db.get_all([referencia for _, referencia, _ in ocorrencias])
+                if snapshot.exists
+            }
+            novas = [item for item in ocorrencias if item[1].path not in existentes]
+            delta_total = sum(sinal_saldo(tipo) * dados['valor'] for tipo, _, dados in novas)
+            
+            if simular or not novas:
+                return {'criadas': len(novas), 'delta_saldo': round(delta_total, 2)}
+            
+            # Um batch por bloco de ocorrências, cada um com o próprio incremento
+            # do saldo e dos índices (em geral, um único batch por usuário)
+            tamanho = MAX_ESCRITAS_BATCH - 1 - AlteracoesIndices.ESCRITAS
+            for inicio in range(0, len(novas), tamanho):
+                bloco = novas[inicio:inicio + tamanho]
+                batch = self.batch()
+                delta = 0.0
+                indices = AlteracoesIndices()
+                for tipo, referencia, dados in bloco:
+                    batch.create(referencia, dados)
+                    delta += sinal_saldo(tipo) * dados['valor']
+                    indices.adicionar(tipo, dados)
+                distribuido = self._incrementar_saldo(batch, user_id, delta)
+                indices.gravar(batch, self, user_id)
+                batch.commit()
+                if distribuido:
+                    descartar_soma(user_id)
+                self.notificar(
+                    'transacoes_gravadas', user_id,
+                    [(tipo, referencia.id, dados) for tipo, referencia, dados in bloco], delta
+                )
+            
+            return {'criadas': len(novas), 'delta_saldo': round(delta_total, 2)}
+        except Exception as e:
+            logger.error("Erro ao materializar recorrências: %s", e)
+            raise
+    
+    @retry_on_exception()
+    def arquivar_transacoes(self, user_id, limite_arquivo, simular=False):
+        """
+        Move as transações com data anterior ao mês `limite_arquivo` para os
+        pacotes mensais do arquivo (viccoin/arquivo.py).
+        
+        Para cada mês, o pacote (mesclado com o pacote já existente, se
+        houver) é gravado antes ou no mesmo batch das remoções das
+        transações, então uma execução interrompida nunca perde transações:
+        as que ficaram nas subcoleções são arquivadas de novo na execução
+        seguinte. O saldo, os índices e os observadores não são alterados,
+        pois as transações continuam existindo. Modelos recorrentes e
+        transações sem data válida ficam nas subcoleções.
+        
+        Args:
+            user_id: ID do documento do usuário
+            limite_arquivo: Primeiro mês (AAAA-MM) mantido nas subcoleções
+            simular: Se True, apenas conta o que seria arquivado
+            
+        Returns:
+            Dicionário com 'meses' e 'arquivadas' (quantidades) e 'ignorados'
+            (meses grandes demais para um pacote)
+        """
+        try:
+            corte = f"{limite_arquivo}-01"
+            por_mes = {}
+            snapshots = {}
+            for tipo, (colecao, campo_data) in COLECOES_TRANSACAO.items():
+                for documento in self.collection(f"users/{user_id}/{colecao}").where(campo_data, '<', corte).stream():
+                    transacao = Transacao.from_snapshot(tipo, documento)
+                    mes = str(transacao.data_transacao or '')[:7]
+                    if transacao.recorrente or not mes_valido(mes):
+                        continue
+                    por_mes.setdefault(mes, {})[(tipo, documento.id)] = transacao.to_dict()
+                    snapshots.setdefault(mes, []).append(documento)
+            
+            arquivadas = sum(len(transacoes) for transacoes in por_mes.values())
+            if simular or not por_mes:
+                return {'meses': len(por_mes), 'arquivadas': arquivadas, 'ignorados': []}
+            
+            colecao_arquivo = self.collection(f"users/{user_id}/{COLECAO_ARQUIVO}")
+            existentes = self.db.get_all([colecao_arquivo.document(mes) for mes in por_mes])
+            for existente in existentes:
+                if existente.exists:
+                    transacoes = por_mes[existente.id]
+                    for dados in descompactar(existente.to_dict()['dados']):
+                        transacoes.setdefault((dados['tipo'], dados['id']), dados)
+            
+            operacoes = []
+            ignorados = []
+            for mes in sorted(por_mes):
+                documento = pacote(mes, por_mes[mes].values())
+                if len(documento['dados']) > TAMANHO_MAXIMO_PACOTE:
+                    logger.warning("Mês %s do usuário %s grande demais para arquivar", mes, user_id)
+                    ignorados.append(mes)
+                    arquivadas -= len(snapshots[mes])
+                    continue
+                documento['arquivado_em'] = firestore.SERVER_TIMESTAMP
+                operacoes.append((colecao_arquivo.document(mes), documento))
+                operacoes.extend((snapshot, None) for snapshot in snapshots[mes])
+            
+            for inicio in range(0, len(operacoes), MAX_ESCRITAS_BATCH):
+                batch = self.batch()
+                for alvo, documento in operacoes[inicio:inicio + MAX_ESCRITAS_BATCH]:
+                    if documento is not None:
+                        batch.set(alvo, documento)
+                    else:
+                        batch.delete(alvo.reference, option=self.db.write_option(last_update_time=alvo.update_time))
+                batch.commit()
+            
+            return {'meses': len(por_mes) - len(ignorados), 'arquivadas': arquivadas, 'ignorados': ignorados}
+        except Exception as e:
+            logger.error("Erro ao arquivar transações: %s", e)
+            raise
+    
+    def iterar_transacoes(self, user_id, tipos=None, pagina=500):
+        """
+        Gera todas as transações do usuário como tuplas (tipo, id, dados):
+        primeiro as das subcoleções, lidas em páginas de `pagina` documentos,
+        depois as dos pacotes do arquivo, descompactados um de cada vez. Uma
+        transação que está nos dois lugares (arquivamento interrompido)
+        aparece uma vez, com os dados da subcoleção.
+        
+        Usado pelos comandos que recalculam dados derivados de todo o
+        histórico (índice de categorias, gastos dos orçamentos, modelo de
+        leitura).
+        
+        Args:
+            user_id: ID do documento do usuário
+            tipos: Tipos de transação a gerar, ou None para todos
+            pagina: Documentos lidos por consulta nas subcoleções
+        """
+        tipos = list(tipos or COLECOES_TRANSACAO)
+        recentes = set()
+        for tipo in tipos:
+            colecao, _ = COLECOES_TRANSACAO[tipo]
+            query = self.collection(f"users/{user_id}/{colecao}").order_by('__name__').limit(pagina)
+            ultimo = None
+            while True:
+                documentos = (query.start_after(ultimo) if ultimo is not None else query).get()
+                for documento in documentos:
+                    recentes.add((tipo, documento.id))
+                    yield tipo, documento.id, documento.to_dict()
+                if len(documentos) < pagina:
+                    break
+                ultimo = documentos[-1]
+        
+        for pacote in self.collection(f"users/{user_id}/{COLECAO_ARQUIVO}").stream():
+            for dados in descompactar(pacote.to_dict()['dados']):
+                chave = (dados['tipo'], dados['id'])
+                if dados['tipo'] in tipos and chave not in recentes:
+                    yield dados['tipo'], dados['id'], dados
+    
+    def _ler_transacoes(self, user_id, chaves):
+        """
+        Lê várias transações com uma única chamada get_all.
+        
+        Args:
+            chaves: Lista de tuplas (tipo, id)
+            
+        Returns:
+            Lista de snapshots, na mesma ordem de `chaves`
+        """
+        referencias = [
+            self.db.document(f"users/{user_id}/{COLECOES_TRANSACAO[tipo][0]}/{transacao_id}")
+            for tipo, transacao_id in chaves
+        ]
+        por_caminho = {snapshot.reference.path: snapshot for snapshot in self.db.get_all(referencias)}
+        return [por_caminho[referencia.path] for referencia in referencias]
+    
+    @retry_on_exception()
+    def atualizar_transacoes(self, user_id, alteracoes):
+        """
+        Atualiza várias transações e ajusta o saldo pela diferença total de
+        valores, tudo em um único batch.
+        
+        As transações são lidas com um get_all e cada escrita exige que o
+        documento não tenha mudado desde a leitura; em caso de conflito, o
+        retry relê e recalcula. Repetir a mesma alteração não muda o saldo.
+        
+        Args:
+            user_id: ID do documento do usuário
+            alteracoes: Lista de tuplas (tipo, id, campos), com campos já
+                validados por `normalizar_alteracoes`
+            
+        Returns:
+            Dicionário com os ids 'atualizadas', 'nao_encontradas' e o
+            'delta_saldo' aplicado
+        """
+        try:
+            # Alterações repetidas do mesmo documento são combinadas
+            combinadas = {}
+            for tipo, transacao_id, campos in alteracoes:
+                combinadas.setdefault((tipo, transacao_id), {}).update(campos)
+            alteracoes = [(tipo, transacao_id, campos) for (tipo, transacao_id), campos in combinadas.items()]
+            
+            snapshots = self._ler_transacoes(user_id, list(combinadas))
+            
+            batch = self.batch()
+            atualizadas, nao_encontradas = [], []
+            # Documentos completos após a alteração, para os observadores
+            gravadas = []
+            indices = AlteracoesIndices()
+            delta = 0.0
+            for (tipo, transacao_id, campos), snapshot in zip(alteracoes, snapshots):
+                if not snapshot.exists:
+                    nao_encontradas.append(transacao_id)
+                    continue
+                if 'valor' in campos:
+                    valor_antigo = float(snapshot.to_dict().get('valor') or 0)
+                    delta += sinal_saldo(tipo) * (campos['valor'] - valor_antigo)
+                dados = {**campos, 'updated_at': firestore.SERVER_TIMESTAMP}
+                if tipo in TIPOS_BUSCA and any(campo in campos for campo in CAMPOS_BUSCA):
+                    dados[CAMPO_TERMOS] = termos_busca({**snapshot.to_dict(), **campos})
+                batch.update(
+                    snapshot.reference, dados,
+                    option=self.db.write_option(last_update_time=snapshot.update_time)
+                )
+                atualizadas.append(transacao_id)
+                antes = snapshot.to_dict()
+                depois = {**antes, **dados}
+                indices.alterar(tipo, antes, depois)
+                gravadas.append((tipo, transacao_id, depois))
+            
+            if atualizadas:
+                distribuido = bool(delta) and self._incrementar_saldo(batch, user_id, delta)
+                indices.gravar(batch, self, user_id)
+                batch.commit()
+                if distribuido:
+                    descartar_soma(user_id)
+                self.notificar('transacoes_gravadas', user_id, gravadas, delta)
+            
+            return {'atualizadas': atualizadas, 'nao_encontradas': nao_encontradas, 'delta_saldo': delta}
+        except Exception as e:
+            logger.error("Erro ao atualizar transações: %s", e)
+            raise
+    
+    @retry_on_exception()
+    def remover_transacoes(self, user_id, chaves):
+        """
+        Remove várias transações, registra os marcadores de remoção para a
+        sincronização incremental e ajusta o saldo pela soma dos valores, tudo
+        em um único batch.
+        
+        As transações são lidas com um get_all e cada remoção exige que o
+        documento não tenha mudado desde a leitura. Repetir a remoção não
+        altera o saldo de novo, pois os documentos já não existem.
+        
+        Args:
+            user_id: ID do documento do usuário
+            chaves: Lista de tuplas (tipo, id)
+            
+        Returns:
+            Dicionário com os ids 'removidas', 'nao_encontradas' e o
+            'delta_saldo' aplicado
+        """
+        try:
+            chaves = list(dict.fromkeys(chaves))
+            snapshots = self._ler_transacoes(user_id, chaves)
+            
+            batch = self.batch()
+            removidas, nao_encontradas = [], []
+            indices = AlteracoesIndices()
+            delta = 0.0
+            for (tipo, transacao_id), snapshot in zip(chaves, snapshots):
+                if not snapshot.exists:
+                    nao_encontradas.append(transacao_id)
+                    continue
+                dados = snapshot.to_dict()
+                delta -= sinal_saldo(tipo) * float(dados.get('valor') or 0)
+                indices.adicionar(tipo, dados, -1)
+                batch.delete(snapshot.reference, option=self.db.write_option(last_update_time=snapshot.update_time))
+                batch.set(self.document(f"users/{user_id}/{COLECAO_REMOVIDAS}/{tipo}_{transacao_id}"), {
+                    'id': transacao_id,
+                    'tipo': tipo,
+                    'updated_at': firestore.SERVER_TIMESTAMP
+                })
+                removidas.append(transacao_id)
+            
+            if removidas:
+                distribuido = bool(delta) and self._incrementar_saldo(batch, user_id, delta)
+                indices.gravar(batch, self, user_id)
+                batch.commit()
+                if distribuido:
+                    descartar_soma(user_id)
+                self.notificar(
+                    'transacoes_removidas', user_id,
+                    [chave for chave, snapshot in zip(chaves, snapshots) if snapshot.exists], delta
+                )
+            
+            return {'removidas': removidas, 'nao_encontradas': nao_encontradas, 'delta_saldo': delta}
+        except Exception as e:
+            logger.error("Erro ao remover transações: %s", e)
+            raise
+    
+    def remover_transacao(self, user_id, tipo, transacao_id):
+        """
+        Remove uma transação (veja `remover_transacoes`).
+        
+        Returns:
+            True se a transação existia e foi removida, False caso contrário
+        """
+        return bool(self.remover_transacoes(user_id, [(tipo, transacao_id)])['removidas'])
+
+    @retry_on_exception()
+    def saldo_usuario(self, usuario):
+        """
+        Saldo de um usuário a partir do snapshot do seu documento: o campo
+        `saldo` mais, se o usuário tem shards, a soma deles, lida com uma
+        consulta e guardada no cache (viccoin/saldo.py).
+        """
+        dados = usuario.to_dict() or {}
+        guardar_modo(usuario.id, dados)
+        if CAMPO_SHARDS not in dados:
+            return dados.get('saldo', 0.0)
+
+        versao, soma = soma_em_cache(usuario.id)
+        if soma is None:
+            try:
+                soma = sum(float(shard.to_dict().get('saldo') or 0) for shard in self.ler_shards_saldo(usuario.id))
+            except Exception as e:
+                logger.error("Erro ao somar os shards do saldo: %s", e)
+                raise
+            guardar_soma(usuario.id, versao, soma)
+        return float(dados.get('saldo') or 0) + soma
+
+    def ler_shards_saldo(self, user_id):
+        """
+        Lê os shards do saldo de um usuário (lista vazia no modo normal).
+        """
+        return self.collection(f"users/{user_id}/{COLECAO_SHARDS}").get()
+
+    @retry_on_exception()
+    def distribuir_saldo(self, user_id, shards):
+        """
+        Passa o saldo do usuário para o modo distribuído em `shards` shards (ou
+        muda o número de shards), sem parar as escritas.
+
+        Os shards são criados, com valor 0 quando ainda não existem, no mesmo
+        batch que grava o modo; shards de uma configuração anterior com mais
+        shards continuam somados.
+
+        Raises:
+            ValueError: Se o número de shards for inválido
+        """
+        validar_shards(shards)
+        try:
+            batch = self.batch()
+            for indice in range(shards):
+                batch.set(
+                    self.document(f"users/{user_id}/{COLECAO_SHARDS}/{indice}"),
+                    {'saldo': firestore.Increment(0)}, merge=True
+                )
+            batch.update(self.document(f"users/{user_id}"), {CAMPO_SHARDS: shards})
+            batch.commit()
+            guardar_modo(user_id, {CAMPO_SHARDS: shards})
+        except Exception as e:
+            logger.error("Erro ao distribuir saldo: %s", e)
+            raise
+
+    @retry_on_exception()
+    def desativar_shards_saldo(self, user_id):
+        """
+        Primeira etapa da volta ao modo normal: as escritas de saldo passam
+        para o documento do usuário, e as leituras continuam somando os
+        shards até `consolidar_shards_saldo`, que deve ser chamado depois de
+        TTL_MODO segundos (o tempo que outros servidores levam para ver o
+        novo modo).
+        
+        Returns:
+            True se o usuário tinha shards
+        """
+        try:
+            usuario_ref = self.document(f"users/{user_id}")
+            usuario = usuario_ref.get(field_paths=[CAMPO_SHARDS])
+            if not usuario.exists or CAMPO_SHARDS not in usuario.to_dict():
+                return False
+            usuario_ref.update({CAMPO_SHARDS: 0})
+            guardar_modo(user_id, {})
+            return True
+        except Exception as e:
+            logger.error("Erro ao desativar shards do saldo: %s", e)
+            raise
+
+    @retry_on_exception()
+    def consolidar_shards_saldo(self, user_id):
+        """
+        Remove os shards e soma seus valores ao documento do usuário em um
+        único batch, que também apaga o modo distribuído. Cada remoção exige
+        que o shard não tenha mudado desde a leitura; se mudou, o retry relê
+        os shards.
+        
+        Returns:
+            Valor movido dos shards para o documento do usuário
+        """
+        try:
+            batch = self.batch()
+            soma = 0.0
+            for shard in self.ler_shards_saldo(user_id):
+                soma += float(shard.to_dict().get('saldo') or 0)
+                batch.delete(shard.reference, option=self.db.write_option(last_update_time=shard.update_time))
+            batch.update(self.document(f"users/{user_id}"), {
+                'saldo': firestore.Increment(soma),
+                CAMPO_SHARDS: firestore.DELETE_FIELD,
+            })
+            batch.commit()
+            descartar_soma(user_id)
+            return soma
+        except FailedPrecondition:
+            logger.warning("Shard do saldo alterado durante a consolidação do usuário %s", user_id)
+            raise
+        except Exception as e:
+            logger.error("Erro ao consolidar saldo: %s", e)
+            raise
+
+    @retry_on_exception()
+    def get_alteracoes(self, user_id, desde=None, limite=500):
+        """
+        Obtém as transações criadas, alteradas ou removidas desde um token de
+        sincronização, com leituras proporcionais ao número de alterações.
+        
+        Cada coleção é lida em ordem de ('updated_at', id do documento), e a
+        posição entregue é comparada como (instante, coleção, id), de modo que
+        páginas avançam mesmo quando mais de `limite` documentos compartilham o
+        mesmo instante (gravações em lote).
+        
+        Args:
+            user_id: ID do documento do usuário
+            desde: Posição decodificada do token da sincronização anterior
+                (`decodificar_token_sync`), ou None para obter todo o histórico
+            limite: Máximo de documentos lidos por tipo
+            
+        Returns:
+            Dicionário com 'alteradas', 'removidas', o novo 'token' e
+            'tem_mais' quando a resposta foi truncada
+        """
+        try:
+            lidos = []
+            # Posição até a qual todas as coleções foram lidas por completo
+            corte = None
+            
+            for colecao, tipo in COLECOES_SYNC.items():
+                query = self.collection(f"users/{user_id}/{colecao}")
+                if desde is not None:
+                    momento, colecao_desde, documento_desde = desde
+                    # Coleções que vêm depois da do token ainda têm documentos
+                    # pendentes no mesmo instante; as anteriores, não
+                    operador = '>' if colecao < colecao_desde else '>='
+                    query = query.where('updated_at', operador, momento)
+                query = query.order_by('updated_at').order_by('__name__')
+                if desde is not None and colecao == colecao_desde:
+                    query = query.start_after({'updated_at': momento, '__name__': documento_desde})
+                documentos = query.limit(limite).get()
                 
-                for salario in salarios_ref:
-                    dados = salario.to_dict()
-                    dados['id'] = salario.id
-                    transacoes.append(dados)
-            
-            # Calcular estatísticas agregadas
-            total_despesas = sum(t['valor'] for t in transacoes if t.get('tipo') == 'despesa')
-            total_ganhos = sum(t['valor'] for t in transacoes if t.get('tipo') in ['ganho', 'salario'])
-            saldo_periodo = total_ganhos - total_despesas
-            
-            # Agrupar por categoria
-            categorias = {}
-            for t in transacoes:
-                categoria = t.get('categoria', 'Sem categoria')
-                if categoria not in categorias:
-                    categorias[categoria] = {
-                        'despesas': 0,
-                        'ganhos': 0
-                    }
+                for documento in documentos:
+                    posicao = (documento.get('updated_at'), colecao, documento.id)
+                    lidos.append((posicao, tipo, documento))
                 
-                if t.get('tipo') == 'despesa':
-                    categorias[categoria]['despesas'] += float(t.get('valor', 0))
+                if len(documentos) >= limite:
+                    corte = posicao if corte is None else min(corte, posicao)
+            
+            if corte is not None:
+                # Resposta truncada: entregar só o que vem até o menor ponto lido
+                # por completo e continuar dele
+                lidos = [item for item in lidos if item[0] <= corte]
+            
+            alteradas = []
+            removidas = []
+            for posicao, tipo, documento in lidos:
+                if tipo is None:
+                    dados = documento.to_dict()
+                    removidas.append({'id': dados.get('id'), 'tipo': dados.get('tipo'), 'updated_at': dados['updated_at']})
                 else:
-                    categorias[categoria]['ganhos'] += float(t.get('valor', 0))
+                    alteradas.append(Transacao.from_snapshot(tipo, documento).to_dict())
+            
+            ultimo = max((item[0] for item in lidos), default=desde)
             
             return {
-                'transacoes': transacoes,
-                'total_despesas': total_despesas,
-                'total_ganhos': total_ganhos,
-                'saldo_periodo': saldo_periodo,
-                'categorias': categorias,
-                'periodo': {
-                    'tipo': periodo,
-                    'data_inicio': data_inicio,
-                    'data_fim': data_fim
-                }
+                'alteradas': alteradas,
+                'removidas': removidas,
+                'token': codificar_token_sync(ultimo) if ultimo is not None else None,
+                'tem_mais': corte is not None
             }
         except Exception as e:
-            logger.error(f"Erro ao obter transações por período: {str(e)}")
+            logger.error("Erro ao obter alterações: %s", e)
             raise
 
 # Singleton para acesso global
@@ -446,6 +1865,6 @@ try:
     db = initialize_firebase()
     logger.info("Cliente Firestore inicializado com sucesso")
 except Exception as e:
-    logger.error(f"Erro ao inicializar Firebase: {str(e)}")
+    logger.error("Erro ao inicializar Firebase: %s", e)
     # Definir db como None para evitar erros de referência
     db = None 
\ No newline at end of file
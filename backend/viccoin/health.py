@@ -52,7 +52,7 @@ def check_firebase_connection():
         health_status['firebase']['status'] = 'error'
         health_status['firebase']['last_failure'] = datetime.datetime.now().isoformat()
         health_status['firebase']['error'] = str(e)
-        logger.error(f"Erro na verificação de saúde do Firebase: {str(e)}")
+        logger.error("Erro na verificação de saúde do Firebase: %s", e)
         return False
 
 def periodic_health_check():
@@ -75,7 +75,7 @@ def periodic_health_check():
             # Aguardar até a próxima verificação
             time.sleep(CHECK_INTERVAL)
         except Exception as e:
-            logger.error(f"Erro na verificação periódica de saúde: {str(e)}")
+            logger.error("Erro na verificação periódica de saúde: %s", e)
             time.sleep(CHECK_INTERVAL)
 
 # Iniciar thread de verificação periódica
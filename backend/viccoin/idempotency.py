@@ -0,0 +1,136 @@
+"""
+Suporte ao cabeçalho Idempotency-Key nos endpoints de escrita.
+
+Uma requisição repetida com a mesma chave (mesmo usuário, método e rota)
+recebe a resposta original, guardada no cache do Django por
+IDEMPOTENCY_TTL segundos, sem acessar o Firestore novamente. Duplicatas
+simultâneas no mesmo processo esperam a primeira terminar e recebem a mesma
+resposta; em outro processo, recebem 409 até a primeira terminar.
+
+Além disso, o ID do documento criado é derivado da chave
+(`id_transacao`), de modo que mesmo uma repetição que escape do cache
+(resposta 5xx, cache expirado, outro servidor) não duplica a transação.
+"""
+import hashlib
+import logging
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'Idempotency-Key'
+TAMANHO_MAXIMO_CHAVE = 255
+
+# Requisições em andamento neste processo: {chave do cache: threading.Event}
+_em_andamento = {}
+_lock = threading.Lock()
+
+
+def _cache():
+    return caches[settings.IDEMPOTENCY_CACHE]
+
+
+def _chave_cache(request, chave):
+    # O cabeçalho Authorization identifica o usuário sem decodificar o token
+    escopo = '\0'.join((request.headers.get('Authorization', ''), request.method, request.path, chave))
+    return 'idempotency:' + hashlib.sha256(escopo.encode()).hexdigest()
+
+
+def id_transacao(request, tipo):
+    """
+    Retorna o ID determinístico do documento a criar para a Idempotency-Key
+    da requisição, ou None se ela não tiver chave.
+    """
+    chave = getattr(request, 'idempotency_key', None)
+    if not chave:
+        return None
+    return hashlib.sha256(f"{tipo}\0{chave}".encode()).hexdigest()[:20]
+
+
+def _resposta_salva(salva):
+    response = HttpResponse(salva['content'], status=salva['status'], content_type=salva['content_type'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotente(view):
+    """
+    Decorador para views de escrita que aceitam o cabeçalho Idempotency-Key.
+    Sem o cabeçalho, a view é executada normalmente.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        chave = request.headers.get(HEADER)
+        if not chave:
+            return view(request, *args, **kwargs)
+        if len(chave) > TAMANHO_MAXIMO_CHAVE:
+            return JsonResponse({
+                'success': False,
+                'message': f'{HEADER} deve ter no máximo {TAMANHO_MAXIMO_CHAVE} caracteres'
+            }, status=400)
+
+        cache = _cache()
+        chave_cache = _chave_cache(request, chave)
+        corpo = hashlib.sha256(request.body).hexdigest()
+
+        while True:
+            salva = cache.get(chave_cache)
+            if salva is not None:
+                if salva['corpo'] != corpo:
+                    return JsonResponse({
+                        'success': False,
+                        'message': f'{HEADER} já usada com outro corpo de requisição'
+                    }, status=422)
+                logger.debug("Resposta idempotente reaproveitada: %s", chave_cache)
+                return _resposta_salva(salva)
+
+            with _lock:
+                evento = _em_andamento.get(chave_cache)
+                if evento is None:
+                    evento = _em_andamento[chave_cache] = threading.Event()
+                    dono = True
+                else:
+                    dono = False
+
+            if not dono:
+                # Duplicata simultânea: esperar a primeira e reaproveitar a resposta
+                evento.wait(settings.IDEMPOTENCY_ESPERA)
+                if cache.get(chave_cache) is None:
+                    # A primeira falhou (5xx) ou não terminou a tempo
+                    return JsonResponse({
+                        'success': False,
+                        'message': 'Requisição com a mesma Idempotency-Key ainda em andamento'
+                    }, status=409)
+                continue
+
+            try:
+                # Marca entre processos: outro servidor com a mesma chave recebe 409
+                if not cache.add(chave_cache + ':lock', 1, settings.IDEMPOTENCY_ESPERA):
+                    return JsonResponse({
+                        'success': False,
+                        'message': 'Requisição com a mesma Idempotency-Key ainda em andamento'
+                    }, status=409)
+                try:
+                    request.idempotency_key = chave
+                    response = view(request, *args, **kwargs)
+                    # Erros do servidor não são guardados: a repetição executa de novo
+                    if response.status_code < 500 and not response.streaming:
+                        cache.set(chave_cache, {
+                            'corpo': corpo,
+                            'status': response.status_code,
+                            'content': response.content,
+                            'content_type': response.get('Content-Type'),
+                        }, settings.IDEMPOTENCY_TTL)
+                    return response
+                finally:
+                    cache.delete(chave_cache + ':lock')
+            finally:
+                with _lock:
+                    _em_andamento.pop(chave_cache, None)
+                evento.set()
+
+    return wrapper
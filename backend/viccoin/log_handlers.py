@@ -0,0 +1,254 @@
+"""
+Componentes de logging usados pela configuração LOGGING em settings.py.
+
+O objetivo é tirar o custo de logging do thread da requisição:
+
+- ``BackgroundQueueHandler`` resolve a mensagem e o traceback e enfileira o
+  registro; a formatação e a escrita (console, arquivo rotativo) acontecem em
+  um thread em segundo plano.
+- ``SamplingFilter`` e ``RateLimitFilter`` descartam registros antes de
+  entrarem na fila, com taxas configuráveis por logger.
+- ``RedactAuthorizationFilter`` remove tokens de cabeçalhos sensíveis.
+- ``JsonFormatter`` gera uma linha JSON por registro.
+"""
+import atexit
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import threading
+import time
+from collections.abc import Mapping
+
+from django.utils.module_loading import import_string
+
+# Cabeçalhos cujo valor nunca deve aparecer nos logs
+SENSITIVE_HEADERS = ('authorization', 'cookie')
+REDACTED = '[REDACTED]'
+
+_BEARER_RE = re.compile(r'(Bearer\s+)[A-Za-z0-9\-._~+/]+=*', re.IGNORECASE)
+
+# Atributos padrão de LogRecord; o que não estiver aqui veio de `extra=`
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_DEFAULT_FORMATTER = logging.Formatter()
+
+
+def _lookup_by_prefix(table, name):
+    """
+    Retorna o valor da entrada mais específica de `table` cujo nome é prefixo
+    (hierárquico) do logger `name`, ou None.
+    """
+    while name:
+        if name in table:
+            return table[name]
+        name = name.rpartition('.')[0]
+    return table.get('', None)
+
+
+class BackgroundQueueHandler(logging.handlers.QueueHandler):
+    """
+    Handler que enfileira registros e os entrega aos handlers de destino em
+    um thread em segundo plano.
+
+    Args:
+        targets: Lista de dicionários com a chave 'class' (caminho do handler)
+            e os demais argumentos do construtor do handler.
+        queue_size: Tamanho máximo da fila. Quando cheia, novos registros são
+            descartados em vez de bloquear a requisição.
+    """
+
+    def __init__(self, targets=None, queue_size=10000):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.dropped = 0
+        self.targets = []
+        for spec in targets or [{'class': 'logging.StreamHandler'}]:
+            spec = dict(spec)
+            handler_class = import_string(spec.pop('class'))
+            self.targets.append(handler_class(**spec))
+
+        self.listener = logging.handlers.QueueListener(
+            self.queue, *self.targets, respect_handler_level=True
+        )
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def setFormatter(self, fmt):
+        # O formatador é aplicado pelos handlers de destino, no thread do listener
+        super().setFormatter(fmt)
+        for target in self.targets:
+            target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Como em QueueHandler.prepare, resolver no thread da requisição o que
+        # depende de estado mutável: a mensagem com seus argumentos (que podem
+        # ser alterados depois da chamada) e o traceback (cujos frames não
+        # devem ficar vivos na fila). A formatação final (JSON, asctime)
+        # continua no thread de escrita.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = (self.formatter or _DEFAULT_FORMATTER).formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        """
+        Esvazia a fila e encerra o thread de escrita. Pode ser chamado mais de uma vez.
+        """
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def close(self):
+        self.stop()
+        for target in self.targets:
+            target.close()
+        super().close()
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Mantém apenas uma fração dos registros de cada logger.
+
+    Args:
+        rates: Dicionário {nome_do_logger: fração entre 0 e 1}. A entrada mais
+            específica vale para os loggers filhos.
+        max_level: Registros neste nível ou acima nunca são amostrados.
+    """
+
+    def __init__(self, rates=None, max_level='WARNING'):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self.max_level = logging.getLevelName(max_level) if isinstance(max_level, str) else max_level
+        self._cache = {}
+
+    def filter(self, record):
+        if record.levelno >= self.max_level:
+            return True
+
+        rate = self._cache.get(record.name)
+        if rate is None:
+            rate = _lookup_by_prefix(self.rates, record.name)
+            rate = 1.0 if rate is None else float(rate)
+            self._cache[record.name] = rate
+
+        return rate >= 1.0 or random.random() < rate
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limita quantos registros por segundo cada logger pode emitir usando um
+    token bucket. O número de registros suprimidos é anexado ao próximo
+    registro aceito no atributo `suppressed`.
+
+    Args:
+        limits: Dicionário {nome_do_logger: registros por segundo}.
+        max_level: Registros neste nível ou acima nunca são limitados.
+    """
+
+    def __init__(self, limits=None, max_level='ERROR'):
+        super().__init__()
+        self.limits = dict(limits or {})
+        self.max_level = logging.getLevelName(max_level) if isinstance(max_level, str) else max_level
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= self.max_level:
+            return True
+
+        with self._lock:
+            bucket = self._buckets.get(record.name)
+            if bucket is None:
+                rate = _lookup_by_prefix(self.limits, record.name)
+                if rate is None:
+                    self._buckets[record.name] = False
+                    return True
+                # [taxa, tokens, último instante, suprimidos]
+                bucket = self._buckets[record.name] = [float(rate), float(rate), time.monotonic(), 0]
+            elif bucket is False:
+                return True
+
+            now = time.monotonic()
+            rate = bucket[0]
+            bucket[1] = min(rate, bucket[1] + (now - bucket[2]) * rate)
+            bucket[2] = now
+
+            if bucket[1] < 1.0:
+                bucket[3] += 1
+                return False
+
+            bucket[1] -= 1.0
+            if bucket[3]:
+                record.suppressed = bucket[3]
+                bucket[3] = 0
+            return True
+
+
+class RedactAuthorizationFilter(logging.Filter):
+    """
+    Remove valores de cabeçalhos sensíveis (Authorization, Cookie) e tokens
+    Bearer da mensagem e dos argumentos do registro.
+    """
+
+    def filter(self, record):
+        if isinstance(record.msg, str) and 'earer' in record.msg:
+            record.msg = _BEARER_RE.sub(r'\1' + REDACTED, record.msg)
+
+        args = record.args
+        if isinstance(args, Mapping):
+            record.args = self._redact(args)
+        elif args:
+            record.args = tuple(self._redact(arg) for arg in args)
+        return True
+
+    def _redact(self, value):
+        if isinstance(value, str):
+            return _BEARER_RE.sub(r'\1' + REDACTED, value) if 'earer' in value else value
+        if isinstance(value, Mapping):
+            return {
+                key: REDACTED if str(key).lower() in SENSITIVE_HEADERS else val
+                for key, val in value.items()
+            }
+        return value
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formata cada registro como um objeto JSON em uma única linha.
+    """
+
+    def format(self, record):
+        payload = {
+            'timestamp': datetime.datetime.fromtimestamp(record.created, tz=datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'module': record.module,
+            'message': record.getMessage(),
+        }
+
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Traceback já renderizado por BackgroundQueueHandler.prepare
+            payload['exc_info'] = record.exc_text
+        if record.stack_info:
+            payload['stack_info'] = self.formatStack(record.stack_info)
+
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                payload[key] = value
+
+        return json.dumps(payload, default=str, ensure_ascii=False)
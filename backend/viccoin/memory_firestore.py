@@ -0,0 +1,821 @@
+"""
+Backend do Firestore em memória.
+
+Implementa o subconjunto da API do cliente `google.cloud.firestore` usado pelo
+projeto (coleções, documentos, consultas, batches e transações) para que a API
+possa rodar, ser testada e medida sem credenciais do Firebase.
+
+É selecionado com FIRESTORE_BACKEND=memory. A latência simulada de cada
+chamada ao "servidor" é configurada por FIRESTORE_MEMORY_LATENCY_MS, e o
+contador `stats` registra chamadas, leituras e escritas. Os dados podem ser
+salvos em um arquivo com `dump` e carregados na inicialização com
+FIRESTORE_MEMORY_SNAPSHOT.
+
+`on_snapshot` em documentos e consultas é suportado: os callbacks recebem
+`(snapshots, mudanças, read_time)` em um thread próprio, como no cliente real.
+"""
+import datetime
+import gzip
+import logging
+import pickle
+import queue
+import threading
+import time
+import uuid
+from collections import Counter
+
+from google.api_core import exceptions
+from google.cloud.firestore_v1 import transforms
+from google.cloud.firestore_v1.watch import ChangeType, DocumentChange
+
+logger = logging.getLogger(__name__)
+
+ASCENDING = 'ASCENDING'
+DESCENDING = 'DESCENDING'
+
+DOCUMENT_ID = '__name__'
+
+_RANGE_OPERATORS = ('<', '<=', '>', '>=', '!=', 'not-in')
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _split_path(*parts):
+    segments = []
+    for part in parts:
+        segments.extend(segment for segment in str(part).split('/') if segment)
+    return tuple(segments)
+
+
+def _copy_value(value):
+    """
+    Copia dicionários e listas aninhados; demais valores são imutáveis.
+    """
+    if isinstance(value, dict):
+        return {key: _copy_value(val) for key, val in value.items()}
+    if isinstance(value, list):
+        return [_copy_value(val) for val in value]
+    return value
+
+
+def _sort_key(value):
+    """
+    Chave de ordenação seguindo a ordem de tipos do Firestore.
+    """
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return (3, value.timestamp())
+    if isinstance(value, str):
+        return (4, value)
+    if isinstance(value, bytes):
+        return (5, value)
+    if isinstance(value, list):
+        return (8, tuple(_sort_key(item) for item in value))
+    if isinstance(value, dict):
+        return (9, tuple(sorted((key, _sort_key(val)) for key, val in value.items())))
+    return (7, str(value))
+
+
+def _get_field(data, field_path):
+    """
+    Obtém um campo (com suporte a caminhos 'a.b'). Levanta KeyError se ausente.
+    """
+    value = data
+    for part in field_path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            raise KeyError(field_path)
+        value = value[part]
+    return value
+
+
+def _apply_value(target, key, value, commit_time):
+    if value is transforms.DELETE_FIELD:
+        target.pop(key, None)
+    elif value is transforms.SERVER_TIMESTAMP:
+        target[key] = commit_time
+    elif isinstance(value, transforms.Increment):
+        current = target.get(key)
+        if not isinstance(current, (int, float)) or isinstance(current, bool):
+            current = 0
+        target[key] = current + value.value
+    elif isinstance(value, transforms.ArrayUnion):
+        current = list(target.get(key) or [])
+        current.extend(item for item in value.values if item not in current)
+        target[key] = current
+    elif isinstance(value, transforms.ArrayRemove):
+        target[key] = [item for item in target.get(key) or [] if item not in value.values]
+    elif isinstance(value, dict):
+        target[key] = _merge({}, value, commit_time)
+    else:
+        target[key] = _copy_value(value)
+
+
+def _merge(target, data, commit_time):
+    """
+    Mescla `data` em `target` recursivamente (semântica de set(merge=True)).
+    """
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value, commit_time)
+        else:
+            _apply_value(target, key, value, commit_time)
+    return target
+
+
+def _update(target, data, commit_time):
+    """
+    Aplica um update(): chaves são caminhos de campo separados por ponto.
+    """
+    for field_path, value in data.items():
+        parts = field_path.split('.')
+        node = target
+        for part in parts[:-1]:
+            if not isinstance(node.get(part), dict):
+                node[part] = {}
+            node = node[part]
+        _apply_value(node, parts[-1], value, commit_time)
+    return target
+
+
+def _project(data, field_paths):
+    """
+    Cópia de `data` com apenas os campos de `field_paths` (todos, se None),
+    como as leituras com projeção (`select`).
+    """
+    if field_paths is None:
+        return _copy_value(data)
+    projected = {}
+    for field_path in field_paths:
+        try:
+            _update(projected, {field_path: _get_field(data, field_path)}, None)
+        except KeyError:
+            pass
+    return projected
+
+
+class _StoredDocument:
+    __slots__ = ('data', 'create_time', 'update_time')
+
+    def __init__(self, data, create_time, update_time):
+        self.data = data
+        self.create_time = create_time
+        self.update_time = update_time
+
+
+class MemoryWriteResult:
+    __slots__ = ('update_time',)
+
+    def __init__(self, update_time):
+        self.update_time = update_time
+
+
+class MemoryDocumentSnapshot:
+    """
+    Equivalente a `DocumentSnapshot`.
+    """
+
+    def __init__(self, reference, data, create_time=None, update_time=None, read_time=None):
+        self.reference = reference
+        self._data = data
+        self.create_time = create_time
+        self.update_time = update_time
+        self.read_time = read_time
+
+    @property
+    def id(self):
+        return self.reference.id
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        if self._data is None:
+            return None
+        return _copy_value(self._data)
+
+    def get(self, field_path):
+        if self._data is None:
+            return None
+        return _copy_value(_get_field(self._data, field_path))
+
+
+class MemoryDocumentReference:
+    """
+    Equivalente a `DocumentReference`.
+    """
+
+    def __init__(self, client, path):
+        self._client = client
+        self._path = path
+
+    def __eq__(self, other):
+        return isinstance(other, MemoryDocumentReference) and other._path == self._path
+
+    def __hash__(self):
+        return hash(self._path)
+
+    def __repr__(self):
+        return f"<MemoryDocumentReference {self.path}>"
+
+    @property
+    def id(self):
+        return self._path[-1]
+
+    @property
+    def path(self):
+        return '/'.join(self._path)
+
+    @property
+    def parent(self):
+        return MemoryCollectionReference(self._client, self._path[:-1])
+
+    def collection(self, collection_id):
+        return MemoryCollectionReference(self._client, self._path + _split_path(collection_id))
+
+    def collections(self):
+        self._client._rpc()
+        return [
+            MemoryCollectionReference(self._client, path)
+            for path in self._client._subcollection_paths(self._path)
+        ]
+
+    def get(self, field_paths=None, transaction=None):
+        if transaction is None:
+            self._client._rpc()
+        return self._client._snapshot(self, field_paths)
+
+    def set(self, document_data, merge=False):
+        return self._client._commit([('set', self._path, document_data, merge, None)])[0]
+
+    def create(self, document_data):
+        return self._client._commit([('create', self._path, document_data, False, None)])[0]
+
+    def update(self, field_updates, option=None):
+        return self._client._commit([('update', self._path, field_updates, False, option)])[0]
+
+    def delete(self, option=None):
+        return self._client._commit([('delete', self._path, None, False, option)])[0]
+
+    def on_snapshot(self, callback):
+        return self._client._watch(self, callback)
+
+
+class MemoryQuery:
+    """
+    Equivalente a `Query`: filtros, ordenação, cursores, limite e projeção.
+    """
+
+    def __init__(self, client, parent_path, filters=(), orders=(), limit=None,
+                 offset=0, cursor=None, collection_group=False, projection=None):
+        self._client = client
+        self._parent_path = parent_path
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit
+        self._offset = offset
+        self._cursor = cursor
+        self._collection_group = collection_group
+        self._projection = projection
+
+    def _copy(self, **changes):
+        params = {
+            'filters': self._filters,
+            'orders': self._orders,
+            'limit': self._limit,
+            'offset': self._offset,
+            'cursor': self._cursor,
+            'collection_group': self._collection_group,
+            'projection': self._projection,
+        }
+        params.update(changes)
+        return MemoryQuery(self._client, self._parent_path, **params)
+
+    def where(self, field_path=None, op_string=None, value=None, *, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction=ASCENDING):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def select(self, field_paths):
+        return self._copy(projection=tuple(field_paths))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def offset(self, num_to_skip):
+        return self._copy(offset=num_to_skip)
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(cursor=(document_fields_or_snapshot, False))
+
+    def start_at(self, document_fields_or_snapshot):
+        return self._copy(cursor=(document_fields_or_snapshot, True))
+
+    def get(self, transaction=None):
+        return list(self.stream(transaction=transaction))
+
+    def on_snapshot(self, callback):
+        return self._client._watch(self, callback)
+
+    def stream(self, transaction=None):
+        if transaction is None:
+            self._client._rpc()
+        return iter(self._client._run_query(self))
+
+    # Auxiliares usados pelo cliente para executar a consulta
+
+    def _effective_orders(self):
+        orders = list(self._orders)
+        ordered = {field for field, _ in orders}
+        for field, op, _ in self._filters:
+            if op in _RANGE_OPERATORS and field not in ordered:
+                orders.insert(0, (field, ASCENDING))
+                ordered.add(field)
+        if DOCUMENT_ID not in ordered:
+            orders.append((DOCUMENT_ID, orders[-1][1] if orders else ASCENDING))
+        return orders
+
+    def _matches(self, doc_id, data):
+        for field, op, value in self._filters:
+            try:
+                current = doc_id if field == DOCUMENT_ID else _get_field(data, field)
+            except KeyError:
+                return False
+
+            if op == '==':
+                if current != value:
+                    return False
+            elif op == '!=':
+                if current == value or current is None:
+                    return False
+            elif op == 'in':
+                if current not in value:
+                    return False
+            elif op == 'not-in':
+                if current in value or current is None:
+                    return False
+            elif op == 'array_contains':
+                if not isinstance(current, list) or value not in current:
+                    return False
+            elif op == 'array_contains_any':
+                if not isinstance(current, list) or not any(item in current for item in value):
+                    return False
+            else:
+                current_key, value_key = _sort_key(current), _sort_key(value)
+                if current_key[0] != value_key[0]:
+                    return False
+                if op == '<' and not current_key < value_key:
+                    return False
+                if op == '<=' and not current_key <= value_key:
+                    return False
+                if op == '>' and not current_key > value_key:
+                    return False
+                if op == '>=' and not current_key >= value_key:
+                    return False
+        return True
+
+
+class MemoryCollectionReference(MemoryQuery):
+    """
+    Equivalente a `CollectionReference`.
+    """
+
+    def __init__(self, client, path):
+        super().__init__(client, path)
+        self._path = path
+
+    def __repr__(self):
+        return f"<MemoryCollectionReference {self.path}>"
+
+    @property
+    def id(self):
+        return self._path[-1]
+
+    @property
+    def path(self):
+        return '/'.join(self._path)
+
+    @property
+    def parent(self):
+        if len(self._path) == 1:
+            return None
+        return MemoryDocumentReference(self._client, self._path[:-1])
+
+    def document(self, document_id=None):
+        if document_id is None:
+            document_id = uuid.uuid4().hex[:20]
+        return MemoryDocumentReference(self._client, self._path + _split_path(document_id))
+
+    def add(self, document_data, document_id=None):
+        document_ref = self.document(document_id)
+        write_result = document_ref.create(document_data)
+        return write_result.update_time, document_ref
+
+    def list_documents(self):
+        self._client._rpc()
+        return [self.document(doc_id) for doc_id in self._client._collection_ids(self._path)]
+
+
+class MemoryWriteOption:
+    """
+    Pré-condição de escrita, criada com `MemoryFirestore.write_option`.
+    """
+
+    def __init__(self, exists=None, last_update_time=None):
+        self.exists = exists
+        self.last_update_time = last_update_time
+
+
+class MemoryWatch:
+    """
+    Equivalente a `Watch`: um listener registrado com `on_snapshot`.
+    """
+
+    def __init__(self, client, target, callback):
+        self._client = client
+        self._target = target
+        self._callback = callback
+        # Snapshots atuais, na ordem do resultado: {caminho: snapshot}
+        self._documents = {}
+        self.active = True
+
+    def unsubscribe(self):
+        self.active = False
+        with self._client._lock:
+            if self in self._client._watches:
+                self._client._watches.remove(self)
+
+    def _affected_by(self, paths):
+        target = self._target
+        if isinstance(target, MemoryDocumentReference):
+            return target._path in paths
+        if target._collection_group:
+            return any(path[-2] == target._parent_path[0] for path in paths)
+        return any(path[:-1] == target._parent_path for path in paths)
+
+    def _refresh(self, initial=False):
+        """
+        Relê o alvo e calcula as mudanças desde a última notificação.
+        Chamado com o lock do cliente.
+        """
+        if isinstance(self._target, MemoryDocumentReference):
+            current = [self._client._snapshot(self._target)]
+            documents = {self._target._path: current[0]}
+        else:
+            current = self._client._run_query(self._target)
+            documents = {snapshot.reference._path: snapshot for snapshot in current}
+
+        changes = []
+        old_indexes = {path: index for index, path in enumerate(self._documents)}
+        for path, snapshot in self._documents.items():
+            if path not in documents or not documents[path].exists:
+                if snapshot.exists:
+                    changes.append(DocumentChange(ChangeType.REMOVED, snapshot, old_indexes[path], -1))
+        for new_index, (path, snapshot) in enumerate(documents.items()):
+            if not snapshot.exists:
+                continue
+            previous = self._documents.get(path)
+            if previous is None or not previous.exists:
+                changes.append(DocumentChange(ChangeType.ADDED, snapshot, -1, new_index))
+            elif previous.update_time != snapshot.update_time:
+                changes.append(DocumentChange(ChangeType.MODIFIED, snapshot, old_indexes[path], new_index))
+
+        self._documents = documents
+        if initial or changes:
+            read_time = current[0].read_time if current else _now()
+            self._client._notify(self, current, changes, read_time)
+
+
+class MemoryWriteBatch:
+    """
+    Equivalente a `WriteBatch`: as escritas são aplicadas atomicamente no commit.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def __len__(self):
+        return len(self._writes)
+
+    def set(self, reference, document_data, merge=False):
+        self._writes.append(('set', reference._path, document_data, merge, None))
+        return self
+
+    def create(self, reference, document_data):
+        self._writes.append(('create', reference._path, document_data, False, None))
+        return self
+
+    def update(self, reference, field_updates, option=None):
+        self._writes.append(('update', reference._path, field_updates, False, option))
+        return self
+
+    def delete(self, reference, option=None):
+        self._writes.append(('delete', reference._path, None, False, option))
+        return self
+
+    def commit(self):
+        writes, self._writes = self._writes, []
+        return self._client._commit(writes)
+
+
+class MemoryTransaction(MemoryWriteBatch):
+    """
+    Transação em memória. `run` executa o callback com o lock global do
+    cliente, de modo que leituras e escritas da transação são serializáveis.
+    """
+
+    def get(self, ref_or_query):
+        if isinstance(ref_or_query, MemoryDocumentReference):
+            return iter(self._client.get_all([ref_or_query], transaction=self))
+        return ref_or_query.stream(transaction=self)
+
+    def run(self, callback, *args, **kwargs):
+        with self._client._lock:
+            self._client._rpc()
+            self._writes = []
+            result = callback(self, *args, **kwargs)
+            if self._writes:
+                self.commit()
+            return result
+
+
+class MemoryFirestore:
+    """
+    Cliente do Firestore em memória, seguro para uso entre threads.
+
+    Args:
+        latency: Latência simulada, em segundos, de cada chamada ao servidor.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.stats = Counter()
+        self._collections = {}
+        self._lock = threading.RLock()
+        self._watches = []
+        self._notifications = None
+
+    # API pública do cliente
+
+    def collection(self, *collection_path):
+        return MemoryCollectionReference(self, _split_path(*collection_path))
+
+    def document(self, *document_path):
+        return MemoryDocumentReference(self, _split_path(*document_path))
+
+    def collection_group(self, collection_id):
+        return MemoryQuery(self, (collection_id,), collection_group=True)
+
+    def collections(self):
+        self._rpc()
+        with self._lock:
+            ids = sorted({path[0] for path in self._collections if len(path) == 1})
+        return [self.collection(collection_id) for collection_id in ids]
+
+    def batch(self):
+        return MemoryWriteBatch(self)
+
+    def transaction(self, **kwargs):
+        return MemoryTransaction(self)
+
+    @staticmethod
+    def write_option(**kwargs):
+        if len(kwargs) != 1 or not set(kwargs) <= {'exists', 'last_update_time'}:
+            raise TypeError('write_option aceita exatamente um de: exists, last_update_time')
+        return MemoryWriteOption(**kwargs)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        if transaction is None:
+            self._rpc()
+        with self._lock:
+            return [self._snapshot(reference, field_paths) for reference in references]
+
+    def reset(self):
+        """
+        Apaga todos os dados e zera as estatísticas.
+        """
+        with self._lock:
+            self._collections.clear()
+            self.stats.clear()
+
+    def dump(self, path):
+        """
+        Salva todos os documentos em um arquivo (pickle comprimido com gzip).
+        """
+        with self._lock:
+            with gzip.open(path, 'wb') as arquivo:
+                pickle.dump(self._collections, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load(self, path):
+        """
+        Substitui os dados atuais pelos salvos em `path` com `dump`.
+        """
+        with gzip.open(path, 'rb') as arquivo:
+            collections = pickle.load(arquivo)
+        with self._lock:
+            self._collections = collections
+
+    # Implementação interna
+
+    def _rpc(self):
+        self.stats['rpcs'] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _collection_ids(self, collection_path):
+        with self._lock:
+            return list(self._collections.get(collection_path, {}))
+
+    def _subcollection_paths(self, document_path):
+        size = len(document_path) + 1
+        with self._lock:
+            return sorted(
+                path for path, docs in self._collections.items()
+                if len(path) == size and path[:-1] == document_path and docs
+            )
+
+    def _snapshot(self, reference, field_paths=None):
+        with self._lock:
+            stored = self._collections.get(reference._path[:-1], {}).get(reference._path[-1])
+            self.stats['reads'] += 1
+            if stored is None:
+                return MemoryDocumentSnapshot(reference, None, read_time=_now())
+            return MemoryDocumentSnapshot(
+                reference, _project(stored.data, field_paths), stored.create_time, stored.update_time, _now()
+            )
+
+    def _run_query(self, query):
+        with self._lock:
+            if query._collection_group:
+                collections = [
+                    (path, docs) for path, docs in self._collections.items()
+                    if path[-1] == query._parent_path[0]
+                ]
+            else:
+                collections = [(query._parent_path, self._collections.get(query._parent_path, {}))]
+
+            orders = query._effective_orders()
+            rows = []
+            for path, docs in collections:
+                for doc_id, stored in docs.items():
+                    if not query._matches(doc_id, stored.data):
+                        continue
+                    try:
+                        key = tuple(
+                            _sort_key(doc_id if field == DOCUMENT_ID else _get_field(stored.data, field))
+                            for field, _ in orders
+                        )
+                    except KeyError:
+                        # Documentos sem o campo ordenado não aparecem no resultado
+                        continue
+                    rows.append((key, path, doc_id, stored))
+
+            for index in range(len(orders) - 1, -1, -1):
+                reverse = orders[index][1] == DESCENDING
+                rows.sort(key=lambda row: row[0][index], reverse=reverse)
+
+            if query._cursor is not None:
+                rows = self._apply_cursor(rows, orders, *query._cursor)
+
+            rows = rows[query._offset:]
+            if query._limit is not None:
+                rows = rows[:query._limit]
+
+            read_time = _now()
+            self.stats['reads'] += len(rows)
+            return [
+                MemoryDocumentSnapshot(
+                    MemoryDocumentReference(self, path + (doc_id,)),
+                    _project(stored.data, query._projection),
+                    stored.create_time,
+                    stored.update_time,
+                    read_time,
+                )
+                for _, path, doc_id, stored in rows
+            ]
+
+    def _apply_cursor(self, rows, orders, cursor, inclusive):
+        if isinstance(cursor, MemoryDocumentSnapshot):
+            data = cursor._data or {}
+            values = [
+                cursor.id if field == DOCUMENT_ID else _get_field(data, field)
+                for field, _ in orders
+            ]
+        else:
+            values = [cursor[field] for field, _ in orders if field in cursor]
+
+        cursor_key = [_sort_key(value) for value in values]
+
+        def after_cursor(row):
+            for index, value_key in enumerate(cursor_key):
+                row_key = row[0][index]
+                if row_key == value_key:
+                    continue
+                if orders[index][1] == DESCENDING:
+                    return row_key < value_key
+                return row_key > value_key
+            return inclusive
+
+        return [row for row in rows if after_cursor(row)]
+
+    def _watch(self, target, callback):
+        self._rpc()
+        watch = MemoryWatch(self, target, callback)
+        with self._lock:
+            self._watches.append(watch)
+            watch._refresh(initial=True)
+        return watch
+
+    def _notify(self, watch, snapshots, changes, read_time):
+        """
+        Enfileira um callback de listener. Os callbacks rodam em um único
+        thread, fora do lock, na ordem dos commits.
+        """
+        if self._notifications is None:
+            self._notifications = queue.SimpleQueue()
+            threading.Thread(
+                target=self._dispatch_notifications, name='memory-firestore-watch', daemon=True
+            ).start()
+        self._notifications.put((watch, snapshots, changes, read_time))
+
+    def _dispatch_notifications(self):
+        while True:
+            watch, snapshots, changes, read_time = self._notifications.get()
+            if not watch.active:
+                continue
+            try:
+                watch._callback(snapshots, changes, read_time)
+            except Exception:
+                logger.exception("Erro no callback de on_snapshot")
+
+    def _commit(self, writes):
+        """
+        Aplica uma lista de escritas atomicamente: ou todas ou nenhuma.
+        """
+        self._rpc()
+        with self._lock:
+            commit_time = _now()
+            staged = {}
+
+            def current(path):
+                if path in staged:
+                    return staged[path]
+                return self._collections.get(path[:-1], {}).get(path[-1])
+
+            for kind, path, data, merge, option in writes:
+                existing = current(path)
+                if option is not None:
+                    self._check_precondition(path, existing, option)
+
+                if kind == 'create':
+                    if existing is not None:
+                        raise exceptions.AlreadyExists(f"Documento já existe: {'/'.join(path)}")
+                    staged[path] = _StoredDocument(_merge({}, data, commit_time), commit_time, commit_time)
+                elif kind == 'set':
+                    base = _copy_value(existing.data) if (merge and existing is not None) else {}
+                    create_time = existing.create_time if existing is not None else commit_time
+                    staged[path] = _StoredDocument(_merge(base, data, commit_time), create_time, commit_time)
+                elif kind == 'update':
+                    if existing is None:
+                        raise exceptions.NotFound(f"Documento não encontrado: {'/'.join(path)}")
+                    staged[path] = _StoredDocument(
+                        _update(_copy_value(existing.data), data, commit_time), existing.create_time, commit_time
+                    )
+                elif kind == 'delete':
+                    staged[path] = None
+
+            for path, stored in staged.items():
+                docs = self._collections.setdefault(path[:-1], {})
+                if stored is None:
+                    docs.pop(path[-1], None)
+                else:
+                    docs[path[-1]] = stored
+
+            self.stats['writes'] += len(writes)
+
+            for watch in list(self._watches):
+                if watch._affected_by(staged):
+                    watch._refresh()
+
+            return [MemoryWriteResult(commit_time) for _ in writes]
+
+    def _check_precondition(self, path, existing, option):
+        exists = getattr(option, 'exists', None)
+        last_update_time = getattr(option, 'last_update_time', None)
+        if exists is not None and exists != (existing is not None):
+            raise exceptions.FailedPrecondition(f"Pré-condição de existência falhou: {'/'.join(path)}")
+        if last_update_time is not None and (existing is None or existing.update_time != last_update_time):
+            raise exceptions.FailedPrecondition(f"Documento alterado desde a leitura: {'/'.join(path)}")
@@ -0,0 +1,222 @@
+"""
+Orçamentos mensais por categoria.
+
+O documento users/{id}/indices/orcamentos guarda os limites definidos pelo
+usuário e o total gasto em cada categoria em cada mês:
+
+    {
+        'limites': {'Alimentação': 800.0},
+        'gastos': {'2026-10': {'Alimentação': 312.5}},
+    }
+
+Os gastos são atualizados com incrementos no mesmo batch de cada escrita de
+despesa (`AlteracoesOrcamentos`), então verificar se um limite foi
+ultrapassado é uma comparação entre dois números do documento, sem somar as
+despesas do mês.
+"""
+import datetime
+import re
+
+from firebase_admin import firestore
+
+# Caminho do documento dos orçamentos, relativo a users/{id}
+DOCUMENTO_ORCAMENTOS = 'indices/orcamentos'
+
+# Tipo de transação contado nos orçamentos
+TIPO_ORCAMENTO = 'despesa'
+
+# Número máximo de categorias com limite por usuário
+MAX_ORCAMENTOS = 100
+
+_MES = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+
+
+def mes_valido(mes):
+    """
+    Indica se `mes` está no formato AAAA-MM.
+    """
+    return isinstance(mes, str) and bool(_MES.match(mes))
+
+
+def mes_transacao(dados):
+    """
+    Mês (AAAA-MM) em que uma despesa é contada, ou None se a data for
+    inválida.
+    """
+    mes = str(dados.get('data') or '')[:7]
+    return mes if mes_valido(mes) else None
+
+
+def mes_atual(hoje=None):
+    """
+    Mês corrente no formato AAAA-MM.
+    """
+    return (hoje or datetime.date.today()).strftime('%Y-%m')
+
+
+class AlteracoesOrcamentos:
+    """
+    Acumula as variações dos gastos mensais causadas por um conjunto de
+    escritas de transações, para gravá-las com uma única escrita no batch.
+    """
+    __slots__ = ('gastos',)
+
+    def __init__(self):
+        self.gastos = {}
+
+    def adicionar(self, tipo, dados, sinal=1):
+        """
+        Soma (sinal 1) ou subtrai (sinal -1) uma despesa dos gastos do mês.
+        """
+        categoria = dados.get('categoria')
+        if tipo != TIPO_ORCAMENTO or not categoria:
+            return
+        mes = mes_transacao(dados)
+        if mes is None:
+            return
+        chave = (mes, categoria)
+        self.gastos[chave] = self.gastos.get(chave, 0.0) + sinal * float(dados.get('valor') or 0)
+
+    def alterar(self, tipo, antes, depois):
+        """
+        Troca a contagem de uma despesa alterada de `antes` para `depois`.
+        """
+        if all(antes.get(campo) == depois.get(campo) for campo in ('valor', 'categoria', 'data')):
+            return
+        self.adicionar(tipo, antes, -1)
+        self.adicionar(tipo, depois, 1)
+
+    def to_firestore(self):
+        """
+        Dados para `set(..., merge=True)` no documento dos orçamentos, ou None
+        se nada mudou.
+        """
+        gastos = {}
+        for (mes, categoria), delta in self.gastos.items():
+            if delta:
+                gastos.setdefault(mes, {})[categoria] = firestore.Increment(delta)
+        return {'gastos': gastos} if gastos else None
+
+
+def avaliar_despesa(orcamentos, dados):
+    """
+    Verifica o orçamento da categoria de uma despesa já gravada.
+
+    Args:
+        orcamentos: Dicionário do documento dos orçamentos, lido depois da
+            escrita da despesa (ou None)
+        dados: Dados da despesa (valor, data e categoria)
+
+    Returns:
+        Dicionário do alerta, se o gasto do mês na categoria passou do
+        limite, ou None
+    """
+    categoria = dados.get('categoria')
+    limite = ((orcamentos or {}).get('limites') or {}).get(categoria) if categoria else None
+    mes = mes_transacao(dados)
+    if not limite or mes is None:
+        return None
+
+    gasto = ((orcamentos.get('gastos') or {}).get(mes) or {}).get(categoria, 0.0)
+    if gasto <= limite:
+        return None
+
+    # O limite foi ultrapassado por esta despesa ou já estava ultrapassado
+    ultrapassado_agora = gasto - float(dados.get('valor') or 0) <= limite
+    excedente = round(gasto - limite, 2)
+    if ultrapassado_agora:
+        mensagem = f'Orçamento de {categoria} em {mes} ultrapassado em {excedente:.2f}'
+    else:
+        mensagem = f'Orçamento de {categoria} em {mes} já está {excedente:.2f} acima do limite'
+    return {
+        'categoria': categoria,
+        'mes': mes,
+        'limite': limite,
+        'gasto': round(gasto, 2),
+        'excedente': excedente,
+        'ultrapassado_agora': ultrapassado_agora,
+        'mensagem': mensagem,
+    }
+
+
+def situacao_orcamentos(orcamentos, mes):
+    """
+    Monta a situação de cada orçamento no mês a partir do documento.
+
+    Returns:
+        Dicionário com 'mes', 'orcamentos' (do maior para o menor percentual
+        usado) e os totais de limites e gastos das categorias com limite
+    """
+    limites = (orcamentos or {}).get('limites') or {}
+    gastos_mes = ((orcamentos or {}).get('gastos') or {}).get(mes) or {}
+
+    itens = []
+    for categoria, limite in limites.items():
+        if not limite:
+            continue
+        gasto = round(gastos_mes.get(categoria, 0.0), 2)
+        itens.append({
+            'categoria': categoria,
+            'limite': limite,
+            'gasto': gasto,
+            'restante': round(limite - gasto, 2),
+            'percentual': round(gasto / limite * 100, 1),
+            'ultrapassado': gasto > limite,
+        })
+    itens.sort(key=lambda item: (item['percentual'], item['categoria']), reverse=True)
+
+    return {
+        'mes': mes,
+        'orcamentos': itens,
+        'total_limites': round(sum(item['limite'] for item in itens), 2),
+        'total_gasto': round(sum(item['gasto'] for item in itens), 2),
+    }
+
+
+def validar_limites(limites):
+    """
+    Valida os limites enviados pelo usuário.
+
+    Args:
+        limites: Dicionário {categoria: valor}; valor None (ou 0) remove o
+            orçamento da categoria
+
+    Returns:
+        Dicionário {categoria: float ou None}
+
+    Raises:
+        ValueError: Se algum nome ou valor for inválido
+    """
+    if not isinstance(limites, dict) or not limites:
+        raise ValueError('Informe "limites" como um objeto {categoria: valor}')
+    if len(limites) > MAX_ORCAMENTOS:
+        raise ValueError(f'No máximo {MAX_ORCAMENTOS} orçamentos por requisição')
+
+    validados = {}
+    for categoria, valor in limites.items():
+        if not isinstance(categoria, str) or not categoria.strip():
+            raise ValueError('Nome de categoria inválido')
+        if valor is None or valor == 0:
+            validados[categoria] = None
+            continue
+        if isinstance(valor, bool):
+            raise ValueError(f'Limite inválido para {categoria}')
+        try:
+            valor = float(valor)
+        except (TypeError, ValueError):
+            raise ValueError(f'Limite inválido para {categoria}')
+        if not valor > 0 or valor == float('inf'):
+            raise ValueError(f'Limite inválido para {categoria}')
+        validados[categoria] = valor
+    return validados
+
+
+def limites_firestore(limites):
+    """
+    Dados para `set(..., merge=True)` no documento dos orçamentos a partir de
+    limites validados: None remove o limite da categoria.
+    """
+    return {'limites': {
+        categoria: firestore.DELETE_FIELD if valor is None else valor
+        for categoria, valor in limites.items()
+    }}
@@ -0,0 +1,234 @@
+"""
+Modelo de leitura relacional (opcional) para relatórios.
+
+Com READ_MODEL_ENABLED, usuários e transações são espelhados em tabelas SQL
+(`UsuarioLeitura` e `TransacaoLeitura`, em users/models.py) no banco de
+READ_MODEL_URL: SQLite por padrão, ou Postgres. O `ModeloLeitura` é
+registrado como observador do `FirestoreClient` e aplica cada escrita
+confirmada no Firestore; o comando `backfill_read_model` copia os dados já
+existentes.
+
+Com RELATORIO_FONTE='sql', `relatorio_por_periodo` é calculado com agregações
+SQL sobre os índices de usuário, data e categoria, em vez de ler todos os
+documentos do período no Firestore. O Firestore continua sendo a fonte da
+verdade: se uma escrita no banco relacional falhar, ela é registrada no log e
+o `backfill_read_model` corrige a cópia.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from firebase_admin import firestore
+
+from users.models import ESQUEMAS_TRANSACAO, TransacaoLeitura, UsuarioLeitura
+
+from .firebase import COLECOES_TRANSACAO, calcular_intervalo, filtrar_campos
+
+# Colunas regravadas quando a transação já existe no modelo de leitura
+CAMPOS_ATUALIZADOS = (
+    'valor', 'data', 'descricao', 'local', 'categoria', 'periodo', 'recorrente', 'origem_recorrencia', 'substitui',
+    'updated_at'
+)
+
+
+def _data(valor):
+    if isinstance(valor, datetime.date):
+        return valor
+    try:
+        return datetime.date.fromisoformat(str(valor)[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def _momento(valor):
+    if valor is firestore.SERVER_TIMESTAMP:
+        # Ainda não resolvido pelo servidor: o instante do commit é agora
+        return datetime.datetime.now(datetime.timezone.utc)
+    return valor if isinstance(valor, datetime.datetime) else None
+
+
+def linha_transacao(user_id, tipo, transacao_id, dados):
+    """
+    Converte o documento de uma transação em uma linha de TransacaoLeitura.
+    """
+    _, campo_data = COLECOES_TRANSACAO[tipo]
+    return TransacaoLeitura(
+        user_id=user_id,
+        tipo=tipo,
+        transacao_id=transacao_id,
+        valor=float(dados.get('valor') or 0),
+        data=_data(dados.get(campo_data)),
+        descricao=dados.get('descricao') or '',
+        local=dados.get('local') or '',
+        categoria=dados.get('categoria'),
+        periodo=dados.get('periodo'),
+        recorrente=bool(dados.get('recorrente', False)),
+        origem_recorrencia=dados.get('origem_recorrencia'),
+        substitui=dados.get('substitui'),
+        updated_at=_momento(dados.get('updated_at')),
+    )
+
+
+def dicionario_transacao(linha):
+    """
+    Converte uma linha de TransacaoLeitura no formato das transações da API.
+    """
+    _, campo_data = COLECOES_TRANSACAO[linha.tipo]
+    valores = {
+        'valor': linha.valor,
+        campo_data: linha.data.isoformat() if linha.data else None,
+        'descricao': linha.descricao,
+        'local': linha.local,
+        'categoria': linha.categoria if linha.categoria is not None else '',
+        'periodo': linha.periodo or 'mensal',
+        'recorrente': linha.recorrente,
+    }
+    dados = {nome: valores[nome] for nome, _, _ in ESQUEMAS_TRANSACAO[linha.tipo]}
+    dados['tipo'] = linha.tipo
+    if linha.origem_recorrencia:
+        dados['origem_recorrencia'] = linha.origem_recorrencia
+    if linha.substitui:
+        dados['substitui'] = linha.substitui
+    if linha.updated_at:
+        dados['updated_at'] = linha.updated_at
+    dados['id'] = linha.transacao_id
+    return dados
+
+
+class ModeloLeitura:
+    """
+    Observador do FirestoreClient que mantém o modelo de leitura e calcula
+    relatórios a partir dele.
+    """
+
+    def usuario_gravado(self, user_id, dados):
+        campos = {'email': dados.get('email') or '', 'nome': dados.get('nome') or ''}
+        if 'saldo' in dados:
+            campos['saldo'] = float(dados['saldo'] or 0)
+        UsuarioLeitura.objects.update_or_create(user_id=user_id, defaults=campos)
+
+    def transacoes_gravadas(self, user_id, itens, delta_saldo):
+        linhas = [linha_transacao(user_id, tipo, transacao_id, dados) for tipo, transacao_id, dados in itens]
+        with transaction.atomic():
+            TransacaoLeitura.objects.bulk_create(
+                linhas,
+                update_conflicts=True,
+                unique_fields=['user_id', 'tipo', 'transacao_id'],
+                update_fields=CAMPOS_ATUALIZADOS,
+            )
+            self._ajustar_saldo(user_id, delta_saldo)
+
+    def transacoes_removidas(self, user_id, chaves, delta_saldo):
+        with transaction.atomic():
+            for tipo in {tipo for tipo, _ in chaves}:
+                TransacaoLeitura.objects.filter(
+                    user_id=user_id, tipo=tipo,
+                    transacao_id__in=[transacao_id for tipo_chave, transacao_id in chaves if tipo_chave == tipo]
+                ).delete()
+            self._ajustar_saldo(user_id, delta_saldo)
+
+    @staticmethod
+    def _ajustar_saldo(user_id, delta_saldo):
+        if delta_saldo:
+            UsuarioLeitura.objects.filter(user_id=user_id).update(saldo=F('saldo') + delta_saldo)
+
+    def copiar_usuario(self, firestore_client, user_id, pagina=500):
+        """
+        Substitui a cópia de um usuário e de todas as suas transações,
+        incluindo as arquivadas, pelo estado atual do Firestore (usado pelo
+        `backfill_read_model`).
+
+        Returns:
+            Número de transações copiadas
+        """
+        usuario = firestore_client.document(f"users/{user_id}").get()
+        if not usuario.exists:
+            with transaction.atomic():
+                UsuarioLeitura.objects.filter(user_id=user_id).delete()
+                TransacaoLeitura.objects.filter(user_id=user_id).delete()
+            return 0
+
+        linhas = [
+            linha_transacao(user_id, tipo, transacao_id, dados)
+            for tipo, transacao_id, dados in firestore_client.iterar_transacoes(user_id, pagina=pagina)
+        ]
+
+        dados = usuario.to_dict()
+        with transaction.atomic():
+            UsuarioLeitura.objects.update_or_create(user_id=user_id, defaults={
+                'email': dados.get('email') or '',
+                'nome': dados.get('nome') or '',
+                'saldo': float(firestore_client.saldo_usuario(usuario) or 0),
+            })
+            TransacaoLeitura.objects.filter(user_id=user_id).delete()
+            TransacaoLeitura.objects.bulk_create(linhas, batch_size=pagina)
+        return len(linhas)
+
+    def relatorio(self, user_id, periodo=None, data_inicio=None, data_fim=None, tipo=None, limite=100,
+                  apenas_resumo=False, campos=None):
+        """
+        Mesmo resultado de `FirestoreClient.get_transacoes_por_periodo`, com os
+        totais calculados por agregações SQL sobre todas as transações do
+        período (sem limite de documentos). As transações listadas, até
+        `limite` por tipo, vêm da mais recente para a mais antiga.
+        """
+        if periodo and not (data_inicio and data_fim):
+            data_inicio, data_fim = calcular_intervalo(periodo)
+
+        consulta = TransacaoLeitura.objects.filter(user_id=user_id)
+        if data_inicio:
+            consulta = consulta.filter(data__gte=data_inicio)
+        if data_fim:
+            consulta = consulta.filter(data__lte=data_fim)
+        if tipo:
+            consulta = consulta.filter(tipo=tipo)
+
+        total_despesas = 0.0
+        total_ganhos = 0.0
+        quantidade = 0
+        categorias = {}
+        agregados = consulta.values('tipo', 'categoria').annotate(total=Sum('valor'), quantidade=Count('id'))
+        for agregado in agregados.order_by():
+            categoria = agregado['categoria'] if agregado['categoria'] is not None else 'Sem categoria'
+            totais_categoria = categorias.setdefault(categoria, {'despesas': 0, 'ganhos': 0})
+            if agregado['tipo'] == 'despesa':
+                total_despesas += agregado['total']
+                totais_categoria['despesas'] += agregado['total']
+            else:
+                total_ganhos += agregado['total']
+                totais_categoria['ganhos'] += agregado['total']
+            quantidade += agregado['quantidade']
+
+        resultado = {
+            'total_despesas': total_despesas,
+            'total_ganhos': total_ganhos,
+            'saldo_periodo': total_ganhos - total_despesas,
+            'categorias': categorias,
+            'quantidade': quantidade,
+            'periodo': {
+                'tipo': periodo,
+                'data_inicio': data_inicio,
+                'data_fim': data_fim
+            },
+            'truncado': False,
+        }
+
+        if not apenas_resumo:
+            limite = max(1, min(limite, settings.RELATORIO_LIMITE_MAXIMO))
+            transacoes = []
+            for tipo_atual in COLECOES_TRANSACAO:
+                if tipo is not None and tipo != tipo_atual:
+                    continue
+                linhas = consulta.filter(tipo=tipo_atual).order_by('-data', '-transacao_id')[:limite]
+                for linha in linhas:
+                    dados = dicionario_transacao(linha)
+                    transacoes.append(filtrar_campos(dados, campos) if campos else dados)
+                resultado['truncado'] = resultado['truncado'] or len(linhas) >= limite
+            resultado['transacoes'] = transacoes
+
+        return resultado
+
+
+# Singleton para acesso global
+modelo_leitura = ModeloLeitura()
@@ -0,0 +1,127 @@
+"""
+Saldo distribuído em shards para contas com muitas escritas.
+
+O saldo de um usuário é sempre o campo `saldo` de users/{id} mais a soma dos
+documentos users/{id}/contadores_saldo/{n}. No modo normal não há shards e
+cada escrita incrementa o documento do usuário, que aceita poucas escritas
+sustentadas por segundo. No modo distribuído, o documento do usuário guarda
+`saldo_shards` (N) e cada escrita incrementa um dos N shards, sorteado.
+
+Como o total é a soma das duas partes, uma escrita feita por um servidor que
+ainda não viu a troca de modo continua correta. O modo de cada usuário fica no
+cache do Django por TTL_MODO segundos. Para voltar ao modo normal,
+`saldo_shards` passa a 0: as escritas voltam ao documento do usuário, mas as
+leituras continuam somando os shards. Depois de TTL_MODO, o valor de cada
+shard é movido para o documento do usuário no mesmo batch que remove o shard,
+e o campo é apagado.
+
+A soma dos shards fica no cache por SALDO_CACHE_TTL segundos, associada à
+versão da soma do usuário, um token no mesmo cache trocado depois de cada
+escrita em um shard. Uma soma calculada antes da troca (inclusive por uma
+leitura concorrente que a guarde depois dela) não vale mais para a nova
+versão. Isso só vale entre servidores se o cache for compartilhado (Redis):
+com um cache local a cada processo, SALDO_CACHE_TTL deve ser 0, o padrão
+sem REDIS_URL, e a soma não é guardada.
+"""
+import random
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Subcoleção dos shards, relativa a users/{id}
+COLECAO_SHARDS = 'contadores_saldo'
+
+# Campo do documento do usuário com o número de shards
+CAMPO_SHARDS = 'saldo_shards'
+
+# Número máximo de shards por usuário
+MAX_SHARDS = 100
+
+# Segundos que o modo de um usuário fica no cache
+TTL_MODO = 60
+
+
+def _cache():
+    return caches[settings.SALDO_CACHE]
+
+
+def _chave_modo(user_id):
+    return f'saldo:modo:{user_id}'
+
+
+def _chave_shards(user_id):
+    return f'saldo:shards:{user_id}'
+
+
+def _chave_versao(user_id):
+    return f'saldo:versao:{user_id}'
+
+
+def shard_aleatorio(shards):
+    """
+    Índice do shard que recebe uma escrita.
+    """
+    return str(random.randrange(shards))
+
+
+def modo_em_cache(user_id):
+    """
+    Número de shards do usuário guardado no cache (0 no modo normal), ou
+    None se não estiver no cache.
+    """
+    return _cache().get(_chave_modo(user_id))
+
+
+def guardar_modo(user_id, dados_usuario):
+    """
+    Guarda no cache o modo lido do documento do usuário.
+    """
+    _cache().set(_chave_modo(user_id), (dados_usuario or {}).get(CAMPO_SHARDS) or 0, TTL_MODO)
+
+
+def soma_em_cache(user_id):
+    """
+    Soma dos shards guardada no cache para a versão atual.
+
+    Returns:
+        Tupla (versão, soma), com soma None se não estiver no cache; a versão
+        deve ser lida antes dos shards e passada a `guardar_soma`
+    """
+    if settings.SALDO_CACHE_TTL <= 0:
+        return None, None
+    cache = _cache()
+    chave_versao = _chave_versao(user_id)
+    valores = cache.get_many([chave_versao, _chave_shards(user_id)])
+    versao = valores.get(chave_versao)
+    if versao is None:
+        versao = uuid.uuid4().hex
+        if not cache.add(chave_versao, versao, None):
+            return cache.get(chave_versao), None
+    guardado = valores.get(_chave_shards(user_id))
+    if guardado is None or guardado[0] != versao:
+        return versao, None
+    return versao, guardado[1]
+
+
+def guardar_soma(user_id, versao, soma):
+    if versao is not None:
+        _cache().set(_chave_shards(user_id), (versao, soma), settings.SALDO_CACHE_TTL)
+
+
+def descartar_soma(user_id):
+    """
+    Troca a versão da soma depois de uma escrita nos shards.
+    """
+    if settings.SALDO_CACHE_TTL > 0:
+        _cache().set(_chave_versao(user_id), uuid.uuid4().hex, None)
+
+
+def validar_shards(shards):
+    """
+    Raises:
+        ValueError: Se o número de shards estiver fora de 1..MAX_SHARDS
+    """
+    if not 1 <= shards <= MAX_SHARDS:
+        raise ValueError(f'O número de shards deve estar entre 1 e {MAX_SHARDS}')
+    return shards
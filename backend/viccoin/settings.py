@@ -12,12 +12,17 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from decouple import config, Csv
 import dj_database_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# `manage.py test`: os testes usam o Firestore em memória e o banco de teste
+# do modelo de leitura, qualquer que seja o ambiente
+TESTING = sys.argv[1:2] == ['test']
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -48,6 +53,7 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Adicionar Whitenoise para arquivos estáticos
     'corsheaders.middleware.CorsMiddleware',  # Adicionando o middleware de CORS
+    'viccoin.throttling.ThrottleMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -80,8 +86,16 @@ WSGI_APPLICATION = 'viccoin.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-# Removendo o SQLite pois vamos usar Firebase
-DATABASES = {}
+# Os dados ficam no Firebase; o banco relacional é usado apenas pelo modelo de
+# leitura opcional para relatórios (viccoin/read_model.py): SQLite por padrão,
+# ou qualquer URL aceita pelo dj_database_url (por exemplo, postgres://...)
+READ_MODEL_ENABLED = config('READ_MODEL_ENABLED', default=False, cast=bool)
+READ_MODEL_URL = config('READ_MODEL_URL', default=f"sqlite:///{BASE_DIR / 'read_model.sqlite3'}")
+
+if READ_MODEL_ENABLED or TESTING:
+    DATABASES = {'default': dj_database_url.parse(READ_MODEL_URL, conn_max_age=600)}
+else:
+    DATABASES = {}
 
 
 # Password validation
@@ -131,10 +145,117 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 FIREBASE_CREDENTIALS_PATH = config('FIREBASE_CREDENTIALS_PATH', 
                                   default=os.path.join(BASE_DIR.parent, 'firebase-credentials.json'))
 
+# Backend do Firestore: 'firebase' (padrão) ou 'memory' para rodar sem
+# credenciais, em testes e benchmarks
+FIRESTORE_BACKEND = config('FIRESTORE_BACKEND', default='memory' if TESTING else 'firebase')
+
+# Latência simulada por chamada do backend em memória, em milissegundos
+FIRESTORE_MEMORY_LATENCY_MS = config('FIRESTORE_MEMORY_LATENCY_MS', default=0, cast=float)
+
+# Arquivo gerado por `generate_dataset --snapshot` carregado pelo backend em memória
+FIRESTORE_MEMORY_SNAPSHOT = config('FIRESTORE_MEMORY_SNAPSHOT', default='')
+
+# Máximo de transações por tipo retornadas por relatorio_por_periodo e
+# listar_transacoes
+RELATORIO_LIMITE_MAXIMO = config('RELATORIO_LIMITE_MAXIMO', default=1000, cast=int)
+
+# Máximo de documentos por tipo agregados no modo somente resumo
+RELATORIO_RESUMO_LIMITE = config('RELATORIO_RESUMO_LIMITE', default=50000, cast=int)
+
+# Fonte dos relatórios de relatorio_por_periodo: 'firestore' ou 'sql' (modelo de
+# leitura, exige READ_MODEL_ENABLED)
+RELATORIO_FONTE = config('RELATORIO_FONTE', default='firestore')
+
+# Máximo de documentos lidos por uma busca em /api/transacoes/busca/
+BUSCA_MAX_LEITURAS = config('BUSCA_MAX_LEITURAS', default=1000, cast=int)
+
+# Idade, em meses, a partir da qual as transações são compactadas em pacotes
+# mensais pelo comando archive_transactions (0 desativa o arquivo)
+ARQUIVO_MESES = config('ARQUIVO_MESES', default=24, cast=int)
+
+# Janela, em ms, em que as transações criadas por um mesmo usuário são
+# agrupadas em um único commit (0 desativa o agrupamento)
+GRUPO_ESCRITAS_JANELA_MS = config('GRUPO_ESCRITAS_JANELA_MS', default=0, cast=int)
+
+# Saldo distribuído em shards (viccoin/saldo.py): alias do cache onde ficam o
+# modo de cada usuário e a soma dos shards, e por quantos segundos a soma vale.
+# A soma só é guardada (TTL maior que 0) se o cache for compartilhado entre os
+# processos, como o Redis de REDIS_URL
+SALDO_CACHE = config('SALDO_CACHE', default='default')
+SALDO_CACHE_TTL = config('SALDO_CACHE_TTL', default=5 if config('REDIS_URL', default='') else 0, cast=int)
+
+# Máximo de documentos por tipo retornados por /api/transacoes/sync/
+SYNC_LIMITE = config('SYNC_LIMITE', default=500, cast=int)
+
+# Máximo de transações por requisição em /api/transacoes/lote/ (cada remoção
+# usa duas escritas e o batch do Firestore aceita até 500)
+LOTE_MAXIMO = config('LOTE_MAXIMO', default=200, cast=int)
+
+# Idempotency-Key: alias do cache onde as respostas ficam guardadas, por
+# quantos segundos, e quanto uma duplicata simultânea espera pela original
+IDEMPOTENCY_CACHE = config('IDEMPOTENCY_CACHE', default='default')
+IDEMPOTENCY_TTL = config('IDEMPOTENCY_TTL', default=86400, cast=int)
+IDEMPOTENCY_ESPERA = config('IDEMPOTENCY_ESPERA', default=30, cast=int)
+
+# Stream de eventos (/api/eventos/): intervalo do keepalive em segundos,
+# espera sugerida para reconexão e eventos pendentes por conexão
+SSE_KEEPALIVE = config('SSE_KEEPALIVE', default=15, cast=int)
+SSE_RETRY_MS = config('SSE_RETRY_MS', default=3000, cast=int)
+SSE_FILA_MAXIMA = config('SSE_FILA_MAXIMA', default=100, cast=int)
+
+# Threads usadas para as leituras concorrentes do endpoint /api/dashboard/
+DASHBOARD_WORKERS = config('DASHBOARD_WORKERS', default=16, cast=int)
+
 # Verificar se estamos no ambiente Render
 IS_RENDER = config('RENDER', default=False, cast=bool)
 
+# Cache do Django. Com REDIS_URL, o cache (e com ele as respostas idempotentes
+# e os limites de requisição) é compartilhado entre workers e instâncias
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    # Falhar na carga das configurações, e não em cada requisição à API
+    try:
+        import redis  # noqa: F401
+    except ImportError:
+        from django.core.exceptions import ImproperlyConfigured
+        raise ImproperlyConfigured('REDIS_URL exige o pacote redis (pip install -r requirements.txt)')
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+# Limite de requisições (viccoin/throttling.py): 'N/periodo' por classe de endpoint
+THROTTLE_ENABLED = config('THROTTLE_ENABLED', default=True, cast=bool)
+THROTTLE_RATES = {
+    'login': config('THROTTLE_LOGIN', default='10/min'),
+    'escrita': config('THROTTLE_ESCRITA', default='60/min'),
+    'leitura': config('THROTTLE_LEITURA', default='300/min'),
+    'ip': config('THROTTLE_IP', default='600/min'),
+}
+THROTTLE_BACKEND = config('THROTTLE_BACKEND', default='viccoin.throttling.CacheThrottleBackend')
+THROTTLE_CACHE = config('THROTTLE_CACHE', default='default')
+# Proxies confiáveis à frente da aplicação (o Render usa um) para obter o IP do X-Forwarded-For
+THROTTLE_PROXIES = config('THROTTLE_PROXIES', default=1 if IS_RENDER else 0, cast=int)
+
 # Configurações de Logging
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+LOG_JSON = config('LOG_JSON', default=True, cast=bool)
+
+# Fração dos registros abaixo de WARNING mantida por logger (1.0 = todos)
+LOG_SAMPLING_RATES = {
+    'viccoin': config('LOG_SAMPLE_RATE', default=1.0, cast=float),
+    'users': config('LOG_SAMPLE_RATE', default=1.0, cast=float),
+}
+
+# Máximo de registros por segundo abaixo de ERROR por logger
+LOG_RATE_LIMITS = {
+    'django': config('LOG_RATE_LIMIT', default=200, cast=float),
+    'viccoin': config('LOG_RATE_LIMIT', default=200, cast=float),
+    'users': config('LOG_RATE_LIMIT', default=200, cast=float),
+}
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -147,29 +268,38 @@ LOGGING = {
             'format': '{levelname} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'viccoin.log_handlers.JsonFormatter',
+        },
     },
     'handlers': {
-        'console': {
+        # Os registros são apenas enfileirados no thread da requisição;
+        # formatação e escrita acontecem em um thread em segundo plano.
+        'async': {
+            '()': 'viccoin.log_handlers.BackgroundQueueHandler',
             'level': 'DEBUG',
-            'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
+            'formatter': 'json' if LOG_JSON else 'verbose',
+            'filters': ['redact_authorization', 'sampling', 'rate_limit'],
+            'targets': [
+                {'class': 'logging.StreamHandler'},
+            ],
         },
     },
     'loggers': {
         'django': {
-            'handlers': ['console'],
+            'handlers': ['async'],
             'level': 'INFO',
-            'propagate': True,
+            'propagate': False,
         },
         'viccoin': {
-            'handlers': ['console'],
-            'level': 'DEBUG',
-            'propagate': True,
+            'handlers': ['async'],
+            'level': LOG_LEVEL,
+            'propagate': False,
         },
         'users': {
-            'handlers': ['console'],
-            'level': 'DEBUG',
-            'propagate': True,
+            'handlers': ['async'],
+            'level': LOG_LEVEL,
+            'propagate': False,
         },
     },
     'filters': {
@@ -179,30 +309,34 @@ LOGGING = {
         'require_debug_true': {
             '()': 'django.utils.log.RequireDebugTrue',
         },
+        'redact_authorization': {
+            '()': 'viccoin.log_handlers.RedactAuthorizationFilter',
+        },
+        'sampling': {
+            '()': 'viccoin.log_handlers.SamplingFilter',
+            'rates': LOG_SAMPLING_RATES,
+        },
+        'rate_limit': {
+            '()': 'viccoin.log_handlers.RateLimitFilter',
+            'limits': LOG_RATE_LIMITS,
+        },
     },
 }
 
-# Adicionar handler de arquivo apenas em ambiente de desenvolvimento
+# Adicionar destino de arquivo apenas em ambiente de desenvolvimento
 if not IS_RENDER:
     # Garantir que o diretório de logs existe
     logs_dir = os.path.join(BASE_DIR, 'logs')
     if not os.path.exists(logs_dir):
         os.makedirs(logs_dir)
         
-    # Adicionar handler de arquivo
-    LOGGING['handlers']['file'] = {
-        'level': 'INFO',
+    # O arquivo rotativo também é escrito pelo thread em segundo plano
+    LOGGING['handlers']['async']['targets'].append({
         'class': 'logging.handlers.RotatingFileHandler',
         'filename': os.path.join(logs_dir, 'viccoin.log'),
         'maxBytes': 1024*1024*5,  # 5 MB
         'backupCount': 5,
-        'formatter': 'verbose',
-    }
-    
-    # Atualizar loggers para usar o handler de arquivo
-    LOGGING['loggers']['django']['handlers'].append('file')
-    LOGGING['loggers']['viccoin']['handlers'].append('file')
-    LOGGING['loggers']['users']['handlers'].append('file')
+    })
 
 # Configuração CORS
 CORS_ALLOW_ALL_ORIGINS = True  # Em produção, deve ser definido para False e especificar origens
@@ -238,4 +372,5 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'idempotency-key',
 ]
@@ -0,0 +1,1057 @@
+import asyncio
+import contextlib
+import datetime
+import json
+import logging
+import sys
+import threading
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import AsyncClient, Client, SimpleTestCase, override_settings
+
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition, ServiceUnavailable
+
+from viccoin import firebase
+from viccoin.agrupamento import AgrupadorEscritas
+from viccoin.busca import termos_busca, termos_consulta
+from viccoin.categorias import GRUPOS_PALAVRAS, PALAVRAS_POR_TRANSACAO, AlteracoesCategorias
+from viccoin.events import event_hub
+from viccoin.saldo import CAMPO_SHARDS, COLECAO_SHARDS
+from viccoin.firebase import MAX_RETRIES, firestore_client, get_memory_client
+from viccoin.log_handlers import (
+    REDACTED, BackgroundQueueHandler, JsonFormatter, RateLimitFilter, RedactAuthorizationFilter, SamplingFilter
+)
+from viccoin.throttling import LocMemThrottleBackend, parse_rate
+from viccoin.memory_firestore import MemoryDocumentReference, MemoryFirestore, MemoryQuery, MemoryWriteBatch
+
+
+@contextlib.contextmanager
+def firestore_em_memoria():
+    """
+    Aponta o cliente e as referências `db` importadas pelos módulos para o
+    Firestore em memória, qualquer que seja o FIRESTORE_BACKEND do ambiente.
+    """
+    memoria = get_memory_client()
+    with contextlib.ExitStack() as pilha:
+        pilha.enter_context(override_settings(FIRESTORE_BACKEND='memory'))
+        pilha.enter_context(mock.patch.object(firestore_client, 'db', memoria))
+        for modulo in ('viccoin.firebase', 'viccoin.health', 'users.services', 'users.auth_migration'):
+            pilha.enter_context(mock.patch(f'{modulo}.db', memoria))
+        yield memoria
+
+
+@contextlib.contextmanager
+def modelo_leitura_ativo():
+    """
+    Ativa o modelo de leitura relacional (READ_MODEL_ENABLED) e registra seu
+    observador, se ainda não estiver registrado.
+    """
+    from viccoin.read_model import modelo_leitura
+
+    observadores = firestore_client.observadores
+    if modelo_leitura not in observadores:
+        observadores = [*observadores, modelo_leitura]
+    with override_settings(READ_MODEL_ENABLED=True), \
+            mock.patch.object(firestore_client, 'observadores', observadores):
+        yield modelo_leitura
+
+
+class FirestoreMemoriaTestCase(SimpleTestCase):
+    """
+    Base dos testes: Firestore em memória e caches vazios a cada teste, e um
+    usuário cadastrado com token de acesso.
+    """
+    email = 'teste@viccoin.com'
+    senha = '123456'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.enterClassContext(firestore_em_memoria())
+
+    def setUp(self):
+        get_memory_client().reset()
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        self.client = Client()
+        self.user_id = self.cadastrar(self.email)
+        self.headers = self.autenticar(self.email)
+
+    def cadastrar(self, email, nome='Teste'):
+        resposta = self.post('/api/users/register/', {'email': email, 'password': self.senha, 'nome': nome})
+        return resposta.json()['user']['uid']
+
+    def autenticar(self, email):
+        resposta = self.post('/api/users/login/', {'email': email, 'password': self.senha})
+        return {'HTTP_AUTHORIZATION': f"Bearer {resposta.json()['token']}"}
+
+    def post(self, url, dados, **extra):
+        return self.client.post(url, json.dumps(dados), content_type='application/json', **extra)
+
+    def get(self, url, dados=None):
+        return self.client.get(url, dados or {}, **self.headers)
+
+
+def _registro(mensagem, *args, nome='viccoin.teste', nivel=logging.INFO):
+    return logging.LogRecord(nome, nivel, __file__, 1, mensagem, args, None)
+
+
+class LogHandlersTests(SimpleTestCase):
+
+    def test_redacao_de_tokens_e_cabecalhos(self):
+        registro = _registro('Token Bearer abc.def-123 recebido de %s', {'Authorization': 'Bearer x', 'Host': 'a'})
+        RedactAuthorizationFilter().filter(registro)
+
+        self.assertEqual(registro.msg, f'Token Bearer {REDACTED} recebido de %s')
+        self.assertEqual(registro.args, {'Authorization': REDACTED, 'Host': 'a'})
+
+    def test_amostragem_por_logger(self):
+        filtro = SamplingFilter({'viccoin': 0.0, 'viccoin.views': 1.0})
+
+        self.assertFalse(filtro.filter(_registro('x')))
+        self.assertTrue(filtro.filter(_registro('x', nome='viccoin.views')))
+        self.assertTrue(filtro.filter(_registro('x', nivel=logging.WARNING)))
+
+    def test_limite_conta_registros_suprimidos(self):
+        filtro = RateLimitFilter({'viccoin': 2})
+        aceitos = [filtro.filter(_registro('x')) for _ in range(5)]
+        self.assertEqual(aceitos, [True, True, False, False, False])
+        self.assertTrue(filtro.filter(_registro('x', nivel=logging.ERROR)))
+
+        with mock.patch('viccoin.log_handlers.time.monotonic', return_value=10 ** 9):
+            registro = _registro('x')
+            self.assertTrue(filtro.filter(registro))
+        self.assertEqual(registro.suppressed, 3)
+
+    def test_fila_cheia_descarta_sem_bloquear(self):
+        handler = BackgroundQueueHandler(targets=[{'class': 'logging.NullHandler'}], queue_size=1)
+        handler.listener.stop()
+        handler.handle(_registro('a'))
+        handler.handle(_registro('b'))
+        self.assertEqual(handler.dropped, 1)
+        handler.close()
+
+    def test_mensagem_e_traceback_resolvidos_ao_enfileirar(self):
+        handler = BackgroundQueueHandler(targets=[{'class': 'logging.NullHandler'}])
+        handler.listener.stop()
+        ids = ['a']
+        try:
+            raise ValueError('falhou')
+        except ValueError:
+            registro = logging.LogRecord('viccoin.teste', logging.ERROR, __file__, 1, 'Ids %s', (ids,), sys.exc_info())
+        handler.handle(registro)
+        ids.append('b')
+
+        enfileirado = handler.queue.get_nowait()
+        self.assertEqual((enfileirado.msg, enfileirado.args, enfileirado.exc_info), ("Ids ['a']", None, None))
+        self.assertIn('ValueError: falhou', enfileirado.exc_text)
+        self.assertIsNotNone(registro.exc_info)
+        self.assertIn('ValueError: falhou', json.loads(JsonFormatter().format(enfileirado))['exc_info'])
+        handler.close()
+
+    def test_formato_json_inclui_extras(self):
+        registro = _registro('Gravado %s', 'ok')
+        registro.user_id = 'u1'
+        linha = json.loads(JsonFormatter().format(registro))
+
+        self.assertEqual((linha['message'], linha['level'], linha['user_id']), ('Gravado ok', 'INFO', 'u1'))
+
+
+class MemoriaFirestoreTests(SimpleTestCase):
+
+    def setUp(self):
+        self.db = MemoryFirestore()
+        self.colecao = self.db.collection('users/u1/despesas')
+        for indice, (data, valor) in enumerate([('2026-01-03', 3), ('2026-01-01', 1), ('2026-01-02', 2), ('2026-01-02', 4)]):
+            self.colecao.document(f'd{indice}').set({'data': data, 'valor': valor, 'categoria': 'A'})
+
+    def test_consulta_com_filtro_ordem_e_cursor(self):
+        query = self.colecao.where('data', '>=', '2026-01-02').order_by('data')
+        primeira = query.limit(2).get()
+        self.assertEqual([d.id for d in primeira], ['d2', 'd3'])
+        self.assertEqual([d.id for d in query.start_after(primeira[-1]).get()], ['d0'])
+        self.assertEqual(
+            [d.id for d in self.colecao.order_by('data', direction=firestore.Query.DESCENDING).limit(2).get()],
+            ['d0', 'd3']
+        )
+
+    def test_projecao(self):
+        documentos = self.colecao.where('data', '>=', '2026-01-02').order_by('data').select(['data', 'valor']).get()
+        self.assertEqual(
+            [(d.id, d.to_dict()) for d in documentos],
+            [('d2', {'data': '2026-01-02', 'valor': 2}), ('d3', {'data': '2026-01-02', 'valor': 4}),
+             ('d0', {'data': '2026-01-03', 'valor': 3})]
+        )
+
+    def test_batch_e_atomico(self):
+        batch = self.db.batch()
+        batch.update(self.colecao.document('d1'), {'valor': firestore.Increment(10)})
+        batch.create(self.colecao.document('d0'), {'valor': 0})
+        with self.assertRaises(AlreadyExists):
+            batch.commit()
+        self.assertEqual(self.colecao.document('d1').get().to_dict()['valor'], 1)
+
+    def test_precondicao_de_update_time(self):
+        documento = self.colecao.document('d1').get()
+        self.colecao.document('d1').update({'valor': firestore.Increment(1)})
+        batch = self.db.batch()
+        batch.delete(documento.reference, option=self.db.write_option(last_update_time=documento.update_time))
+        with self.assertRaises(FailedPrecondition):
+            batch.commit()
+        self.assertEqual(self.colecao.document('d1').get().to_dict()['valor'], 2)
+
+    def test_on_snapshot_recebe_alteracoes(self):
+        recebidos = []
+        alterado = threading.Event()
+
+        def callback(snapshots, mudancas, momento):
+            recebidos.append([s.to_dict().get('valor') for s in snapshots])
+            if len(recebidos) > 1:
+                alterado.set()
+
+        watch = self.colecao.document('d1').on_snapshot(callback)
+        self.colecao.document('d1').update({'valor': 9})
+        self.assertTrue(alterado.wait(2))
+        watch.unsubscribe()
+        self.assertEqual(recebidos[-1], [9])
+
+
+class RelatorioResumoTests(FirestoreMemoriaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for dia, categoria in ((3, 'Mercado'), (4, 'Mercado'), (5, 'Lazer')):
+            firestore_client.add_despesa(self.user_id, {'valor': 10 * dia, 'data': f'2026-01-{dia:02d}',
+                                                        'categoria': categoria})
+        firestore_client.add_ganho(self.user_id, {'valor': 200, 'data': '2026-01-06', 'categoria': 'Extra'})
+        self.periodo = {'data_inicio': '2026-01-01', 'data_fim': '2026-01-31'}
+
+    def relatorio(self, **parametros):
+        resposta = self.get('/api/transacoes/relatorio/', {**self.periodo, **parametros})
+        self.assertEqual(resposta.status_code, 200)
+        return resposta.json()['relatorio']
+
+    def test_resumo_tem_os_mesmos_totais_sem_transacoes(self):
+        completo = self.relatorio()
+        resumo = self.relatorio(resumo='true')
+
+        self.assertNotIn('transacoes', resumo)
+        self.assertEqual(len(completo['transacoes']), 4)
+        for chave in ('total_despesas', 'total_ganhos', 'saldo_periodo', 'categorias', 'quantidade'):
+            self.assertEqual(resumo[chave], completo[chave])
+        self.assertEqual(resumo['categorias']['Mercado'], {'despesas': 70.0, 'ganhos': 0})
+        self.assertFalse(resumo['truncado'])
+
+    @override_settings(RELATORIO_RESUMO_LIMITE=2)
+    def test_resumo_respeita_o_limite_do_servidor(self):
+        resumo = self.relatorio(resumo='true', limite=1000)
+
+        self.assertTrue(resumo['truncado'])
+        self.assertEqual(resumo['quantidade'], 3)
+        self.assertEqual(resumo['total_despesas'], 70.0)
+
+
+class SerieTemporalTests(FirestoreMemoriaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        firestore_client.add_despesa(self.user_id, {'valor': 30, 'data': '2025-11-20'})
+        firestore_client.add_despesa(self.user_id, {'valor': 10, 'data': '2026-01-05'})
+        firestore_client.add_ganho(self.user_id, {'valor': 50, 'data': '2026-01-12'})
+        firestore_client.add_salario(self.user_id, {'valor': 1000, 'data_recebimento': '2026-01-05'})
+        # Fora da janela de três meses
+        firestore_client.add_despesa(self.user_id, {'valor': 99, 'data': '2025-10-31'})
+        self.hoje = datetime.date(2026, 1, 15)
+
+    def test_totais_por_mes_em_ordem_cronologica(self):
+        serie = firestore_client.get_serie_temporal(self.user_id, periodos=3, hoje=self.hoje)['periodos']
+
+        self.assertEqual([p['chave'] for p in serie], ['2025-11', '2025-12', '2026-01'])
+        self.assertEqual([p['total_despesas'] for p in serie], [30.0, 0.0, 10.0])
+        self.assertEqual([p['saldo'] for p in serie], [-30.0, 0.0, 1040.0])
+        self.assertEqual(serie[0]['data_fim'], '2025-11-30')
+
+    def test_totais_por_semana_comecam_na_segunda(self):
+        serie = firestore_client.get_serie_temporal(self.user_id, 'semanal', periodos=2, hoje=self.hoje)['periodos']
+
+        self.assertEqual([p['chave'] for p in serie], ['2026-01-05', '2026-01-12'])
+        self.assertEqual([p['total_ganhos'] for p in serie], [1000.0, 50.0])
+
+    def test_datas_invalidas_sao_ignoradas(self):
+        for data in ('2026-01-1', '2026-01-0x'):
+            firestore_client.collection(f'users/{self.user_id}/despesas').add({'valor': 7, 'data': data})
+
+        mensal = firestore_client.get_serie_temporal(self.user_id, periodos=3, hoje=self.hoje)['periodos']
+        self.assertEqual([p['total_despesas'] for p in mensal], [30.0, 0.0, 10.0])
+        semanal = firestore_client.get_serie_temporal(self.user_id, 'semanal', periodos=2, hoje=self.hoje)['periodos']
+        self.assertEqual([p['total_despesas'] for p in semanal], [10.0, 0.0])
+
+    def test_parametros_invalidos_retornam_400(self):
+        for parametros in ({'agrupamento': 'diario'}, {'periodos': 'doze'}):
+            with self.subTest(parametros=parametros):
+                self.assertEqual(self.get('/api/transacoes/serie/', parametros).status_code, 400)
+        resposta = self.get('/api/transacoes/serie/', {'periodos': 1000})
+        self.assertEqual(len(resposta.json()['serie']['periodos']), firebase.SERIE_MAX_PERIODOS['mensal'])
+
+
+class DashboardTests(FirestoreMemoriaTestCase):
+
+    def test_dashboard_reune_perfil_recentes_e_resumo_do_mes(self):
+        hoje = datetime.date.today().strftime('%Y-%m-%d')
+        self.post('/api/transacoes/ganho/', {'valor': 100, 'data': hoje, 'categoria': 'Extra'}, **self.headers)
+        self.post('/api/transacoes/despesa/', {'valor': 40, 'data': hoje, 'categoria': 'Mercado'}, **self.headers)
+
+        with mock.patch.object(MemoryDocumentReference, 'get', autospec=True,
+                               side_effect=MemoryDocumentReference.get) as leitura:
+            resposta = self.get('/api/dashboard/')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual([c.args[0].path for c in leitura.call_args_list].count(f'users/{self.user_id}'), 1)
+        dashboard = resposta.json()
+        resumo = self.get('/api/transacoes/relatorio/', {'periodo': 'mensal', 'resumo': 'true'}).json()['relatorio']
+
+        self.assertEqual(dashboard['user']['email'], self.email)
+        self.assertEqual(dashboard['saldo'], 60.0)
+        self.assertEqual(dashboard['user']['saldo'], 60.0)
+        self.assertEqual(sorted(t['valor'] for t in dashboard['transacoes_recentes']), [40.0, 100.0])
+        self.assertEqual(dashboard['resumo_mensal'], resumo)
+
+    def test_dashboard_exige_autenticacao(self):
+        self.assertEqual(self.client.get('/api/dashboard/').status_code, 401)
+
+
+class SincronizacaoTests(FirestoreMemoriaTestCase):
+
+    def test_token_devolve_apenas_alteracoes_seguintes(self):
+        despesa_id = firestore_client.add_despesa(self.user_id, {'valor': 10, 'data': '2026-01-05'})
+        primeira = self.get('/api/transacoes/sync/').json()
+        self.assertEqual([t['id'] for t in primeira['alteradas']], [despesa_id])
+
+        ganho_id = firestore_client.add_ganho(self.user_id, {'valor': 20, 'data': '2026-01-06'})
+        firestore_client.remover_transacao(self.user_id, 'despesa', despesa_id)
+        segunda = self.get('/api/transacoes/sync/', {'since': primeira['token']}).json()
+        self.assertEqual([t['id'] for t in segunda['alteradas']], [ganho_id])
+        self.assertEqual([t['id'] for t in segunda['removidas']], [despesa_id])
+        self.assertFalse(segunda['tem_mais'])
+
+    @override_settings(SYNC_LIMITE=3)
+    def test_paginas_avancam_em_lote_maior_que_o_limite(self):
+        # Um único commit: todos os documentos têm o mesmo 'updated_at'
+        batch = firestore_client.batch()
+        esperados = set()
+        for colecao, quantidade in (('despesas', 7), ('ganhos', 4), ('removidas', 2)):
+            for i in range(quantidade):
+                referencia = firestore_client.collection(f'users/{self.user_id}/{colecao}').document()
+                dados = {'valor': i, 'data': '2026-01-05', 'updated_at': firestore.SERVER_TIMESTAMP}
+                if colecao == 'removidas':
+                    dados = {'id': referencia.id, 'tipo': 'despesa', 'updated_at': firestore.SERVER_TIMESTAMP}
+                batch.set(referencia, dados)
+                esperados.add(referencia.id)
+        batch.commit()
+
+        recebidos, parametros, paginas = [], {}, 0
+        while True:
+            resposta = self.get('/api/transacoes/sync/', parametros).json()
+            recebidos += [t['id'] for t in resposta['alteradas'] + resposta['removidas']]
+            parametros = {'since': resposta['token']}
+            paginas += 1
+            self.assertLess(paginas, 10)
+            if not resposta['tem_mais']:
+                break
+        self.assertEqual(len(recebidos), len(esperados))
+        self.assertEqual(set(recebidos), esperados)
+
+        vazia = self.get('/api/transacoes/sync/', parametros).json()
+        self.assertEqual((vazia['alteradas'], vazia['removidas'], vazia['token']), ([], [], parametros['since']))
+
+    def test_token_invalido_retorna_400(self):
+        for token in ('zz', 'ffffffffffffffffffff.despesas.abc', '-1.despesas.abc', '0.0', '0.outra.abc', '0.despesas.'):
+            with self.subTest(token=token):
+                self.assertEqual(self.get('/api/transacoes/sync/', {'since': token}).status_code, 400)
+
+
+class EventosTests(FirestoreMemoriaTestCase):
+
+    async def conectar(self):
+        """
+        Abre uma conexão e lê o stream em uma tarefa, como o servidor ASGI;
+        cancelar a tarefa equivale ao cliente desconectar.
+        """
+        resposta = await AsyncClient().get('/api/eventos/', headers={'Authorization': self.headers['HTTP_AUTHORIZATION']})
+        self.assertEqual(resposta['Content-Type'], 'text/event-stream')
+        fila = asyncio.Queue()
+
+        async def ler():
+            async for pedaco in resposta.streaming_content:
+                await fila.put(pedaco.decode())
+
+        tarefa = asyncio.create_task(ler())
+        self.assertTrue((await asyncio.wait_for(fila.get(), 5)).startswith('retry:'))
+        return fila, tarefa
+
+    async def evento(self, fila):
+        linhas = (await asyncio.wait_for(fila.get(), 5)).strip().split('\n')
+        return linhas[0].removeprefix('event: '), json.loads(linhas[1].removeprefix('data: '))
+
+    async def test_conexoes_compartilham_listeners_e_recebem_alteracoes(self):
+        conexoes = [await self.conectar(), await self.conectar()]
+        self.assertEqual(event_hub.usuarios_ativos(), 1)
+        for fila, _ in conexoes:
+            self.assertEqual(await self.evento(fila), ('saldo', {'saldo': 0.0}))
+
+        despesa_id = await asyncio.to_thread(firestore_client.add_despesa, self.user_id, {'valor': 15, 'data': '2026-01-05'})
+        for fila, _ in conexoes:
+            eventos = dict([await self.evento(fila), await self.evento(fila)])
+            self.assertEqual(eventos['saldo'], {'saldo': -15.0})
+            self.assertEqual((eventos['transacao']['acao'], eventos['transacao']['id']), ('criada', despesa_id))
+
+        for _, tarefa in conexoes:
+            tarefa.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await tarefa
+        self.assertEqual(event_hub.usuarios_ativos(), 0)
+
+    async def test_eventos_exigem_autenticacao(self):
+        self.assertEqual((await AsyncClient().get('/api/eventos/')).status_code, 401)
+
+
+class ListagemTests(FirestoreMemoriaTestCase):
+
+    def test_paginas_seguem_a_ordem_por_data_entre_tipos(self):
+        firestore_client.add_despesa(self.user_id, {'valor': 1, 'data': '2026-01-03'})
+        firestore_client.add_ganho(self.user_id, {'valor': 2, 'data': '2026-01-05'})
+        firestore_client.add_salario(self.user_id, {'valor': 3, 'data_recebimento': '2026-01-04'})
+        firestore_client.add_despesa(self.user_id, {'valor': 4, 'data': '2026-01-01'})
+
+        valores, cursor = [], None
+        while True:
+            parametros = {'paginado': 'true', 'limite': 3}
+            if cursor:
+                parametros['cursor'] = cursor
+            resposta = self.get('/api/transacoes/listar/', parametros).json()
+            valores += [t['valor'] for t in resposta['transacoes']]
+            cursor = resposta['proximo_cursor']
+            if not cursor:
+                break
+        self.assertEqual(valores, [2, 3, 1, 4])
+
+    def test_parametros_invalidos_retornam_400(self):
+        for parametros in ({'tipo': 'x'}, {'tipo': 'x', 'paginado': 'true'}, {'limite': 'abc'}, {'cursor': 'invalido'}):
+            with self.subTest(parametros=parametros):
+                self.assertEqual(self.get('/api/transacoes/listar/', parametros).status_code, 400)
+
+    def test_limite_fora_do_intervalo_e_ajustado(self):
+        firestore_client.add_despesa(self.user_id, {'valor': 1, 'data': '2026-01-03'})
+        firestore_client.add_despesa(self.user_id, {'valor': 2, 'data': '2026-01-04'})
+        for limite, esperado in ((0, 1), (-5, 1), (10 ** 6, 2)):
+            with self.subTest(limite=limite):
+                resposta = self.get('/api/transacoes/listar/', {'paginado': 'true', 'limite': limite})
+                self.assertEqual(resposta.status_code, 200)
+                self.assertEqual(len(resposta.json()['transacoes']), esperado)
+
+
+class IdempotenciaTests(FirestoreMemoriaTestCase):
+
+    def adicionar(self, chave, valor=5, url='/api/transacoes/despesa/'):
+        return self.post(url, {'valor': valor, 'data': '2026-01-05'}, HTTP_IDEMPOTENCY_KEY=chave, **self.headers)
+
+    def saldo(self):
+        return firestore_client.document(f'users/{self.user_id}').get().to_dict()['saldo']
+
+    def test_repeticao_devolve_a_resposta_original_sem_acessar_o_firestore(self):
+        primeira = self.adicionar('k1')
+        self.assertEqual(primeira.status_code, 200)
+
+        rpcs = get_memory_client().stats['rpcs']
+        repeticao = self.adicionar('k1')
+        self.assertEqual(get_memory_client().stats['rpcs'], rpcs)
+        self.assertEqual(repeticao['Idempotent-Replayed'], 'true')
+        self.assertEqual(repeticao.status_code, 200)
+        self.assertEqual(repeticao.content, primeira.content)
+        self.assertEqual(self.saldo(), -5.0)
+
+    def test_mesma_chave_com_outro_corpo_ou_rota(self):
+        self.adicionar('k1')
+        self.assertEqual(self.adicionar('k1', valor=6).status_code, 422)
+        # A chave vale por rota: o ganho é outra operação
+        self.assertEqual(self.adicionar('k1', url='/api/transacoes/ganho/').status_code, 200)
+        self.assertEqual(self.saldo(), 0.0)
+
+    def test_repeticao_fora_do_cache_nao_duplica(self):
+        despesa_id = self.adicionar('k1').json()['despesa_id']
+        caches[settings.IDEMPOTENCY_CACHE].clear()
+
+        self.assertEqual(self.adicionar('k1').json()['despesa_id'], despesa_id)
+        self.assertEqual(len(firestore_client.collection(f'users/{self.user_id}/despesas').get()), 1)
+        self.assertEqual(self.saldo(), -5.0)
+
+    def test_duplicatas_simultaneas_sao_agrupadas(self):
+        respostas = []
+        threads = [threading.Thread(target=lambda: respostas.append(self.adicionar('k2'))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual({r.status_code for r in respostas}, {200})
+        self.assertEqual(len({r.json()['despesa_id'] for r in respostas}), 1)
+        self.assertEqual(sum(r.has_header('Idempotent-Replayed') for r in respostas), 7)
+        self.assertEqual(self.saldo(), -5.0)
+
+
+class ThrottlingTests(FirestoreMemoriaTestCase):
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('10/min'), (10, 10 / 60))
+        self.assertEqual(parse_rate('3600/h'), (3600, 1.0))
+        for rate in ('10', '0/s', '10/semana'):
+            with self.subTest(rate=rate), self.assertRaises(ValueError):
+                parse_rate(rate)
+
+    def test_bucket_recupera_tokens_com_o_tempo(self):
+        backend = LocMemThrottleBackend()
+        with mock.patch('viccoin.throttling.time.monotonic', return_value=100.0) as relogio:
+            self.assertEqual([backend.consumir('a', 2, 0.5) for _ in range(2)], [0, 0])
+            self.assertEqual(backend.consumir('a', 2, 0.5), 2.0)
+            self.assertEqual(backend.consumir('b', 2, 0.5), 0)
+            relogio.return_value = 102.0
+            self.assertEqual(backend.consumir('a', 2, 0.5), 0)
+
+    @override_settings(THROTTLE_RATES={**settings.THROTTLE_RATES, 'login': '2/min'})
+    def test_login_limitado_por_ip(self):
+        self.client = Client()
+        # Relógio parado: o tempo gasto pelo bcrypt não devolve tokens ao bucket
+        with mock.patch('viccoin.throttling.time.time', return_value=1000.0):
+            errada = {'email': self.email, 'password': 'errada'}
+            for _ in range(2):
+                self.assertEqual(self.post('/api/users/login/', errada).status_code, 401)
+            resposta = self.post('/api/users/login/', {'email': self.email, 'password': self.senha})
+
+        self.assertEqual(resposta.status_code, 429)
+        self.assertEqual(resposta['Retry-After'], '30')
+
+    @override_settings(THROTTLE_RATES={**settings.THROTTLE_RATES, 'leitura': '2/min'})
+    def test_leituras_limitadas_por_usuario(self):
+        self.cadastrar('outro@viccoin.com')
+        outro = self.autenticar('outro@viccoin.com')
+        self.client = Client()
+
+        self.assertEqual([self.get('/api/users/perfil/').status_code for _ in range(3)], [200, 200, 429])
+        # Mesmo IP, outro usuário: bucket próprio
+        self.assertEqual(self.client.get('/api/users/perfil/', **outro).status_code, 200)
+
+
+class LoteTests(FirestoreMemoriaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.despesas = [firestore_client.add_despesa(self.user_id, {'valor': 10, 'data': '2026-01-05'})
+                         for _ in range(5)]
+        self.ganho_id = firestore_client.add_ganho(self.user_id, {'valor': 100, 'data': '2026-01-06'})
+
+    def enviar(self, metodo, url, dados=None):
+        return getattr(self.client, metodo)(url, json.dumps(dados or {}), content_type='application/json',
+                                            **self.headers)
+
+    def saldo(self):
+        return firestore_client.document(f'users/{self.user_id}').get().to_dict()['saldo']
+
+    def test_remocao_em_lote_le_uma_vez_e_grava_um_batch(self):
+        itens = [{'tipo': 'despesa', 'id': i} for i in self.despesas] + [{'tipo': 'ganho', 'id': 'inexistente'}]
+        with mock.patch.object(MemoryWriteBatch, 'commit', autospec=True,
+                               side_effect=MemoryWriteBatch.commit) as commit, \
+                mock.patch.object(MemoryFirestore, 'get_all', autospec=True,
+                                  side_effect=MemoryFirestore.get_all) as get_all:
+            resposta = self.enviar('delete', '/api/transacoes/lote/', {'transacoes': itens}).json()
+
+        self.assertEqual((commit.call_count, get_all.call_count), (1, 1))
+        self.assertEqual(resposta['removidas'], self.despesas)
+        self.assertEqual(resposta['nao_encontradas'], ['inexistente'])
+        self.assertEqual(resposta['delta_saldo'], 50.0)
+        self.assertEqual(self.saldo(), 100.0)
+
+        # Repetir a remoção não altera o saldo de novo
+        self.enviar('delete', '/api/transacoes/lote/', {'transacoes': itens})
+        self.assertEqual(self.saldo(), 100.0)
+
+    def test_atualizacao_ajusta_o_saldo_pela_diferenca(self):
+        resposta = self.enviar('put', '/api/transacoes/lote/', {'transacoes': [
+            {'tipo': 'despesa', 'id': self.despesas[0], 'valor': 25, 'descricao': 'Mercado'},
+            {'tipo': 'ganho', 'id': self.ganho_id, 'valor': 80},
+        ]}).json()
+
+        self.assertEqual(resposta['delta_saldo'], -35.0)
+        self.assertEqual(self.saldo(), 15.0)
+        despesa = firestore_client.document(f'users/{self.user_id}/despesas/{self.despesas[0]}').get().to_dict()
+        self.assertEqual((despesa['valor'], despesa['descricao']), (25.0, 'Mercado'))
+
+    def test_rotas_de_uma_transacao(self):
+        url = f'/api/transacoes/despesa/{self.despesas[0]}/'
+        self.assertEqual(self.enviar('put', url, {'valor': 12}).json()['delta_saldo'], -2.0)
+        self.assertEqual(self.enviar('put', url, {'campo': 1}).status_code, 400)
+        self.assertEqual(self.enviar('delete', url).status_code, 200)
+        self.assertEqual(self.enviar('delete', url).status_code, 404)
+        self.assertEqual(self.saldo(), 60.0)
+
+    def test_lote_invalido_retorna_400(self):
+        for dados in ({}, {'transacoes': [{'tipo': 'x', 'id': 'a'}]},
+                      {'transacoes': [{'tipo': 'despesa', 'id': 'a'}] * (settings.LOTE_MAXIMO + 1)}):
+            with self.subTest(dados=str(dados)[:40]):
+                self.assertEqual(self.enviar('delete', '/api/transacoes/lote/', dados).status_code, 400)
+
+
+class ModeloLeituraTests(FirestoreMemoriaTestCase):
+    databases = {'default'}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.modelo_leitura = cls.enterClassContext(modelo_leitura_ativo())
+
+    def setUp(self):
+        super().setUp()
+        self.despesa_id = firestore_client.add_despesa(self.user_id, {'valor': 30, 'data': '2026-01-05',
+                                                                      'categoria': 'Mercado'})
+        firestore_client.add_despesa(self.user_id, {'valor': 12.5, 'data': '2026-01-20', 'categoria': 'Lazer'})
+        self.ganho_id = firestore_client.add_ganho(self.user_id, {'valor': 100, 'data': '2026-01-10',
+                                                                  'categoria': 'Extra'})
+        firestore_client.add_salario(self.user_id, {'valor': 1000, 'data_recebimento': '2026-02-05'})
+        self.periodo = {'data_inicio': '2026-01-01', 'data_fim': '2026-01-31'}
+
+    def relatorios(self):
+        sql = self.modelo_leitura.relatorio(self.user_id, **self.periodo)
+        firestore = firestore_client.get_transacoes_por_periodo(self.user_id, **self.periodo)
+        return sql, firestore
+
+    def assertRelatoriosIguais(self):
+        sql, firestore = self.relatorios()
+        for chave in ('total_despesas', 'total_ganhos', 'saldo_periodo', 'categorias', 'quantidade', 'truncado'):
+            self.assertEqual(sql[chave], firestore[chave], chave)
+        # updated_at na cópia é o horário da notificação, não o do commit
+        sem_horario = lambda transacoes: [{**t, 'updated_at': None} for t in transacoes]
+        self.assertCountEqual(sem_horario(sql['transacoes']), sem_horario(firestore['transacoes']))
+
+    def test_escritas_sao_copiadas_para_o_modelo_de_leitura(self):
+        self.assertRelatoriosIguais()
+
+        firestore_client.atualizar_transacoes(self.user_id, [('despesa', self.despesa_id, {'valor': 35.0})])
+        firestore_client.remover_transacao(self.user_id, 'ganho', self.ganho_id)
+        self.assertRelatoriosIguais()
+        self.assertEqual(self.relatorios()[0]['total_despesas'], 47.5)
+
+    def test_relatorio_pela_rota_usa_o_sql(self):
+        with override_settings(RELATORIO_FONTE='sql'), \
+                mock.patch.object(firestore_client, 'get_transacoes_por_periodo') as firestore:
+            resposta = self.get('/api/transacoes/relatorio/', {**self.periodo, 'resumo': 'true'})
+
+        firestore.assert_not_called()
+        self.assertEqual(resposta.json()['relatorio']['total_ganhos'], 100.0)
+
+    def test_backfill_reconstroi_a_copia(self):
+        from users.models import TransacaoLeitura
+
+        TransacaoLeitura.objects.filter(user_id=self.user_id).delete()
+        call_command('backfill_read_model', usuarios=[self.user_id], stdout=StringIO())
+        self.assertEqual(TransacaoLeitura.objects.filter(user_id=self.user_id).count(), 4)
+        self.assertRelatoriosIguais()
+
+
+class BuscaTests(FirestoreMemoriaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        firestore_client.add_despesa(self.user_id, {'valor': 12, 'data': '2026-01-05', 'descricao': 'Almoço',
+                                                    'local': 'Café São João'})
+        firestore_client.add_despesa(self.user_id, {'valor': 30, 'data': '2026-01-20', 'descricao': 'Jantar',
+                                                    'local': 'Restaurante'})
+        self.ganho_id = firestore_client.add_ganho(self.user_id, {'valor': 50, 'data': '2026-01-10',
+                                                                  'descricao': 'Venda no café'})
+
+    def buscar(self, **parametros):
+        resposta = self.get('/api/transacoes/busca/', parametros)
+        self.assertEqual(resposta.status_code, 200)
+        return sorted(t['valor'] for t in resposta.json()['transacoes'])
+
+    def test_termos_normalizados(self):
+        self.assertEqual(termos_busca({'descricao': 'Pão!', 'local': 'Sé'}), ['pa', 'pao', 'se'])
+        self.assertEqual(termos_consulta('CAFÉ são a'), ['cafe', 'sao'])
+
+    def test_busca_por_prefixo_sem_acentos_com_filtros(self):
+        self.assertEqual(self.buscar(q='cafe'), [12.0, 50.0])
+        self.assertEqual(self.buscar(q='CAFÉ sao'), [12.0])
+        self.assertEqual(self.buscar(q='caf', tipo='ganho'), [50.0])
+        self.assertEqual(self.buscar(q='jan', data_inicio='2026-01-01', data_fim='2026-01-15'), [])
+        self.assertEqual(self.buscar(q='jan', data_inicio='2026-01-15'), [30.0])
+
+    def test_alteracao_atualiza_o_indice(self):
+        self.client.put(f'/api/transacoes/ganho/{self.ganho_id}/', json.dumps({'descricao': 'Freela'}),
+                        content_type='application/json', **self.headers)
+
+        self.assertEqual(self.buscar(q='venda'), [])
+        self.assertEqual(self.buscar(q='freela'), [50.0])
+
+    def test_indice_de_transacoes_antigas(self):
+        firestore_client.collection(f'users/{self.user_id}/despesas').document('antiga').set({
+            'valor': 5.0, 'data': '2026-01-03', 'descricao': 'Pão na padaria', 'tipo': 'despesa'
+        })
+        self.assertEqual(self.buscar(q='pao'), [])
+
+        call_command('build_search_index', stdout=StringIO())
+        self.assertEqual(self.buscar(q='pao'), [5.0])
+
+    def test_parametros_invalidos_retornam_400(self):
+        for parametros in ({'q': 'a'}, {'q': 'cafe', 'tipo': 'salario'}, {'q': 'cafe', 'data_fim': '15/01/2026'},
+                           {'q': 'cafe', 'limite': 'x'}):
+            with self.subTest(parametros=parametros):
+                self.assertEqual(self.get('/api/transacoes/busca/', parametros).status_code, 400)
+
+
+class CategoriasTests(FirestoreMemoriaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for descricao in ('Feira do mês', 'Feira orgânica', 'Padaria'):
+            firestore_client.add_despesa(self.user_id, {'valor': 10, 'data': '2026-01-05', 'categoria': 'Alimentação',
+                                                        'descricao': descricao})
+        self.lazer_id = firestore_client.add_despesa(self.user_id, {'valor': 10, 'data': '2026-01-06',
+                                                                    'categoria': 'Lazer', 'descricao': 'Cinema'})
+        firestore_client.add_despesa(self.user_id, {'valor': 10, 'data': '2026-01-07', 'categoria': 'Lazer',
+                                                    'descricao': 'Feira de livros'})
+        firestore_client.add_ganho(self.user_id, {'valor': 10, 'data': '2026-01-07', 'categoria': 'Vendas'})
+
+    def categorias(self, **parametros):
+        resposta = self.get('/api/categorias/', {'tipo': 'despesa', **parametros})
+        self.assertEqual(resposta.status_code, 200)
+        return resposta.json()['categorias']['despesa']
+
+    def test_categorias_por_uso_com_uma_leitura(self):
+        stats = get_memory_client().stats
+        rpcs, leituras = stats['rpcs'], stats['reads']
+        despesas = self.categorias()
+        self.assertEqual((stats['rpcs'] - rpcs, stats['reads'] - leituras), (1, 1))
+
+        self.assertEqual([(c['nome'], c['usos']) for c in despesas['categorias']], [('Alimentação', 3), ('Lazer', 2)])
+        ganhos = self.get('/api/categorias/').json()['categorias']['ganho']
+        self.assertEqual([c['nome'] for c in ganhos['categorias']], ['Vendas'])
+
+    def test_prefixo_e_sugestoes_pela_descricao(self):
+        self.assertEqual([c['nome'] for c in self.categorias(prefixo='alim')['categorias']], ['Alimentação'])
+        self.assertEqual(self.categorias(descricao='Feira de sábado')['sugestoes'], ['Alimentação', 'Lazer'])
+
+    def test_indice_acompanha_alteracoes_e_remocoes(self):
+        firestore_client.atualizar_transacoes(self.user_id, [('despesa', self.lazer_id, {'categoria': 'Cultura'})])
+        firestore_client.remover_transacao(self.user_id, 'despesa', self.lazer_id)
+
+        self.assertEqual([(c['nome'], c['usos']) for c in self.categorias()['categorias']],
+                         [('Alimentação', 3), ('Lazer', 1)])
+
+    def test_mapa_de_palavras_limitado_na_escrita(self):
+        alteracoes = AlteracoesCategorias()
+        for i in range(1000):
+            descricao = ' '.join(f'palavra{i}x{j}' for j in range(PALAVRAS_POR_TRANSACAO))
+            alteracoes.adicionar('despesa', {'categoria': 'Outros', 'descricao': descricao})
+        palavras = alteracoes.to_firestore()['despesa']['palavras']
+        self.assertLessEqual(len(palavras), GRUPOS_PALAVRAS)
+
+
+class OrcamentosTests(FirestoreMemoriaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.enviar('put', {'limites': {'Alimentação': 100, 'Lazer': 50}})
+
+    def enviar(self, metodo, dados):
+        return getattr(self.client, metodo)('/api/orcamentos/', json.dumps(dados), content_type='application/json',
+                                            **self.headers)
+
+    def despesa(self, valor, categoria='Alimentação', data='2026-01-05'):
+        resposta = self.post('/api/transacoes/despesa/', {'valor': valor, 'data': data, 'categoria': categoria},
+                             **self.headers)
+        return resposta.json()
+
+    def test_alerta_quando_a_despesa_passa_do_limite(self):
+        self.assertNotIn('alerta_orcamento', self.despesa(60))
+        self.assertNotIn('alerta_orcamento', self.despesa(40))
+        alerta = self.despesa(15)['alerta_orcamento']
+        self.assertEqual((alerta['gasto'], alerta['excedente'], alerta['ultrapassado_agora']), (115.0, 15.0, True))
+        self.assertFalse(self.despesa(1)['alerta_orcamento']['ultrapassado_agora'])
+        # Outro mês e categoria sem limite não contam
+        self.assertNotIn('alerta_orcamento', self.despesa(50, data='2026-02-05'))
+        self.assertNotIn('alerta_orcamento', self.despesa(500, categoria='Transporte'))
+
+    def test_situacao_vem_dos_contadores(self):
+        despesa_id = self.despesa(30, 'Lazer')['despesa_id']
+        self.despesa(80)
+        self.client.put(f'/api/transacoes/despesa/{despesa_id}/', json.dumps({'valor': 45}),
+                        content_type='application/json', **self.headers)
+
+        stats = get_memory_client().stats
+        leituras = stats['reads']
+        situacao = self.get('/api/orcamentos/', {'mes': '2026-01'}).json()
+        self.assertEqual(stats['reads'] - leituras, 1)
+        self.assertEqual([(o['categoria'], o['gasto'], o['restante']) for o in situacao['orcamentos']],
+                         [('Lazer', 45.0, 5.0), ('Alimentação', 80.0, 20.0)])
+        self.assertEqual((situacao['total_limites'], situacao['total_gasto']), (150.0, 125.0))
+
+    def test_remover_limite_e_validacao(self):
+        self.enviar('put', {'limites': {'Lazer': None}})
+        situacao = self.get('/api/orcamentos/', {'mes': '2026-01'}).json()
+        self.assertEqual([o['categoria'] for o in situacao['orcamentos']], ['Alimentação'])
+
+        self.assertEqual(self.enviar('put', {'limites': {'Lazer': -1}}).status_code, 400)
+        self.assertEqual(self.get('/api/orcamentos/', {'mes': '2026-13'}).status_code, 400)
+
+
+class CamposTests(FirestoreMemoriaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        firestore_client.add_despesa(self.user_id, {'valor': 10, 'data': '2026-01-05', 'categoria': 'Mercado',
+                                                    'descricao': 'Feira', 'local': 'Centro'})
+        firestore_client.add_salario(self.user_id, {'valor': 1000, 'data_recebimento': '2026-01-06'})
+
+    def consultar(self, url, parametros):
+        with mock.patch.object(MemoryQuery, 'select', autospec=True, side_effect=MemoryQuery.select) as select:
+            resposta = self.get(url, parametros)
+        self.assertEqual(resposta.status_code, 200)
+        return resposta.json(), [sorted(c.args[1]) for c in select.call_args_list]
+
+    def test_listagem_le_e_devolve_apenas_os_campos_pedidos(self):
+        resposta, selecoes = self.consultar('/api/transacoes/listar/', {'fields': 'valor,categoria,tipo'})
+
+        self.assertCountEqual(resposta['transacoes'], [
+            {'valor': 10.0, 'categoria': 'Mercado', 'tipo': 'despesa', 'id': mock.ANY},
+            {'valor': 1000.0, 'tipo': 'salario', 'id': mock.ANY},
+        ])
+        self.assertIn(['categoria', 'data', 'valor'], selecoes)
+        self.assertIn(['categoria', 'data_recebimento', 'valor'], selecoes)
+
+    def test_campo_desconhecido_retorna_400(self):
+        self.assertEqual(self.get('/api/transacoes/listar/', {'fields': 'senha'}).status_code, 400)
+
+    def test_relatorio_com_campos_mantem_os_totais(self):
+        completo = self.get('/api/transacoes/relatorio/', {'data_inicio': '2026-01-01'}).json()['relatorio']
+        relatorio, selecoes = self.consultar('/api/transacoes/relatorio/',
+                                             {'data_inicio': '2026-01-01', 'fields': 'valor'})
+
+        relatorio = relatorio['relatorio']
+        self.assertEqual(relatorio['categorias'], completo['categorias'])
+        self.assertEqual(relatorio['saldo_periodo'], 990.0)
+        self.assertEqual({frozenset(t) for t in relatorio['transacoes']}, {frozenset({'valor', 'id'})})
+        # Campos repetidos entre os totais e os pedidos são lidos uma vez
+        self.assertIn(['categoria', 'data', 'valor'], selecoes)
+
+    def test_resumo_le_apenas_os_campos_dos_totais(self):
+        _, selecoes = self.consultar('/api/transacoes/relatorio/', {'data_inicio': '2026-01-01', 'resumo': 'true'})
+        self.assertEqual(sorted(selecoes), [['categoria', 'data', 'tipo', 'valor'], ['categoria', 'data', 'tipo', 'valor'],
+                                            ['categoria', 'data_recebimento', 'tipo', 'valor']])
+
+
+class EscritasAgrupadasTests(FirestoreMemoriaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.commits = []
+        self.falhar_individuais = False
+        commit = MemoryWriteBatch.commit
+
+        def contar(batch):
+            # Registra quantas transações cada commit cria
+            criadas = sum(1 for escrita in batch._writes if escrita[0] == 'create')
+            self.commits.append(criadas)
+            if self.falhar_individuais and criadas == 1:
+                raise ServiceUnavailable('indisponível')
+            return commit(batch)
+
+        patcher = mock.patch.object(MemoryWriteBatch, 'commit', autospec=True, side_effect=contar)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_escritas_simultaneas_sao_gravadas_em_um_commit(self):
+        # Janela longa: o grupo é gravado assim que chega a 10 escritas
+        agrupador = AgrupadorEscritas(firestore_client._gravar_grupo, 5, 10)
+        with mock.patch.object(firestore_client, 'agrupador', agrupador):
+            ids = []
+            threads = [
+                threading.Thread(target=lambda valor=valor: ids.append(
+                    firestore_client.add_despesa(self.user_id, {'valor': valor, 'data': '2026-01-05'})
+                ))
+                for valor in range(1, 11)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(self.commits, [10])
+        self.assertEqual(len(set(ids)), 10)
+        self.assertEqual(self.get('/api/users/perfil/').json()['user']['saldo'], -55.0)
+
+    def test_repeticao_nao_multiplica_tentativas(self):
+        existente = firestore_client.add_despesa(self.user_id, {'valor': 1, 'data': '2026-01-05'})
+        despesas = firestore_client.collection(f'users/{self.user_id}/despesas')
+        itens = [
+            ('despesa', despesas.document(existente), {'valor': 1.0, 'data': '2026-01-05'}, -1.0),
+            ('despesa', despesas.document('nova'), {'valor': 2.0, 'data': '2026-01-05'}, -2.0),
+        ]
+        self.commits.clear()
+        self.falhar_individuais = True
+        with mock.patch('viccoin.firebase.time.sleep'):
+            with self.assertRaises(ServiceUnavailable):
+                firestore_client._gravar_transacoes(self.user_id, itens)
+
+        # Cada tentativa: o batch do grupo (AlreadyExists) e a primeira transação
+        self.assertEqual(self.commits, [2, 1] * MAX_RETRIES)
+
+
+class ArquivoTests(FirestoreMemoriaTestCase):
+    """
+    Relatórios que alcançam os meses arquivados por `archive_transactions`.
+    """
+
+    def setUp(self):
+        super().setUp()
+        # Uma despesa e um ganho em cada mês de 2022, todos arquivados
+        for mes in range(1, 13):
+            firestore_client.add_despesa(self.user_id, {
+                'valor': mes, 'data': f'2022-{mes:02d}-10', 'categoria': 'Mercado', 'descricao': f'Compra {mes}'
+            })
+            firestore_client.add_ganho(self.user_id, {'valor': 100, 'data': f'2022-{mes:02d}-05', 'categoria': 'Extra'})
+        firestore_client.add_despesa(self.user_id, {'valor': 7, 'data': '2026-01-10', 'categoria': 'Mercado'})
+
+    def arquivar(self):
+        call_command('archive_transactions', usuarios=[self.user_id], stdout=StringIO())
+
+    def test_relatorio_e_serie_iguais_depois_de_arquivar(self):
+        parametros = {'data_inicio': '2022-01-01', 'data_fim': '2026-12-31', 'limite': 1000}
+        antes = self.get('/api/transacoes/relatorio/', parametros).json()['relatorio']
+        resumo_antes = self.get('/api/transacoes/relatorio/', {**parametros, 'resumo': 'true'}).json()
+        serie_antes = firestore_client.get_serie_temporal(self.user_id, 'mensal', 60)
+
+        self.arquivar()
+        self.assertEqual(len(firestore_client.collection(f'users/{self.user_id}/despesas').get()), 1)
+
+        depois = self.get('/api/transacoes/relatorio/', parametros).json()['relatorio']
+        self.assertEqual(depois['total_despesas'], antes['total_despesas'])
+        self.assertEqual(depois['categorias'], antes['categorias'])
+        self.assertCountEqual(
+            [(t['id'], t['valor']) for t in depois['transacoes']],
+            [(t['id'], t['valor']) for t in antes['transacoes']]
+        )
+        self.assertEqual(self.get('/api/transacoes/relatorio/', {**parametros, 'resumo': 'true'}).json(), resumo_antes)
+        self.assertEqual(firestore_client.get_serie_temporal(self.user_id, 'mensal', 60), serie_antes)
+
+    def test_relatorio_para_no_limite_sem_ler_todo_o_arquivo(self):
+        self.arquivar()
+        with mock.patch.object(firebase, 'descompactar', wraps=firebase.descompactar) as descompactar:
+            resultado = firestore_client.get_transacoes_por_periodo(self.user_id, tipo='despesa', limite=2)
+
+        self.assertEqual([t['data'] for t in resultado['transacoes']], ['2022-01-10', '2022-02-10'])
+        self.assertTrue(resultado['truncado'])
+        # O merge lê um pacote além do último entregue
+        self.assertLessEqual(descompactar.call_count, 3)
+
+    def test_transacao_em_arquivamento_interrompido_aparece_uma_vez(self):
+        self.arquivar()
+        pacote = firestore_client.collection(f'users/{self.user_id}/arquivo').order_by('mes').limit(1).get()[0]
+        transacao = next(t for t in firebase.descompactar(pacote.to_dict()['dados']) if t['tipo'] == 'despesa')
+        # A cópia ainda na subcoleção, como se a remoção não tivesse terminado
+        dados = {campo: valor for campo, valor in transacao.items() if campo != 'id'}
+        firestore_client.document(f"users/{self.user_id}/despesas/{transacao['id']}").set(dados)
+
+        resultado = firestore_client.get_transacoes_por_periodo(
+            self.user_id, data_inicio='2022-01-01', data_fim='2022-01-31', apenas_resumo=True
+        )
+        self.assertEqual((resultado['quantidade'], resultado['total_despesas']), (2, 1.0))
+
+
+class SaldoDistribuidoTests(FirestoreMemoriaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        firestore_client.add_ganho(self.user_id, {'valor': 500, 'data': '2026-01-05'})
+        self.usuario_ref = firestore_client.document(f'users/{self.user_id}')
+
+    def distribuir(self, *args, **opcoes):
+        call_command('balance_shards', *args, usuarios=[self.user_id], stdout=StringIO(), **opcoes)
+
+    def saldos(self):
+        return {
+            'perfil': self.get('/api/users/perfil/').json()['user']['saldo'],
+            'resumo': self.get('/api/transacoes/resumo/').json()['saldo'],
+            'dashboard': self.get('/api/dashboard/').json()['saldo'],
+        }
+
+    def shards(self):
+        return firestore_client.collection(f'users/{self.user_id}/{COLECAO_SHARDS}').get()
+
+    def test_escritas_vao_para_os_shards(self):
+        self.distribuir(shards=4)
+        self.assertEqual(len(self.shards()), 4)
+        atualizado_em = self.usuario_ref.get().update_time
+
+        threads = [threading.Thread(target=firestore_client.add_despesa,
+                                    args=(self.user_id, {'valor': i + 1, 'data': '2026-01-06'}))
+                   for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.usuario_ref.get().update_time, atualizado_em)
+        self.assertEqual(sum(shard.to_dict()['saldo'] for shard in self.shards()), -210.0)
+        self.assertEqual(set(self.saldos().values()), {290.0})
+
+    @override_settings(SALDO_CACHE_TTL=5)
+    def test_soma_dos_shards_fica_em_cache(self):
+        self.distribuir(shards=4)
+        firestore_client.add_despesa(self.user_id, {'valor': 10, 'data': '2026-01-06'})
+
+        with mock.patch.object(firestore_client, 'ler_shards_saldo', wraps=firestore_client.ler_shards_saldo) as ler:
+            for _ in range(3):
+                self.assertEqual(firestore_client.saldo_usuario(self.usuario_ref.get()), 490.0)
+            self.assertEqual(ler.call_count, 1)
+            firestore_client.add_despesa(self.user_id, {'valor': 10, 'data': '2026-01-06'})
+            self.assertEqual(firestore_client.saldo_usuario(self.usuario_ref.get()), 480.0)
+            self.assertEqual(ler.call_count, 2)
+
+    @override_settings(SALDO_CACHE_TTL=5)
+    def test_leitura_concorrente_nao_guarda_soma_antiga(self):
+        self.distribuir(shards=4)
+        ler_shards = firestore_client.ler_shards_saldo
+
+        def ler_antes_de_uma_escrita(user_id):
+            shards = ler_shards(user_id)
+            firestore_client.add_despesa(self.user_id, {'valor': 10, 'data': '2026-01-06'})
+            return shards
+
+        with mock.patch.object(firestore_client, 'ler_shards_saldo', side_effect=ler_antes_de_uma_escrita):
+            self.assertEqual(firestore_client.saldo_usuario(self.usuario_ref.get()), 500.0)
+        self.assertEqual(firestore_client.saldo_usuario(self.usuario_ref.get()), 490.0)
+
+    def test_soma_nao_fica_em_cache_local(self):
+        self.distribuir(shards=4)
+        with mock.patch.object(firestore_client, 'ler_shards_saldo', wraps=firestore_client.ler_shards_saldo) as ler:
+            for _ in range(2):
+                self.assertEqual(firestore_client.saldo_usuario(self.usuario_ref.get()), 500.0)
+            self.assertEqual(ler.call_count, 2)
+
+    def test_volta_ao_modo_normal(self):
+        self.distribuir(shards=4)
+        firestore_client.add_despesa(self.user_id, {'valor': 10, 'data': '2026-01-06'})
+
+        self.distribuir('--desativar', espera=0)
+        self.assertEqual(self.shards(), [])
+        dados = self.usuario_ref.get().to_dict()
+        self.assertNotIn(CAMPO_SHARDS, dados)
+        self.assertEqual(dados['saldo'], 490.0)
+        self.assertEqual(set(self.saldos().values()), {490.0})
+
+    def test_numero_de_shards_invalido(self):
+        with self.assertRaises(CommandError):
+            self.distribuir(shards=0)
@@ -0,0 +1,206 @@
+"""
+Limite de requisições (throttling) com token buckets.
+
+O `ThrottleMiddleware` classifica cada requisição a /api/ em uma classe de
+endpoint e consome um token de cada bucket aplicável:
+
+- 'login': login e cadastro, por IP (limite mais rígido, cada tentativa custa
+  um hash bcrypt)
+- 'escrita': POST/PUT/PATCH/DELETE, por usuário (do JWT) ou IP
+- 'leitura': demais métodos, por usuário (do JWT) ou IP
+- 'ip': todas as requisições, por IP, como teto geral
+
+Os limites vêm de THROTTLE_RATES no formato 'N/periodo' (s, min, h): o
+bucket comporta N tokens e recupera N a cada período. Sem token disponível,
+a resposta é 429 com o cabeçalho Retry-After.
+
+O estado fica em um backend plugável (THROTTLE_BACKEND). O padrão,
+`CacheThrottleBackend`, usa o cache do Django e é compartilhado entre
+workers quando o cache é (Redis, Memcached, banco); `LocMemThrottleBackend`
+guarda os buckets no próprio processo.
+"""
+import math
+import threading
+import time
+
+import jwt
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+
+PERIODOS = {'s': 1, 'seg': 1, 'min': 60, 'm': 60, 'h': 3600, 'hora': 3600, 'd': 86400, 'dia': 86400}
+
+# Rotas da classe 'login'
+ROTAS_LOGIN = ('/api/users/login/', '/api/users/register/')
+
+METODOS_ESCRITA = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+def parse_rate(rate):
+    """
+    Converte 'N/periodo' em (capacidade, tokens por segundo).
+
+    Raises:
+        ValueError: Se o formato for inválido
+    """
+    quantidade, _, periodo = rate.partition('/')
+    quantidade = int(quantidade)
+    if periodo not in PERIODOS or quantidade <= 0:
+        raise ValueError(f"Limite inválido: {rate!r}")
+    return quantidade, quantidade / PERIODOS[periodo]
+
+
+class LocMemThrottleBackend:
+    """
+    Buckets em memória, apenas para o processo atual.
+    """
+
+    def __init__(self, **kwargs):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consumir(self, chave, capacidade, taxa):
+        """
+        Consome um token do bucket `chave`.
+
+        Returns:
+            0 se havia token, ou os segundos até o próximo token
+        """
+        agora = time.monotonic()
+        with self._lock:
+            tokens, instante = self._buckets.get(chave, (capacidade, agora))
+            tokens = min(capacidade, tokens + (agora - instante) * taxa)
+            if tokens < 1:
+                self._buckets[chave] = (tokens, agora)
+                return (1 - tokens) / taxa
+            self._buckets[chave] = (tokens - 1, agora)
+            return 0
+
+
+class CacheThrottleBackend:
+    """
+    Buckets no cache do Django (alias THROTTLE_CACHE).
+
+    A leitura e a gravação do bucket não são atômicas: sob concorrência alta
+    na mesma chave, alguns tokens a mais podem passar, o que é aceitável para
+    proteção contra abuso.
+    """
+
+    def __init__(self, cache_alias=None, **kwargs):
+        self.cache = caches[cache_alias or settings.THROTTLE_CACHE]
+
+    def consumir(self, chave, capacidade, taxa):
+        agora = time.time()
+        chave = 'throttle:' + chave
+        tokens, instante = self.cache.get(chave) or (capacidade, agora)
+        tokens = min(capacidade, tokens + max(0.0, agora - instante) * taxa)
+        # O bucket expira quando estaria cheio de novo
+        expira = math.ceil(capacidade / taxa) + 1
+        if tokens < 1:
+            self.cache.set(chave, (tokens, agora), expira)
+            return (1 - tokens) / taxa
+        self.cache.set(chave, (tokens - 1, agora), expira)
+        return 0
+
+
+def obter_ip(request):
+    """
+    IP do cliente. Atrás de THROTTLE_PROXIES proxies confiáveis, usa a entrada
+    correspondente de X-Forwarded-For (contando da direita).
+    """
+    proxies = settings.THROTTLE_PROXIES
+    if proxies:
+        encaminhados = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if len(encaminhados) >= proxies:
+            return encaminhados[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def obter_user_id(request):
+    """
+    user_id do JWT do cabeçalho Authorization, ou None se ausente/inválido.
+    """
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return None
+    try:
+        payload = jwt.decode(auth_header[7:], settings.SECRET_KEY, algorithms=['HS256'])
+    except jwt.PyJWTError:
+        return None
+    return payload.get('user_id')
+
+
+class ThrottleMiddleware:
+    """
+    Middleware que aplica os limites de THROTTLE_RATES às rotas /api/.
+    Funciona tanto com views síncronas quanto assíncronas.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.rates = {classe: parse_rate(rate) for classe, rate in settings.THROTTLE_RATES.items()}
+        self.backend = import_string(settings.THROTTLE_BACKEND)()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        bloqueio = self.verificar(request)
+        if bloqueio is not None:
+            return bloqueio
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        bloqueio = await sync_to_async(self.verificar, thread_sensitive=False)(request)
+        if bloqueio is not None:
+            return bloqueio
+        return await self.get_response(request)
+
+    def buckets(self, request):
+        """
+        Lista os buckets (classe, chave) consumidos pela requisição.
+        """
+        ip = obter_ip(request)
+        buckets = [('ip', f'ip:{ip}')]
+
+        if request.path in ROTAS_LOGIN:
+            buckets.append(('login', f'login:{ip}'))
+            return buckets
+
+        classe = 'escrita' if request.method in METODOS_ESCRITA else 'leitura'
+        user_id = obter_user_id(request)
+        identidade = f'user:{user_id}' if user_id else f'ip:{ip}'
+        buckets.append((classe, f'{classe}:{identidade}'))
+        return buckets
+
+    def verificar(self, request):
+        """
+        Retorna uma resposta 429 se algum bucket estiver vazio, ou None.
+        """
+        if not settings.THROTTLE_ENABLED or not request.path.startswith('/api/') or request.method == 'OPTIONS':
+            return None
+
+        espera = 0
+        for classe, chave in self.buckets(request):
+            if classe not in self.rates:
+                continue
+            capacidade, taxa = self.rates[classe]
+            espera = max(espera, self.backend.consumir(chave, capacidade, taxa))
+            if espera:
+                break
+
+        if not espera:
+            return None
+
+        segundos = max(1, math.ceil(espera))
+        response = JsonResponse({
+            'success': False,
+            'message': f'Muitas requisições. Tente novamente em {segundos} segundos.'
+        }, status=429)
+        response['Retry-After'] = str(segundos)
+        return response
@@ -41,8 +41,16 @@ def api_root(request):
                 'listar': '/api/transacoes/listar/',
                 'resumo': '/api/transacoes/resumo/',
                 'relatorio': '/api/transacoes/relatorio/',
-                'atualizar_salario': '/api/transacoes/salario/<id>/',
+                'serie': '/api/transacoes/serie/',
+                'sync': '/api/transacoes/sync/?since=<token>',
+                'busca': '/api/transacoes/busca/?q=<texto>',
+                'eventos': '/api/eventos/',
+                'transacao': '/api/transacoes/<despesa|ganho|salario>/<id>/ (PUT, DELETE)',
+                'lote': '/api/transacoes/lote/ (PUT, DELETE)',
             },
+            'dashboard': '/api/dashboard/',
+            'categorias': '/api/categorias/',
+            'orcamentos': '/api/orcamentos/ (GET, PUT)',
             'health': '/health/',
         }
     })
@@ -52,13 +60,23 @@ urlpatterns = [
     path('', api_root, name='api_root'),
     path('api/users/', include('users.urls', namespace='users')),
     path('health/', health_check_view, name='health_check'),
+    path('api/dashboard/', views.dashboard, name='dashboard'),
     
     # Novas rotas para transações financeiras
     path('api/transacoes/despesa/', views.adicionar_despesa, name='adicionar_despesa'),
     path('api/transacoes/ganho/', views.adicionar_ganho, name='adicionar_ganho'),
     path('api/transacoes/salario/', views.adicionar_salario, name='adicionar_salario'),
-    path('api/transacoes/salario/<str:salario_id>/', views.atualizar_salario, name='atualizar_salario'),
+    path('api/transacoes/lote/', views.transacoes_em_lote, name='transacoes_em_lote'),
+    path('api/transacoes/despesa/<str:transacao_id>/', views.transacao_detalhe, {'tipo': 'despesa'}, name='transacao_despesa'),
+    path('api/transacoes/ganho/<str:transacao_id>/', views.transacao_detalhe, {'tipo': 'ganho'}, name='transacao_ganho'),
+    path('api/transacoes/salario/<str:transacao_id>/', views.transacao_detalhe, {'tipo': 'salario'}, name='atualizar_salario'),
     path('api/transacoes/listar/', views.listar_transacoes, name='listar_transacoes'),
     path('api/transacoes/resumo/', views.obter_resumo_financeiro, name='obter_resumo_financeiro'),
     path('api/transacoes/relatorio/', views.relatorio_por_periodo, name='relatorio_por_periodo'),
+    path('api/transacoes/serie/', views.serie_temporal, name='serie_temporal'),
+    path('api/transacoes/sync/', views.sincronizar_transacoes, name='sincronizar_transacoes'),
+    path('api/transacoes/busca/', views.buscar_transacoes, name='buscar_transacoes'),
+    path('api/categorias/', views.listar_categorias, name='listar_categorias'),
+    path('api/orcamentos/', views.orcamentos, name='orcamentos'),
+    path('api/eventos/', views.eventos, name='eventos'),
 ]
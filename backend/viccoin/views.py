@@ -1,15 +1,35 @@
 import json
 import logging
 import jwt
+import asyncio
 import datetime
-from django.http import JsonResponse
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
-from .firebase import firestore_client
+from firebase_admin import firestore
+from google.api_core.exceptions import FailedPrecondition
+from .firebase import (
+    firestore_client, SERIE_MAX_PERIODOS, COLECOES_TRANSACAO,
+    decodificar_token_sync, normalizar_alteracoes, normalizar_campos
+)
+from .events import event_hub
+from .busca import termos_consulta
+from .categorias import TIPOS_CATEGORIA, sugerir_categorias
+from .orcamentos import MAX_ORCAMENTOS, avaliar_despesa, mes_atual, mes_valido, situacao_orcamentos, validar_limites
+from .idempotency import idempotente, id_transacao
+from .read_model import modelo_leitura
+from users.models import TIPOS_BUSCA, User
+from users.serializers import UserSerializer
 
 logger = logging.getLogger(__name__)
 
+# Executor compartilhado para leituras concorrentes do Firestore no dashboard
+_dashboard_executor = ThreadPoolExecutor(max_workers=settings.DASHBOARD_WORKERS, thread_name_prefix='dashboard')
+
 def get_user_id_from_token(request):
     """
     Extrai o user_id do token JWT de autorização.
@@ -23,11 +43,32 @@ def get_user_id_from_token(request):
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
         return payload.get('user_id')
     except Exception as e:
-        logger.error(f"Erro ao decodificar token: {str(e)}")
+        logger.error("Erro ao decodificar token: %s", e)
+        return None
+
+def _alerta_orcamento(user_id, dados):
+    """
+    Alerta do orçamento da categoria de uma despesa recém-gravada, ou None.
+    
+    Os gastos do mês já incluem a despesa (foram incrementados no mesmo
+    batch), então basta ler o documento dos orçamentos e comparar com o
+    limite. Uma falha aqui não desfaz a despesa; apenas omite o alerta.
+    """
+    if not dados.get('categoria'):
+        return None
+    try:
+        return avaliar_despesa(firestore_client.get_orcamentos(user_id), {
+            'valor': float(dados['valor']),
+            'data': dados['data'],
+            'categoria': str(dados['categoria']),
+        })
+    except Exception as e:
+        logger.warning("Erro ao avaliar orçamento: %s", e)
         return None
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@idempotente
 def adicionar_despesa(request):
     """
     Adiciona uma nova despesa para o usuário.
@@ -47,15 +88,19 @@ def adicionar_despesa(request):
             dados['data'] = datetime.datetime.now().strftime('%Y-%m-%d')
         
         # Adicionar despesa
-        despesa_id = firestore_client.add_despesa(user_id, dados)
+        despesa_id = firestore_client.add_despesa(user_id, dados, id_transacao(request, 'despesa'))
         
-        return JsonResponse({
+        resposta = {
             'success': True, 
             'message': 'Despesa adicionada com sucesso',
             'despesa_id': despesa_id
-        })
+        }
+        alerta = _alerta_orcamento(user_id, dados)
+        if alerta:
+            resposta['alerta_orcamento'] = alerta
+        return JsonResponse(resposta)
     except Exception as e:
-        logger.error(f"Erro ao adicionar despesa: {str(e)}")
+        logger.error("Erro ao adicionar despesa: %s", e)
         return JsonResponse({
             'success': False, 
             'message': f'Erro ao adicionar despesa: {str(e)}'
@@ -63,6 +108,7 @@ def adicionar_despesa(request):
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@idempotente
 def adicionar_ganho(request):
     """
     Adiciona um novo ganho para o usuário.
@@ -82,7 +128,7 @@ def adicionar_ganho(request):
             dados['data'] = datetime.datetime.now().strftime('%Y-%m-%d')
         
         # Adicionar ganho
-        ganho_id = firestore_client.add_ganho(user_id, dados)
+        ganho_id = firestore_client.add_ganho(user_id, dados, id_transacao(request, 'ganho'))
         
         return JsonResponse({
             'success': True, 
@@ -90,7 +136,7 @@ def adicionar_ganho(request):
             'ganho_id': ganho_id
         })
     except Exception as e:
-        logger.error(f"Erro ao adicionar ganho: {str(e)}")
+        logger.error("Erro ao adicionar ganho: %s", e)
         return JsonResponse({
             'success': False, 
             'message': f'Erro ao adicionar ganho: {str(e)}'
@@ -98,13 +144,14 @@ def adicionar_ganho(request):
 
 @csrf_exempt
 @require_http_methods(["POST", "OPTIONS"])
+@idempotente
 def adicionar_salario(request):
     """
     Adiciona um novo registro de salário para o usuário.
     """
     # Log de debug para entender a requisição
-    logger.info(f"Recebida requisição para adicionar_salario - Método: {request.method}")
-    logger.info(f"Headers: {request.headers}")
+    logger.debug("Recebida requisição para adicionar_salario - Método: %s", request.method)
+    logger.debug("Headers: %s", request.headers)
     
     # Se for uma requisição OPTIONS (preflight CORS), retornar OK
     if request.method == "OPTIONS":
@@ -118,7 +165,7 @@ def adicionar_salario(request):
     
     try:
         dados = json.loads(request.body)
-        logger.info(f"Dados recebidos para adicionar salário: {dados}")
+        logger.debug("Dados recebidos para adicionar salário: %s", dados)
         
         # Validar dados
         if 'valor' not in dados or not dados['valor']:
@@ -127,20 +174,11 @@ def adicionar_salario(request):
         
         if 'data_recebimento' not in dados or not dados['data_recebimento']:
             dados['data_recebimento'] = datetime.datetime.now().strftime('%Y-%m-%d')
-            logger.info(f"Data de recebimento não fornecida, usando atual: {dados['data_recebimento']}")
+            logger.debug("Data de recebimento não fornecida, usando atual: %s", dados['data_recebimento'])
         
         # Adicionar salário
-        salario_id = firestore_client.add_salario(user_id, dados)
-        logger.info(f"Salário adicionado com sucesso. ID: {salario_id}")
-        
-        # Verificar se o salário foi realmente adicionado
-        salario = firestore_client.document(f"users/{user_id}/salario/{salario_id}").get()
-        if not salario.exists:
-            logger.error(f"Salário não encontrado após adicionar: {salario_id}")
-            return JsonResponse({
-                'success': False, 
-                'message': 'Falha ao adicionar salário: não foi encontrado após criação'
-            }, status=500)
+        salario_id = firestore_client.add_salario(user_id, dados, id_transacao(request, 'salario'))
+        logger.debug("Salário adicionado com sucesso. ID: %s", salario_id)
         
         return JsonResponse({
             'success': True, 
@@ -148,13 +186,13 @@ def adicionar_salario(request):
             'salario_id': salario_id
         })
     except ValueError as e:
-        logger.error(f"Erro ao decodificar JSON: {str(e)}")
+        logger.error("Erro ao decodificar JSON: %s", e)
         return JsonResponse({
             'success': False, 
             'message': f'Erro no formato dos dados: {str(e)}'
         }, status=400)
     except Exception as e:
-        logger.error(f"Erro ao adicionar salário: {str(e)}")
+        logger.error("Erro ao adicionar salário: %s", e)
         return JsonResponse({
             'success': False, 
             'message': f'Erro ao adicionar salário: {str(e)}'
@@ -165,6 +203,13 @@ def adicionar_salario(request):
 def listar_transacoes(request):
     """
     Lista todas as transações de um usuário ou filtra por tipo.
+    
+    Com paginado=true (ou um cursor), retorna as `limite` transações mais
+    recentes entre todos os tipos e o 'proximo_cursor' para a página seguinte.
+    O limite fica entre 1 e RELATORIO_LIMITE_MAXIMO.
+    
+    Com fields=valor,data,categoria,tipo, cada transação traz apenas esses
+    campos (e o 'id'), e só eles são lidos do Firestore.
     """
     user_id = get_user_id_from_token(request)
     if not user_id:
@@ -172,16 +217,42 @@ def listar_transacoes(request):
     
     try:
         tipo = request.GET.get('tipo', None)
-        limite = int(request.GET.get('limite', 10))
+        if tipo and tipo not in COLECOES_TRANSACAO:
+            return JsonResponse({
+                'success': False,
+                'message': "Tipo inválido. Use 'despesa', 'ganho' ou 'salario'."
+            }, status=400)
         
-        transacoes = firestore_client.get_transacoes(user_id, tipo, limite)
+        try:
+            limite = max(1, min(int(request.GET.get('limite', 10)), settings.RELATORIO_LIMITE_MAXIMO))
+        except ValueError:
+            return JsonResponse({'success': False, 'message': 'limite deve ser um número inteiro'}, status=400)
+        cursor = request.GET.get('cursor')
+        try:
+            campos = normalizar_campos(request.GET.get('fields'))
+        except ValueError as e:
+            return JsonResponse({'success': False, 'message': str(e)}, status=400)
+        
+        if cursor or request.GET.get('paginado', '').lower() == 'true':
+            try:
+                transacoes, proximo = firestore_client.get_transacoes_recentes(user_id, limite, tipo, cursor, campos)
+            except ValueError as e:
+                return JsonResponse({'success': False, 'message': str(e)}, status=400)
+            
+            return JsonResponse({
+                'success': True,
+                'transacoes': transacoes,
+                'proximo_cursor': proximo
+            })
+        
+        transacoes = firestore_client.get_transacoes(user_id, tipo, limite, campos)
         
         return JsonResponse({
             'success': True,
             'transacoes': transacoes
         })
     except Exception as e:
-        logger.error(f"Erro ao listar transações: {str(e)}")
+        logger.error("Erro ao listar transações: %s", e)
         return JsonResponse({
             'success': False,
             'message': f'Erro ao listar transações: {str(e)}'
@@ -205,11 +276,10 @@ def obter_resumo_financeiro(request):
         if not usuario.exists:
             return JsonResponse({'success': False, 'message': 'Usuário não encontrado'}, status=404)
         
-        dados_usuario = usuario.to_dict()
-        saldo = dados_usuario.get('saldo', 0)
+        saldo = firestore_client.saldo_usuario(usuario)
         
-        # Obter transações recentes
-        transacoes = firestore_client.get_transacoes(user_id, limite=5)
+        # Obter as 5 transações mais recentes entre todos os tipos
+        transacoes, _ = firestore_client.get_transacoes_recentes(user_id, limite=5)
         
         # Calcular totais
         total_despesas = sum(t['valor'] for t in transacoes if t.get('tipo') == 'despesa')
@@ -220,10 +290,10 @@ def obter_resumo_financeiro(request):
             'saldo': saldo,
             'total_despesas': total_despesas,
             'total_ganhos': total_ganhos,
-            'transacoes_recentes': transacoes[:5]
+            'transacoes_recentes': transacoes
         })
     except Exception as e:
-        logger.error(f"Erro ao obter resumo financeiro: {str(e)}")
+        logger.error("Erro ao obter resumo financeiro: %s", e)
         return JsonResponse({
             'success': False,
             'message': f'Erro ao obter resumo financeiro: {str(e)}'
@@ -241,6 +311,8 @@ def relatorio_por_periodo(request):
     - data_fim: Data final no formato 'YYYY-MM-DD' (opcional)
     - tipo: Tipo de transação ('despesa', 'ganho', 'salario') (opcional)
     - limite: Número máximo de transações por tipo (opcional, padrão 100)
+    - resumo: 'true' para retornar apenas totais e categorias, sem as transações (opcional)
+    - fields: Campos de cada transação, separados por vírgula (opcional, padrão todos)
     """
     user_id = get_user_id_from_token(request)
     if not user_id:
@@ -252,6 +324,7 @@ def relatorio_por_periodo(request):
         data_inicio = request.GET.get('data_inicio')
         data_fim = request.GET.get('data_fim')
         tipo = request.GET.get('tipo')
+        apenas_resumo = request.GET.get('resumo', '').lower() in ('1', 'true', 'sim')
         
         # Obter limite (com valor padrão)
         try:
@@ -273,6 +346,12 @@ def relatorio_por_periodo(request):
                 'message': "Tipo inválido. Use 'despesa', 'ganho' ou 'salario'."
             }, status=400)
         
+        # Validar campos pedidos
+        try:
+            campos = normalizar_campos(request.GET.get('fields'))
+        except ValueError as e:
+            return JsonResponse({'success': False, 'message': str(e)}, status=400)
+        
         # Validar datas (formato YYYY-MM-DD)
         if data_inicio:
             try:
@@ -293,14 +372,20 @@ def relatorio_por_periodo(request):
                 }, status=400)
         
         # Obter relatório
-        logger.info(f"Gerando relatório para usuário {user_id} (período: {periodo}, de {data_inicio} até {data_fim})")
-        resultado = firestore_client.get_transacoes_por_periodo(
+        logger.debug("Gerando relatório para usuário %s (período: %s, de %s até %s)", user_id, periodo, data_inicio, data_fim)
+        if settings.READ_MODEL_ENABLED and settings.RELATORIO_FONTE == 'sql':
+            fonte = modelo_leitura.relatorio
+        else:
+            fonte = firestore_client.get_transacoes_por_periodo
+        resultado = fonte(
             user_id, 
             periodo=periodo, 
             data_inicio=data_inicio, 
             data_fim=data_fim, 
             tipo=tipo, 
-            limite=limite
+            limite=limite,
+            apenas_resumo=apenas_resumo,
+            campos=campos
         )
         
         return JsonResponse({
@@ -308,76 +393,468 @@ def relatorio_por_periodo(request):
             'relatorio': resultado
         })
     except Exception as e:
-        logger.error(f"Erro ao gerar relatório: {str(e)}")
+        logger.error("Erro ao gerar relatório: %s", e)
         return JsonResponse({
             'success': False,
             'message': f'Erro ao gerar relatório: {str(e)}'
         }, status=500)
 
 @csrf_exempt
-@require_http_methods(["PUT"])
-def atualizar_salario(request, salario_id):
+@require_http_methods(["GET"])
+def serie_temporal(request):
+    """
+    Obtém totais de despesas, ganhos e saldo por período para gráficos de tendência.
+    
+    Parâmetros de consulta:
+    - agrupamento: 'mensal' ou 'semanal' (opcional, padrão 'mensal')
+    - periodos: Número de períodos até o atual (opcional, padrão 12)
     """
-    Atualiza um registro de salário existente.
+    user_id = get_user_id_from_token(request)
+    if not user_id:
+        return JsonResponse({'success': False, 'message': 'Usuário não autenticado'}, status=401)
     
-    Args:
-        request: Objeto de requisição HTTP
-        salario_id: ID do registro de salário a ser atualizado
+    try:
+        agrupamento = request.GET.get('agrupamento', 'mensal')
+        if agrupamento not in SERIE_MAX_PERIODOS:
+            return JsonResponse({
+                'success': False,
+                'message': "Agrupamento inválido. Use 'mensal' ou 'semanal'."
+            }, status=400)
+        
+        try:
+            periodos = int(request.GET.get('periodos', 12))
+        except ValueError:
+            return JsonResponse({'success': False, 'message': 'periodos deve ser um número inteiro'}, status=400)
+        
+        serie = firestore_client.get_serie_temporal(user_id, agrupamento=agrupamento, periodos=periodos)
+        
+        return JsonResponse({
+            'success': True,
+            'serie': serie
+        })
+    except Exception as e:
+        logger.error("Erro ao obter série temporal: %s", e)
+        return JsonResponse({
+            'success': False,
+            'message': f'Erro ao obter série temporal: {str(e)}'
+        }, status=500)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def buscar_transacoes(request):
+    """
+    Busca transações pelas palavras da descrição e do local.
     
-    Returns:
-        JsonResponse: Resposta com o resultado da operação
+    Parâmetros de consulta:
+    - q: Texto buscado; cada palavra é um prefixo e todas precisam aparecer
+    - tipo: 'despesa' ou 'ganho' (opcional)
+    - data_inicio, data_fim: Intervalo de datas no formato 'YYYY-MM-DD' (opcionais)
+    - limite: Número máximo de transações (opcional, padrão 20, até 100)
     """
     user_id = get_user_id_from_token(request)
     if not user_id:
         return JsonResponse({'success': False, 'message': 'Usuário não autenticado'}, status=401)
     
     try:
-        dados = json.loads(request.body)
+        consulta = request.GET.get('q', '')
+        if not termos_consulta(consulta):
+            return JsonResponse({
+                'success': False,
+                'message': 'Informe ao menos uma palavra com 2 ou mais letras em q.'
+            }, status=400)
         
-        # Validar dados
-        if 'valor' not in dados or not dados['valor']:
-            return JsonResponse({'success': False, 'message': 'Valor é obrigatório'}, status=400)
+        tipo = request.GET.get('tipo')
+        if tipo and tipo not in TIPOS_BUSCA:
+            return JsonResponse({
+                'success': False,
+                'message': "Tipo inválido. Use 'despesa' ou 'ganho'."
+            }, status=400)
         
-        if 'data_recebimento' not in dados or not dados['data_recebimento']:
-            dados['data_recebimento'] = datetime.datetime.now().strftime('%Y-%m-%d')
+        data_inicio = request.GET.get('data_inicio')
+        data_fim = request.GET.get('data_fim')
+        for nome, valor in (('data_inicio', data_inicio), ('data_fim', data_fim)):
+            if valor:
+                try:
+                    datetime.datetime.strptime(valor, '%Y-%m-%d')
+                except ValueError:
+                    return JsonResponse({
+                        'success': False,
+                        'message': f"Formato de {nome} inválido. Use o formato 'YYYY-MM-DD'."
+                    }, status=400)
         
-        # Verificar se o registro existe e pertence ao usuário
-        salario = firestore_client.document(f"users/{user_id}/salario/{salario_id}").get()
+        try:
+            limite = max(1, min(int(request.GET.get('limite', 20)), 100))
+        except ValueError:
+            return JsonResponse({'success': False, 'message': 'limite deve ser um número inteiro'}, status=400)
         
-        if not salario.exists:
-            return JsonResponse({'success': False, 'message': 'Registro de salário não encontrado'}, status=404)
+        resultado = firestore_client.buscar_transacoes(
+            user_id, consulta, tipo=tipo, data_inicio=data_inicio, data_fim=data_fim, limite=limite
+        )
         
-        # Obter o valor antigo para ajustar o saldo
-        dados_antigos = salario.to_dict()
-        valor_antigo = float(dados_antigos.get('valor', 0))
-        valor_novo = float(dados.get('valor', 0))
+        return JsonResponse({
+            'success': True,
+            **resultado
+        })
+    except Exception as e:
+        logger.error("Erro ao buscar transações: %s", e)
+        return JsonResponse({
+            'success': False,
+            'message': f'Erro ao buscar transações: {str(e)}'
+        }, status=500)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def listar_categorias(request):
+    """
+    Lista as categorias do usuário, das mais usadas para as menos usadas,
+    com a leitura de um único documento (o índice de categorias).
+    
+    Parâmetros de consulta:
+    - tipo: 'despesa' ou 'ganho' (opcional; sem ele, retorna os dois)
+    - prefixo: Filtra pelo início do nome da categoria (opcional)
+    - descricao: Descrição da transação sendo criada, para sugerir categorias (opcional)
+    - limite: Número máximo de categorias por tipo (opcional, padrão 20)
+    """
+    user_id = get_user_id_from_token(request)
+    if not user_id:
+        return JsonResponse({'success': False, 'message': 'Usuário não autenticado'}, status=401)
+    
+    try:
+        tipo = request.GET.get('tipo')
+        if tipo and tipo not in TIPOS_CATEGORIA:
+            return JsonResponse({
+                'success': False,
+                'message': "Tipo inválido. Use 'despesa' ou 'ganho'."
+            }, status=400)
+        
+        try:
+            limite = max(1, int(request.GET.get('limite', 20)))
+        except ValueError:
+            return JsonResponse({'success': False, 'message': 'limite deve ser um número inteiro'}, status=400)
+        
+        indice = firestore_client.get_indice_categorias(user_id)
+        categorias = {
+            tipo_atual: sugerir_categorias(
+                indice, tipo_atual,
+                prefixo=request.GET.get('prefixo'),
+                descricao=request.GET.get('descricao'),
+                limite=limite
+            )
+            for tipo_atual in ([tipo] if tipo else TIPOS_CATEGORIA)
+        }
         
-        # Atualizar registro
-        firestore_client.document(f"users/{user_id}/salario/{salario_id}").update({
-            'valor': valor_novo,
-            'data_recebimento': dados.get('data_recebimento'),
-            'periodo': dados.get('periodo', 'mensal'),
-            'recorrente': dados.get('recorrente', True),
-            'tipo': 'salario'
+        return JsonResponse({
+            'success': True,
+            'categorias': categorias
         })
+    except Exception as e:
+        logger.error("Erro ao listar categorias: %s", e)
+        return JsonResponse({
+            'success': False,
+            'message': f'Erro ao listar categorias: {str(e)}'
+        }, status=500)
+
+@csrf_exempt
+@require_http_methods(["GET", "PUT"])
+def orcamentos(request):
+    """
+    Consulta (GET) ou define (PUT) os orçamentos mensais por categoria.
+    
+    GET: situação de cada orçamento no mês, calculada a partir dos gastos
+    mantidos a cada escrita de despesa (uma única leitura de documento).
+    Parâmetros de consulta:
+    - mes: Mês no formato AAAA-MM (opcional, padrão: mês atual)
+    
+    PUT: {"limites": {"Alimentação": 800, "Lazer": null}}; um limite nulo ou
+    zero remove o orçamento da categoria.
+    """
+    user_id = get_user_id_from_token(request)
+    if not user_id:
+        return JsonResponse({'success': False, 'message': 'Usuário não autenticado'}, status=401)
+    
+    try:
+        if request.method == 'PUT':
+            dados = json.loads(request.body)
+            limites = validar_limites(dados.get('limites') if isinstance(dados, dict) else None)
+            
+            atuais = set((firestore_client.get_orcamentos(user_id).get('limites') or {}))
+            atuais.update(categoria for categoria, valor in limites.items() if valor is not None)
+            atuais.difference_update(categoria for categoria, valor in limites.items() if valor is None)
+            if len(atuais) > MAX_ORCAMENTOS:
+                return JsonResponse({
+                    'success': False,
+                    'message': f'No máximo {MAX_ORCAMENTOS} categorias com orçamento'
+                }, status=400)
+            
+            firestore_client.definir_orcamentos(user_id, limites)
+            return JsonResponse({'success': True, 'message': 'Orçamentos atualizados com sucesso'})
         
-        # Atualizar saldo do usuário (subtrair valor antigo e adicionar valor novo)
-        usuario_ref = firestore_client.document(f"users/{user_id}")
-        usuario = usuario_ref.get()
+        mes = request.GET.get('mes') or mes_atual()
+        if not mes_valido(mes):
+            return JsonResponse({'success': False, 'message': 'mes deve estar no formato AAAA-MM'}, status=400)
         
-        if usuario.exists:
-            saldo_atual = usuario.to_dict().get('saldo', 0)
-            novo_saldo = saldo_atual - valor_antigo + valor_novo
-            usuario_ref.update({'saldo': novo_saldo})
+        return JsonResponse({
+            'success': True,
+            **situacao_orcamentos(firestore_client.get_orcamentos(user_id), mes)
+        })
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    except Exception as e:
+        logger.error("Erro ao processar orçamentos: %s", e)
+        return JsonResponse({
+            'success': False,
+            'message': f'Erro ao processar orçamentos: {str(e)}'
+        }, status=500)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def sincronizar_transacoes(request):
+    """
+    Retorna apenas as transações criadas, alteradas ou removidas desde o
+    último token de sincronização.
+    
+    Parâmetros de consulta:
+    - since: Token devolvido pela sincronização anterior (opcional; sem ele,
+      retorna todo o histórico)
+    
+    O cliente deve repetir a chamada com o novo token enquanto 'tem_mais'
+    for verdadeiro.
+    """
+    user_id = get_user_id_from_token(request)
+    if not user_id:
+        return JsonResponse({'success': False, 'message': 'Usuário não autenticado'}, status=401)
+    
+    try:
+        token = request.GET.get('since')
+        desde = None
+        if token:
+            try:
+                desde = decodificar_token_sync(token)
+            except ValueError:
+                return JsonResponse({'success': False, 'message': 'Token de sincronização inválido'}, status=400)
+        
+        alteracoes = firestore_client.get_alteracoes(
+            user_id, desde=desde, limite=settings.SYNC_LIMITE
+        )
         
         return JsonResponse({
-            'success': True, 
-            'message': 'Salário atualizado com sucesso'
+            'success': True,
+            **alteracoes
         })
+    except Exception as e:
+        logger.error("Erro ao sincronizar transações: %s", e)
+        return JsonResponse({
+            'success': False,
+            'message': f'Erro ao sincronizar transações: {str(e)}'
+        }, status=500)
+
+def _formatar_evento(nome, dados):
+    return f"event: {nome}\ndata: {json.dumps(dados, cls=DjangoJSONEncoder)}\n\n"
+
+@csrf_exempt
+@require_http_methods(["GET"])
+async def eventos(request):
+    """
+    Stream de eventos (Server-Sent Events) com as alterações do usuário.
+    
+    Eventos enviados:
+    - saldo: {"saldo": ...} ao conectar e sempre que o saldo mudar
+    - transacao: {"acao": "criada"|"alterada"|"removida", "tipo", "id", "transacao"}
+    
+    Deve ser servido por ASGI: cada conexão fica aberta sem ocupar um worker.
+    """
+    user_id = get_user_id_from_token(request)
+    if not user_id:
+        return JsonResponse({'success': False, 'message': 'Usuário não autenticado'}, status=401)
+    
+    loop = asyncio.get_running_loop()
+    try:
+        assinatura = await sync_to_async(event_hub.assinar, thread_sensitive=False)(
+            user_id, loop, settings.SSE_FILA_MAXIMA
+        )
+    except Exception as e:
+        logger.error("Erro ao inscrever usuário nos eventos: %s", e)
+        return JsonResponse({
+            'success': False,
+            'message': f'Erro ao abrir stream de eventos: {str(e)}'
+        }, status=503)
+    
+    async def stream():
+        try:
+            yield f"retry: {settings.SSE_RETRY_MS}\n\n"
+            while True:
+                try:
+                    nome, dados = await asyncio.wait_for(assinatura.fila.get(), settings.SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    # Comentário SSE para manter proxies e o cliente conectados
+                    yield ": keepalive\n\n"
+                    continue
+                yield _formatar_evento(nome, dados)
+        finally:
+            event_hub.cancelar(assinatura)
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def dashboard(request):
+    """
+    Retorna em uma única resposta os dados da tela inicial: perfil, saldo,
+    transações recentes e resumo do mês atual.
+    
+    As leituras do Firestore são feitas em paralelo e o documento do usuário
+    é lido apenas uma vez.
+    """
+    user_id = get_user_id_from_token(request)
+    if not user_id:
+        return JsonResponse({'success': False, 'message': 'Usuário não autenticado'}, status=401)
+    
+    try:
+        usuario_futuro = _dashboard_executor.submit(
+            lambda: firestore_client.document(f"users/{user_id}").get()
+        )
+        recentes_futuro = _dashboard_executor.submit(firestore_client.get_transacoes_recentes, user_id, 5)
+        resumo_futuro = _dashboard_executor.submit(
+            firestore_client.get_transacoes_por_periodo, user_id, periodo='mensal', apenas_resumo=True
+        )
+        
+        usuario = usuario_futuro.result()
+        if not usuario.exists:
+            return JsonResponse({'success': False, 'message': 'Usuário não encontrado'}, status=404)
+        
+        user = User.from_dict(usuario.to_dict(), uid=user_id)
+        user.saldo = firestore_client.saldo_usuario(usuario)
         
+        return JsonResponse({
+            'success': True,
+            'user': UserSerializer.serialize(user),
+            'saldo': user.saldo,
+            'transacoes_recentes': recentes_futuro.result()[0],
+            'resumo_mensal': resumo_futuro.result()
+        })
     except Exception as e:
-        logging.error(f"Erro ao atualizar salário: {str(e)}")
+        logger.error("Erro ao obter dashboard: %s", e)
         return JsonResponse({
-            'success': False, 
-            'message': f'Erro ao atualizar salário: {str(e)}'
-        }, status=500) 
\ No newline at end of file
+            'success': False,
+            'message': f'Erro ao obter dashboard: {str(e)}'
+        }, status=500)
+
+def _tipo_e_id(item):
+    """
+    Extrai (tipo, id) de um item de lote, validando ambos.
+    """
+    if not isinstance(item, dict):
+        raise ValueError('Cada item deve ser um objeto com "tipo" e "id"')
+    tipo, transacao_id = item.get('tipo'), item.get('id')
+    if tipo not in COLECOES_TRANSACAO:
+        raise ValueError(f"Tipo de transação inválido: {tipo}")
+    if not transacao_id or not isinstance(transacao_id, str) or '/' in transacao_id:
+        raise ValueError('ID de transação inválido')
+    return tipo, transacao_id
+
+def _executar_lote(user_id, method, itens):
+    """
+    Aplica atualizações (PUT) ou remoções (DELETE) e monta a resposta.
+    """
+    if method == 'PUT':
+        alteracoes = []
+        for item in itens:
+            tipo, transacao_id = _tipo_e_id(item)
+            alteracoes.append((tipo, transacao_id, normalizar_alteracoes(tipo, item)))
+        resultado = firestore_client.atualizar_transacoes(user_id, alteracoes)
+    else:
+        resultado = firestore_client.remover_transacoes(user_id, [_tipo_e_id(item) for item in itens])
+    return resultado
+
+@csrf_exempt
+@require_http_methods(["PUT", "DELETE"])
+@idempotente
+def transacao_detalhe(request, tipo, transacao_id):
+    """
+    Atualiza (PUT) ou remove (DELETE) uma transação.
+    
+    No PUT, apenas os campos enviados são alterados; se o valor mudar, o
+    saldo é ajustado pela diferença.
+    """
+    user_id = get_user_id_from_token(request)
+    if not user_id:
+        return JsonResponse({'success': False, 'message': 'Usuário não autenticado'}, status=401)
+    
+    try:
+        dados = json.loads(request.body) if request.method == 'PUT' else {}
+        if not isinstance(dados, dict):
+            return JsonResponse({'success': False, 'message': 'Corpo da requisição deve ser um objeto'}, status=400)
+        resultado = _executar_lote(user_id, request.method, [{**dados, 'tipo': tipo, 'id': transacao_id}])
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    except FailedPrecondition:
+        return JsonResponse({
+            'success': False,
+            'message': 'A transação foi alterada por outra requisição. Tente novamente.'
+        }, status=409)
+    except Exception as e:
+        logger.error("Erro ao alterar transação: %s", e)
+        return JsonResponse({
+            'success': False,
+            'message': f'Erro ao alterar transação: {str(e)}'
+        }, status=500)
+    
+    if resultado['nao_encontradas']:
+        return JsonResponse({'success': False, 'message': 'Transação não encontrada'}, status=404)
+    
+    acao = 'atualizada' if request.method == 'PUT' else 'removida'
+    return JsonResponse({
+        'success': True,
+        'message': f'Transação {acao} com sucesso',
+        'delta_saldo': resultado['delta_saldo']
+    })
+
+@csrf_exempt
+@require_http_methods(["PUT", "DELETE"])
+@idempotente
+def transacoes_em_lote(request):
+    """
+    Atualiza (PUT) ou remove (DELETE) várias transações de uma vez.
+    
+    Corpo: {"transacoes": [{"tipo": "despesa", "id": "...", ...campos}]}
+    
+    Os documentos são lidos com uma única chamada e todas as alterações,
+    junto com a variação líquida do saldo, são gravadas em um único batch.
+    """
+    user_id = get_user_id_from_token(request)
+    if not user_id:
+        return JsonResponse({'success': False, 'message': 'Usuário não autenticado'}, status=401)
+    
+    try:
+        dados = json.loads(request.body)
+        itens = dados.get('transacoes') if isinstance(dados, dict) else None
+        if not isinstance(itens, list) or not itens:
+            return JsonResponse({'success': False, 'message': 'Informe a lista "transacoes"'}, status=400)
+        if len(itens) > settings.LOTE_MAXIMO:
+            return JsonResponse({
+                'success': False,
+                'message': f'No máximo {settings.LOTE_MAXIMO} transações por requisição'
+            }, status=400)
+        
+        resultado = _executar_lote(user_id, request.method, itens)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    except FailedPrecondition:
+        return JsonResponse({
+            'success': False,
+            'message': 'Transações alteradas por outra requisição. Tente novamente.'
+        }, status=409)
+    except Exception as e:
+        logger.error("Erro ao alterar transações em lote: %s", e)
+        return JsonResponse({
+            'success': False,
+            'message': f'Erro ao alterar transações em lote: {str(e)}'
+        }, status=500)
+    
+    return JsonResponse({
+        'success': True,
+        **resultado
+    })
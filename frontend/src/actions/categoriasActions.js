@@ -1,5 +1,15 @@
 import { SET_CATEGORIAS, ADD_CATEGORIA } from '../constants/actionTypes';
 import AsyncStorage from '@react-native-async-storage/async-storage';
+import { financasService } from '../services/api';
+
+// Coloca as categorias mais usadas (na ordem do servidor) antes das demais
+const ordenarPorUso = (categorias, usadas = []) => {
+  const nomesUsados = usadas.map(categoria => categoria.nome);
+  return [
+    ...nomesUsados,
+    ...categorias.filter(categoria => !nomesUsados.includes(categoria)),
+  ];
+};
 
 export const carregarCategorias = () => async (dispatch) => {
   try {
@@ -21,11 +31,15 @@ export const carregarCategorias = () => async (dispatch) => {
       'Mensal', 'Quinzenal', 'Semanal', 'Bônus', 'Participação', 'Outras'
     ];
     
+    // Ranking de uso mantido pelo servidor; sem conexão, fica a ordem local
+    const uso = await financasService.obterCategorias();
+    const usadas = uso.success ? uso.categorias : {};
+    
     dispatch({
       type: SET_CATEGORIAS,
       payload: {
-        despesas,
-        ganhos,
+        despesas: ordenarPorUso(despesas, usadas.despesa?.categorias),
+        ganhos: ordenarPorUso(ganhos, usadas.ganho?.categorias),
         salarios,
       },
     });
@@ -1,5 +1,6 @@
 import { useDispatch, useSelector } from 'react-redux';
 import { carregarCategorias, adicionarCategoria } from '../actions/categoriasActions';
+import { financasService } from '../services/api';
 
 export const useCategorias = () => {
   const dispatch = useDispatch();
@@ -25,8 +26,15 @@ export const useCategorias = () => {
     return [];
   };
   
+  // Sugere categorias para uma descrição, a partir do histórico do usuário
+  const sugerirCategorias = async (tipo, descricao) => {
+    const resposta = await financasService.obterCategorias({ tipo, descricao });
+    return resposta.success ? resposta.categorias[tipo]?.sugestoes || [] : [];
+  };
+  
   return {
     categorias,
+    sugerirCategorias,
     getCategoriasPorTipo,
     inicializarCategorias,
     novaCategoria,
@@ -278,10 +278,15 @@ function Home({ navigation }) {
       // Verificar resultado da operação
       if (resposta && resposta.success) {
         console.log('✅ Transação salva com sucesso!');
-        Alert.alert(
-          'Sucesso!', 
-          `${tipoTransacao.charAt(0).toUpperCase() + tipoTransacao.slice(1)} adicionado(a) com sucesso!`
-        );
+        const alertaOrcamento = resposta.data?.alerta_orcamento;
+        if (alertaOrcamento) {
+          Alert.alert('Orçamento ultrapassado', alertaOrcamento.mensagem);
+        } else {
+          Alert.alert(
+            'Sucesso!', 
+            `${tipoTransacao.charAt(0).toUpperCase() + tipoTransacao.slice(1)} adicionado(a) com sucesso!`
+          );
+        }
         setModalVisible(false);
         // Limpar campos do formulário
         setValor('');
@@ -118,6 +118,14 @@ api.interceptors.response.use(
 );
 
 // Funções para comunicação com o backend
+// Gerar uma chave única por operação de escrita (cabeçalho Idempotency-Key).
+// Reenviar a mesma operação com a mesma chave não duplica a transação no servidor.
+const gerarIdempotencyKey = () =>
+  'xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx'.replace(/[xy]/g, (c) => {
+    const r = (Math.random() * 16) | 0;
+    return (c === 'x' ? r : (r & 0x3) | 0x8).toString(16);
+  });
+
 export const authService = {
   // Função para realizar login
   login: async (email, password) => {
@@ -232,13 +240,17 @@ export const financasService = {
       
       console.log(`📡 Realizando requisição POST para ${API_URL}/transacoes/despesa/ com dados formatados:`, JSON.stringify(dadosFormatados, null, 2));
       
+      // A mesma chave é usada na tentativa alternativa para não duplicar a transação
+      const idempotencyKey = gerarIdempotencyKey();
+      
       // Configuração da requisição
       const config = {
         method: 'post',
         url: `${API_URL}/transacoes/despesa/`,
         headers: {
           'Content-Type': 'application/json',
-          'Authorization': `Bearer ${token}`
+          'Authorization': `Bearer ${token}`,
+          'Idempotency-Key': idempotencyKey
         },
         data: dadosFormatados
       };
@@ -273,7 +285,9 @@ export const financasService = {
         // Tentar alternativa com api.post
         console.log('🔄 Tentando requisição alternativa com api.post...');
         try {
-          const altResponse = await api.post('/transacoes/despesa/', dadosFormatados);
+          const altResponse = await api.post('/transacoes/despesa/', dadosFormatados, {
+            headers: { 'Idempotency-Key': idempotencyKey }
+          });
           console.log('✅ Requisição alternativa bem-sucedida:', altResponse.status);
           return {
             success: true,
@@ -339,13 +353,17 @@ export const financasService = {
       
       console.log(`📡 Realizando requisição POST para ${API_URL}/transacoes/ganho/ com dados formatados:`, JSON.stringify(dadosFormatados, null, 2));
       
+      // A mesma chave é usada na tentativa alternativa para não duplicar a transação
+      const idempotencyKey = gerarIdempotencyKey();
+      
       // Configuração da requisição
       const config = {
         method: 'post',
         url: `${API_URL}/transacoes/ganho/`,
         headers: {
           'Content-Type': 'application/json',
-          'Authorization': `Bearer ${token}`
+          'Authorization': `Bearer ${token}`,
+          'Idempotency-Key': idempotencyKey
         },
         data: dadosFormatados
       };
@@ -380,7 +398,9 @@ export const financasService = {
         // Tentar alternativa com api.post
         console.log('🔄 Tentando requisição alternativa com api.post...');
         try {
-          const altResponse = await api.post('/transacoes/ganho/', dadosFormatados);
+          const altResponse = await api.post('/transacoes/ganho/', dadosFormatados, {
+            headers: { 'Idempotency-Key': idempotencyKey }
+          });
           console.log('✅ Requisição alternativa bem-sucedida:', altResponse.status);
           return {
             success: true,
@@ -459,7 +479,9 @@ export const financasService = {
       // Isso garante que todas as configurações padrão da instância api são aplicadas corretamente
       try {
         // Fazer requisição usando a instância api diretamente
-        const response = await api.post('/transacoes/salario/', dadosFormatados);
+        const response = await api.post('/transacoes/salario/', dadosFormatados, {
+          headers: { 'Idempotency-Key': gerarIdempotencyKey() }
+        });
         
         console.log('✅ Resposta ao adicionar salário (status):', response.status);
         console.log('✅ Resposta ao adicionar salário (dados):', JSON.stringify(response.data, null, 2));
@@ -471,14 +493,6 @@ export const financasService = {
           
           console.log('🔑 ID do salário criado:', salarioId);
           
-          // Verificar se o salário foi realmente salvo consultando a API
-          try {
-            const verificacao = await api.get('/transacoes/listar/', { params: { tipo: 'salario', limite: 1 } });
-            console.log('🔍 Verificação após salvar:', verificacao.data.transacoes?.length ? 'Salário encontrado' : 'Salário NÃO encontrado');
-          } catch (err) {
-            console.log('⚠️ Não foi possível verificar se o salário foi salvo');
-          }
-          
           return {
             success: true,
             message: 'Salário adicionado com sucesso',
@@ -709,6 +723,123 @@ export const financasService = {
     }
   },
 
+  // Obter apenas as transações criadas, alteradas ou removidas desde o último token de sincronização
+  sincronizarTransacoes: async (token) => {
+    try {
+      const params = token ? { since: token } : {};
+      const response = await api.get('/transacoes/sync/', { params });
+      return response.data;
+    } catch (error) {
+      console.error('Erro ao sincronizar transações:', error);
+      console.error('Detalhes do erro:', error.response?.data || error.message);
+      return {
+        success: false,
+        message: `Erro ao sincronizar transações: ${error.message}`,
+        alteradas: [],
+        removidas: [],
+        token
+      };
+    }
+  },
+
+  // Buscar transações pelas palavras da descrição e do local, com filtros
+  // opcionais { tipo, data_inicio, data_fim, limite }
+  buscarTransacoes: async (q, filtros = {}) => {
+    try {
+      const response = await api.get('/transacoes/busca/', { params: { q, ...filtros } });
+      return response.data;
+    } catch (error) {
+      console.error('Erro ao buscar transações:', error);
+      console.error('Detalhes do erro:', error.response?.data || error.message);
+      return {
+        success: false,
+        message: error.response?.data?.message || `Erro ao buscar transações: ${error.message}`,
+        transacoes: []
+      };
+    }
+  },
+
+  // Obter as categorias do usuário ordenadas por uso, com filtros opcionais
+  // { tipo, prefixo, descricao, limite } (uma única leitura no servidor)
+  obterCategorias: async (filtros = {}) => {
+    try {
+      const response = await api.get('/categorias/', { params: filtros });
+      return response.data;
+    } catch (error) {
+      console.error('Erro ao obter categorias:', error);
+      console.error('Detalhes do erro:', error.response?.data || error.message);
+      return {
+        success: false,
+        message: `Erro ao obter categorias: ${error.message}`,
+        categorias: {}
+      };
+    }
+  },
+
+  // Obter a situação dos orçamentos por categoria em um mês (AAAA-MM; padrão: mês atual)
+  obterOrcamentos: async (mes) => {
+    try {
+      const response = await api.get('/orcamentos/', { params: mes ? { mes } : {} });
+      return response.data;
+    } catch (error) {
+      console.error('Erro ao obter orçamentos:', error);
+      console.error('Detalhes do erro:', error.response?.data || error.message);
+      return {
+        success: false,
+        message: `Erro ao obter orçamentos: ${error.message}`,
+        orcamentos: []
+      };
+    }
+  },
+
+  // Definir limites mensais por categoria ({ categoria: valor }; null remove o limite)
+  definirOrcamentos: async (limites) => {
+    try {
+      const response = await api.put('/orcamentos/', { limites });
+      return response.data;
+    } catch (error) {
+      console.error('Erro ao definir orçamentos:', error);
+      console.error('Detalhes do erro:', error.response?.data || error.message);
+      return {
+        success: false,
+        message: error.response?.data?.message || `Erro ao definir orçamentos: ${error.message}`
+      };
+    }
+  },
+
+  // Obter perfil, saldo, transações recentes e resumo do mês em uma única requisição
+  obterDashboard: async () => {
+    try {
+      const response = await api.get('/dashboard/');
+      return response.data;
+    } catch (error) {
+      console.error('Erro ao obter dashboard:', error);
+      console.error('Detalhes do erro:', error.response?.data || error.message);
+      return {
+        success: false,
+        message: `Erro ao obter dashboard: ${error.message}`,
+        saldo: 0,
+        transacoes_recentes: []
+      };
+    }
+  },
+
+  // Obter totais por mês ou semana para gráficos de tendência (uma única requisição)
+  obterSerieTemporal: async (agrupamento = 'mensal', periodos = 12) => {
+    try {
+      const response = await api.get('/transacoes/serie/', { params: { agrupamento, periodos } });
+      return response.data;
+    } catch (error) {
+      console.error('Erro ao obter série temporal:', error);
+      console.error('Detalhes do erro:', error.response?.data || error.message);
+      return {
+        success: false,
+        message: `Erro ao obter série temporal: ${error.message}`,
+        serie: { agrupamento, periodos: [] }
+      };
+    }
+  },
+
   // Atualizar uma despesa
   atualizarDespesa: async (id, dados) => {
     try {
@@ -745,6 +876,53 @@ export const financasService = {
     }
   },
 
+  // Remover uma transação (tipo: 'despesa', 'ganho' ou 'salario')
+  removerTransacao: async (tipo, id) => {
+    try {
+      const response = await api.delete(`/transacoes/${tipo}/${id}/`);
+      return response.data;
+    } catch (error) {
+      console.error('Erro ao remover transação:', error.response?.data || error.message);
+      return {
+        success: false,
+        message: `Erro ao remover transação: ${error.message}`
+      };
+    }
+  },
+
+  // Atualizar várias transações em uma requisição: [{ tipo, id, ...campos }]
+  atualizarTransacoesEmLote: async (transacoes) => {
+    try {
+      const response = await api.put('/transacoes/lote/', { transacoes }, {
+        headers: { 'Idempotency-Key': gerarIdempotencyKey() }
+      });
+      return response.data;
+    } catch (error) {
+      console.error('Erro ao atualizar transações em lote:', error.response?.data || error.message);
+      return {
+        success: false,
+        message: `Erro ao atualizar transações: ${error.message}`
+      };
+    }
+  },
+
+  // Remover várias transações em uma requisição: [{ tipo, id }]
+  removerTransacoesEmLote: async (transacoes) => {
+    try {
+      const response = await api.delete('/transacoes/lote/', {
+        data: { transacoes },
+        headers: { 'Idempotency-Key': gerarIdempotencyKey() }
+      });
+      return response.data;
+    } catch (error) {
+      console.error('Erro ao remover transações em lote:', error.response?.data || error.message);
+      return {
+        success: false,
+        message: `Erro ao remover transações: ${error.message}`
+      };
+    }
+  },
+
   // Obter configuração de salário
   obterSalario: async () => {
     try {
@@ -816,7 +994,9 @@ export const financasService = {
       } else {
         // Adicionar nova configuração
         console.log(`📡 Criando novo salário`);
-        response = await api.post('/transacoes/salario/', dadosFormatados);
+        response = await api.post('/transacoes/salario/', dadosFormatados, {
+          headers: { 'Idempotency-Key': gerarIdempotencyKey() }
+        });
       }
       
       // Verificar se a resposta contém dados